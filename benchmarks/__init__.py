@@ -0,0 +1,4 @@
+"""
+Benchmark scripts for the Multi-Format-RAG-Chat pipeline.
+Run from the project root, e.g. `python -m benchmarks.chat_latency`.
+"""
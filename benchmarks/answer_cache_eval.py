@@ -0,0 +1,112 @@
+"""
+Answer cache hit rate, false hits and latency saved.
+
+Indexes synthetic invoice records and replays a skewed question workload in
+which popular questions are asked again verbatim, with different case and
+punctuation, and as paraphrases. Every turn goes through rag_chat() with a
+stub LLM, once per similarity threshold (and once with the cache disabled).
+A false hit is a cached answer reused for a question about another record.
+
+Usage:
+    python -m benchmarks.answer_cache_eval --records 200 --turns 300 --thresholds 0.9 0.95 0.98
+"""
+
+import argparse
+import json
+import random
+import time
+
+from langchain_core.documents import Document
+
+from benchmarks.common import StubChatModel, summarize
+from benchmarks.corpus import records_corpus
+from main.modules import registry
+from main.modules.answer_cache import answer_cache
+from main.modules.hybrid_search import build_bm25
+from main.modules.process_vector_store import index_documents, preprocess_text
+from main.modules import rag_chat as rag_chat_module
+from main.modules.rag_chat import rag_chat
+
+
+# Ways users re-ask the same question
+def variants(question: str, invoice: str):
+    """Return the question as asked verbatim, reformatted and paraphrased."""
+
+    if question.startswith("What is the amount"):
+        paraphrases = [f"How much is invoice {invoice}?", f"amount of invoice {invoice}"]
+    else:
+        paraphrases = [f"চালান {invoice} কত টাকার?", f"{invoice} চালানের পরিমাণ"]
+    return [question, question.lower().rstrip("?"), *paraphrases]
+
+
+# Run one pass of the workload
+def replay(workload, vector_store, bm25, asked):
+    """Ask every question of the workload and collect cache outcomes and latencies.
+    Args:
+        workload (list): (question, invoice ID) turns.
+        vector_store (FAISS): The indexed records.
+        bm25 (BM25Okapi): Their BM25 index.
+        asked (dict): Maps each question variant to its invoice ID.
+    Returns:
+        dict: Hit rate, false hits, latencies and the cache counters."""
+
+    answer_cache.clear()
+    outcomes = {"hit": [], "miss": [], "bypass": []}
+    false_hits = 0
+    for question, invoice in workload:
+        metrics = {}
+        start = time.perf_counter()
+        rag_chat(question, [], vector_store, bm25, metrics, index_key="benchmark")
+        outcomes[metrics["answer_cache"]].append(time.perf_counter() - start)
+        if metrics["answer_cache"] == "hit":
+            false_hits += asked[metrics["answer_cache_question"]] != invoice
+
+    n = len(workload)
+    return {
+        "hit_rate": round(len(outcomes["hit"]) / n, 4),
+        "false_hit_rate": round(false_hits / n, 4),
+        **{f"{outcome}_latency": summarize(latencies) for outcome, latencies in outcomes.items() if latencies},
+        "all_latency": summarize([t for latencies in outcomes.values() for t in latencies]),
+        "cache": answer_cache.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=200, help="Invoice records in the corpus")
+    parser.add_argument("--turns", type=int, default=300, help="Questions asked per pass")
+    parser.add_argument("--popular", type=int, default=30, help="Records the questions are drawn from")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.9, 0.95, 0.98],
+                        help="Cosine similarity thresholds to compare")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="Stub LLM seconds per answer")
+    args = parser.parse_args()
+
+    registry.register("llm", lambda: StubChatModel(first_token_delay=args.llm_delay, token_delay=0.0))
+
+    texts, questions = records_corpus(args.records)
+    vector_store = index_documents(Document(page_content=preprocess_text(text)) for text in texts)
+    bm25 = build_bm25(vector_store)
+
+    # Popular records are asked about more often (Zipf-like), in any of their variants
+    rng = random.Random(0)
+    popular = questions[:args.popular]
+    weights = [1 / rank for rank in range(1, len(popular) + 1)]
+    asked = {}
+    workload = []
+    for question, invoice in rng.choices(popular, weights=weights, k=args.turns):
+        variant = rng.choice(variants(question, invoice))
+        asked[variant] = invoice
+        workload.append((variant, invoice))
+
+    results = {"records": args.records, "turns": args.turns, "distinct_questions": len(asked)}
+    rag_chat_module.ANSWER_CACHE = False
+    results["no_cache"] = replay(workload, vector_store, bm25, asked)
+    rag_chat_module.ANSWER_CACHE = True
+    for threshold in args.thresholds:
+        answer_cache.threshold = threshold
+        results[f"threshold_{threshold}"] = replay(workload, vector_store, bm25, asked)
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Per-turn retrieval latency as the document grows.
+
+Builds one index per document size (as /uploadfile does) and then times the
+retrieval work a chat turn performs: one query embedding plus a FAISS search.
+With --rebuild it also times the old behaviour of rebuilding the index on
+every turn, for comparison.
+
+Usage:
+    python -m benchmarks.chat_latency --sizes 50 200 800 --turns 10 [--rebuild]
+"""
+
+import argparse
+import json
+import time
+
+from benchmarks.common import summarize, synthetic_text, time_calls
+from main.modules.process_vector_store import get_vector_store, preprocess_text
+
+QUERIES = [
+    "What is the payment deadline?",
+    "Which clause covers renewal?",
+    "চুক্তির সময়সীমা কত?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 800],
+                        help="Document sizes in sentences")
+    parser.add_argument("--turns", type=int, default=10, help="Chat turns timed per size")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Also time rebuilding the index on every turn (old behaviour)")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        text = preprocess_text(synthetic_text(size, seed=size))
+
+        # Ingestion happens once per upload
+        start = time.perf_counter()
+        vector_store = get_vector_store(text)
+        build_seconds = time.perf_counter() - start
+
+        # A chat turn only embeds the query and searches the index
+        retriever = vector_store.as_retriever(search_kwargs={"k": 10})
+        turn = iter(range(args.turns))
+        per_turn = time_calls(lambda: retriever.invoke(QUERIES[next(turn) % len(QUERIES)]),
+                              repeat=args.turns)
+
+        row = {
+            "sentences": size,
+            "chunks": vector_store.index.ntotal,
+            "index_build_ms": round(build_seconds * 1000, 2),
+            "per_turn": summarize(per_turn),
+        }
+        if args.rebuild:
+            row["per_turn_rebuild"] = summarize(time_calls(lambda: get_vector_store(text), repeat=3))
+        results.append(row)
+        print(json.dumps(row, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
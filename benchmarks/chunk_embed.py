@@ -0,0 +1,99 @@
+"""
+Ingestion cost of the single-pass chunker versus SemanticChunker.
+
+The old path runs SemanticChunker (one embedding per sentence window) and then
+FAISS.from_documents (a second embedding per chunk). The new path embeds each
+sentence window once and derives the chunk vectors from those embeddings.
+Both paths use the raw model (no embedding cache) and count every text that
+goes through a model forward pass.
+
+Usage:
+    python -m benchmarks.chunk_embed --sizes 100 400 1600
+"""
+
+import argparse
+import json
+import time
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_experimental.text_splitter import SemanticChunker
+
+from benchmarks.common import synthetic_text
+from main.modules import process_vector_store, registry
+from main.modules.embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    """Embeddings wrapper counting model calls, embedded texts and characters.
+    Characters are a proxy for encoder compute, since chunks are much longer
+    than sentence windows."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.calls = 0
+        self.texts = 0
+        self.chars = 0
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        self.texts += len(texts)
+        self.chars += sum(len(text) for text in texts)
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        self.calls += 1
+        self.texts += 1
+        self.chars += len(text)
+        return self.embeddings.embed_query(text)
+
+
+def run_old(text, embeddings):
+    # Same sentence splitting as the new path so both embed the same windows
+    chunks = SemanticChunker(
+        embeddings,
+        breakpoint_threshold_type="percentile",
+        sentence_split_regex=process_vector_store.SENTENCE_SPLIT_REGEX
+    ).create_documents([text])
+    FAISS.from_documents(chunks, embeddings)
+    return len(chunks)
+
+
+def run_new(text, embeddings):
+    chunks, vectors = process_vector_store.chunk_and_embed([Document(page_content=text)])
+    process_vector_store.build_vector_store(chunks, vectors)
+    return len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 400, 1600],
+                        help="Document sizes in sentences")
+    args = parser.parse_args()
+
+    # Bypass the embedding cache so every text is a real forward pass
+    model = registry.get("embeddings")
+    if isinstance(model, CachedEmbeddings):
+        model = model.embeddings
+
+    for size in args.sizes:
+        text = process_vector_store.preprocess_text(synthetic_text(size, seed=size))
+        row = {"sentences": size}
+        for name, run in (("semantic_chunker", run_old), ("single_pass", run_new)):
+            counter = CountingEmbeddings(model)
+            registry._instances["embeddings"] = counter
+            start = time.perf_counter()
+            chunks = run(text, counter)
+            row[name] = {
+                "seconds": round(time.perf_counter() - start, 3),
+                "chunks": chunks,
+                "model_calls": counter.calls,
+                "texts_embedded": counter.texts,
+                "chars_embedded": counter.chars,
+            }
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
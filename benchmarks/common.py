@@ -0,0 +1,155 @@
+"""
+Shared helpers for the benchmark scripts: deterministic synthetic text,
+word recall of extracted text, simple latency and memory statistics and a
+local stub chat model.
+"""
+
+import asyncio
+import random
+import re
+import resource
+import statistics
+import sys
+import time
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Small bilingual vocabulary so generated documents exercise both scripts
+ENGLISH_WORDS = [
+    "contract", "payment", "deadline", "invoice", "policy", "customer", "report",
+    "amount", "delivery", "service", "account", "schedule", "budget", "review",
+    "approval", "document", "section", "clause", "renewal", "penalty",
+]
+BANGLA_WORDS = [
+    "চুক্তি", "পরিশোধ", "সময়সীমা", "চালান", "নীতি", "গ্রাহক", "প্রতিবেদন",
+    "পরিমাণ", "সরবরাহ", "সেবা", "হিসাব", "সময়সূচি", "বাজেট", "পর্যালোচনা",
+]
+
+
+# Generate deterministic synthetic text
+def synthetic_text(n_sentences: int, seed: int = 0, bangla_ratio: float = 0.3):
+    """Generate deterministic synthetic bilingual text.
+    Args:
+        n_sentences (int): Number of sentences to generate.
+        seed (int): Random seed so runs are reproducible.
+        bangla_ratio (float): Fraction of sentences written in Bangla.
+    Returns:
+        str: The generated text, one sentence per line."""
+
+    rng = random.Random(seed)
+    lines = []
+    for i in range(n_sentences):
+        if rng.random() < bangla_ratio:
+            words = rng.choices(BANGLA_WORDS, k=rng.randint(6, 14))
+            lines.append(" ".join(words) + f" {i}।")
+        else:
+            words = rng.choices(ENGLISH_WORDS, k=rng.randint(6, 14))
+            lines.append(" ".join(words).capitalize() + f" {i}.")
+    return "\n".join(lines)
+
+
+# Punctuation, including the Bangla danda, dropped before comparing words
+# Splitting on \w+ instead would cut Bangla words at their vowel signs
+PUNCTUATION = re.compile(r"[.,;:!?।\"'()]")
+
+
+# Fraction of the source words found in extracted text
+def word_recall(expected: str, text: str):
+    """Return the fraction of the words of a source text found in extracted (e.g. OCR'd) text.
+    Args:
+        expected (str): The source text.
+        text (str): The extracted text.
+    Returns:
+        float: Recall between 0 and 1, 0 if the source has no words."""
+
+    words = PUNCTUATION.sub(" ", expected).lower().split()
+    found = set(PUNCTUATION.sub(" ", text).lower().split())
+    return sum(word in found for word in words) / len(words) if words else 0.0
+
+
+# Time a callable several times
+def time_calls(func, repeat: int = 5):
+    """Call a function several times and collect wall-clock latencies.
+    Args:
+        func (callable): Zero-argument function to time.
+        repeat (int): Number of calls.
+    Returns:
+        list: Latencies in seconds."""
+
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# Summarise a list of latencies
+def summarize(latencies):
+    """Summarise latencies as p50/p95/p99/mean in milliseconds.
+    Args:
+        latencies (list): Latencies in seconds.
+    Returns:
+        dict: p50, p95, p99 and mean latency in milliseconds."""
+
+    ordered = sorted(latencies)
+
+    def percentile(q):
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 2),
+        "p95_ms": round(percentile(0.95) * 1000, 2),
+        "p99_ms": round(percentile(0.99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+    }
+
+
+# Peak resident set size of this process
+def peak_rss_mb():
+    """Return the peak resident set size of the current process.
+    Returns:
+        float: Peak RSS in MiB (ru_maxrss is in KiB on Linux and bytes on macOS)."""
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Chat model stand-in with a fixed per-token delay
+class StubChatModel(BaseChatModel):
+    """Local chat model that streams a fixed reply at a fixed token rate, so
+    latency measurements do not depend on a remote LLM.
+    Args:
+        reply (str): The reply; each whitespace-separated word is one token.
+        first_token_delay (float): Seconds before the first token.
+        token_delay (float): Seconds between tokens."""
+
+    reply: str = "The document answers this question in the cited section."
+    first_token_delay: float = 0.2
+    token_delay: float = 0.02
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub"
+
+    def _tokens(self):
+        words = self.reply.split(" ")
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.first_token_delay + self.token_delay * (len(self._tokens()) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.first_token_delay + self.token_delay * (len(self._tokens()) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.reply))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        for i, token in enumerate(self._tokens()):
+            await asyncio.sleep(self.first_token_delay if i == 0 else self.token_delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
@@ -0,0 +1,101 @@
+"""
+Skip rate and accuracy of the follow-up detection that gates query contextualization.
+
+Runs needs_contextualization() with CONTEXTUALIZE=auto on hand-labelled English
+and Bangla questions asked after one earlier turn. Each question is labelled as
+a follow-up (it needs the history to be understood, so the reformulation LLM
+call must run) or self-contained (the call can be skipped). Self-contained
+questions deliberately use common words like "this", "that", "and", "why" or
+"এই" in their non-anaphoric sense.
+
+It reports the skip rate, the missed follow-ups (skipped although the history
+was needed, which hurts retrieval) and the needless calls (self-contained
+questions still reformulated, which cost an LLM call and bypass the answer
+cache), with the reason given for every question.
+
+Usage:
+    python -m benchmarks.contextualize_eval [--verbose]
+"""
+
+import argparse
+import json
+import os
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+# (question, needs the history)
+LABELLED_QUESTIONS = [
+    # Self-contained questions using common words in their non-anaphoric sense
+    ("What is the payment deadline in this contract?", False),
+    ("Which invoices were issued by Rahman Traders and paid in March?", False),
+    ("Why was invoice INV-4471 rejected by the finance team?", False),
+    ("Is it possible to renew the lease after five years?", False),
+    ("What does clause 7 say about early termination fees?", False),
+    ("List the items that were delivered after the due date.", False),
+    ("How much more did the March order cost than the February order?", False),
+    ("Does this policy also cover water damage to the building?", False),
+    ("What is the total amount of invoice INV-2019 including VAT?", False),
+    ("Who signed the agreement between Karim Ltd and Dhaka Foods?", False),
+    ("Which products are priced above 5000 taka in the catalogue?", False),
+    ("Summarize the warranty terms and conditions of the contract.", False),
+    ("এই চুক্তির মেয়াদ কত বছরের জন্য?", False),
+    ("চালান INV-4471 এর মোট পরিমাণ কত টাকা?", False),
+    ("রহমান ট্রেডার্স কোন কোন পণ্য সরবরাহ করেছে আর কবে?", False),
+    ("ভাড়া পরিশোধের শেষ তারিখ কোন দিন নির্ধারিত?", False),
+    # Follow-ups that only make sense with the earlier turn
+    ("And what about the late payment penalty for that?", True),
+    ("What is its due date according to the schedule?", True),
+    ("When did they deliver the second batch of goods?", True),
+    ("Can you explain what this means in simpler words?", True),
+    ("How much did it cost before the discount was applied?", True),
+    ("What about the invoices from the previous quarter?", True),
+    ("Is that one already paid in full by the customer?", True),
+    ("Tell me more about the termination clause you mentioned.", True),
+    ("Does the same rule apply to the Chittagong branch?", True),
+    ("Who approved them and on which date exactly?", True),
+    ("Also, which supplier issued the cheapest of these?", True),
+    ("এটার দাম কত ছিল ডিসকাউন্টের আগে?", True),
+    ("তাহলে শেষ তারিখ কবে পর্যন্ত বাড়ানো যাবে?", True),
+    ("আগের চালানের মোট পরিমাণ কত ছিল?", True),
+    ("তাদের ঠিকানা কী চুক্তিতে দেওয়া আছে?", True),
+    ("আর জরিমানার পরিমাণ কত হবে তাহলে?", True),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--verbose", action="store_true", help="Print the decision for every question")
+    args = parser.parse_args()
+
+    # Read at import
+    os.environ["CONTEXTUALIZE"] = "auto"
+    from main.modules.rag_chat import needs_contextualization
+
+    history = [HumanMessage(content="What is the amount of invoice INV-4471?"),
+               AIMessage(content="Invoice INV-4471 is for 12,500 taka.")]
+
+    rows, reasons = [], {}
+    for question, follow_up in LABELLED_QUESTIONS:
+        called, reason = needs_contextualization(question, history)
+        reasons[reason] = reasons.get(reason, 0) + 1
+        rows.append({"question": question, "follow_up": follow_up, "called": called, "reason": reason})
+        if args.verbose:
+            print(json.dumps(rows[-1], ensure_ascii=False))
+
+    follow_ups = [row for row in rows if row["follow_up"]]
+    self_contained = [row for row in rows if not row["follow_up"]]
+    results = {
+        "questions": len(rows),
+        "skip_rate": round(sum(not row["called"] for row in rows) / len(rows), 4),
+        "self_contained_skipped": round(sum(not row["called"] for row in self_contained) / len(self_contained), 4),
+        "follow_ups_called": round(sum(row["called"] for row in follow_ups) / len(follow_ups), 4),
+        "missed_follow_ups": [row["question"] for row in follow_ups if not row["called"]],
+        "needless_calls": [{"question": row["question"], "reason": row["reason"]}
+                           for row in self_contained if row["called"]],
+        "reasons": reasons,
+    }
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Deterministic synthetic documents for the benchmarks.
+"""
+
+import io
+import random
+import re
+import sqlite3
+
+from docx import Document as DocxDocument
+from PIL import Image, ImageDraw, ImageFont, features
+from pypdf import PdfReader, PdfWriter
+
+from benchmarks.common import synthetic_text
+
+BENGALI = re.compile("[\u0980-\u09ff]")
+
+
+# Escape text for a PDF string literal
+def _pdf_string(text: str):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+# Build a born-digital PDF with a real text layer
+def digital_pdf(pages):
+    """Build a PDF whose pages carry an embedded (Helvetica) text layer.
+    Args:
+        pages (list): One string per page; ASCII text renders reliably.
+    Returns:
+        bytes: The PDF file."""
+
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Pages tree, filled in once the page objects are numbered
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        lines = " T* ".join(f"({_pdf_string(line)}) Tj" for line in text.splitlines())
+        stream = f"BT /F1 10 Tf 12 TL 40 800 Td {lines} ET"
+        objects.append(f"<< /Length {len(stream.encode('latin-1', 'replace'))} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1", "replace"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+# Render text into a page image, as a scanner would produce
+def render_page(text: str, width: int = 1240, height: int = 1754, font_size: int = 22, bangla_font: str = None):
+    """Render text onto a white page image.
+    Args:
+        text (str): The page text.
+        width (int): Image width in pixels.
+        height (int): Image height in pixels.
+        font_size (int): Font size in pixels.
+        bangla_font (str, optional): TrueType font for lines with Bengali
+            characters; the default font has no Bengali glyphs. Shaping the
+            conjuncts needs Pillow built with libraqm.
+    Returns:
+        PIL.Image.Image: The rendered grayscale page."""
+
+    img = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default(size=font_size)
+    bangla = font
+    if bangla_font:
+        layout = ImageFont.Layout.RAQM if features.check("raqm") else ImageFont.Layout.BASIC
+        bangla = ImageFont.truetype(bangla_font, font_size, layout_engine=layout)
+    y = 60
+    for line in text.splitlines():
+        draw.text((60, y), line, fill=0, font=bangla if BENGALI.search(line) else font)
+        y += int(font_size * 1.5)
+    return img
+
+
+# Build a scanned PDF: image-only pages with no text layer
+def scanned_pdf(pages, bangla_font: str = None):
+    """Build a PDF of rendered page images without a text layer.
+    Args:
+        pages (list): One string per page.
+        bangla_font (str, optional): TrueType font for Bengali lines, see render_page().
+    Returns:
+        bytes: The PDF file."""
+
+    images = [render_page(text, bangla_font=bangla_font) for text in pages]
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:], resolution=150)
+    return out.getvalue()
+
+
+# Build a PDF mixing born-digital and scanned pages
+def mixed_pdf(n_pages: int, scanned_every: int = 3, sentences_per_page: int = 20, seed: int = 0):
+    """Build a PDF where every `scanned_every`-th page is a scan.
+    Args:
+        n_pages (int): Number of pages.
+        scanned_every (int): Period of scanned pages (0 for none).
+        sentences_per_page (int): Sentences of English text per page.
+        seed (int): Random seed.
+    Returns:
+        tuple: (PDF bytes, list of page texts, list of scanned page numbers)"""
+
+    texts = [synthetic_text(sentences_per_page, seed=seed + page, bangla_ratio=0) for page in range(n_pages)]
+    scanned = [page for page in range(1, n_pages + 1) if scanned_every and page % scanned_every == 0]
+
+    writer = PdfWriter()
+    for page, text in enumerate(texts, start=1):
+        source = scanned_pdf([text]) if page in scanned else digital_pdf([text])
+        writer.add_page(PdfReader(io.BytesIO(source)).pages[0])
+    out = io.BytesIO()
+    writer.write(out)
+    return out.getvalue(), texts, scanned
+
+
+# Build records full of IDs, names and numbers with one lookup question each
+def records_corpus(n_records: int, filler_sentences: int = 3, seed: int = 0):
+    """Build bilingual invoice records and questions that each target one record.
+    Every record is surrounded by generic filler so that the IDs and numbers,
+    not the topic, are what tell records apart.
+    Args:
+        n_records (int): Number of records.
+        filler_sentences (int): Filler sentences around each record.
+        seed (int): Random seed.
+    Returns:
+        tuple: (list of record texts, list of (question, invoice ID) pairs)"""
+
+    rng = random.Random(seed)
+    names = ["Rahim Uddin", "Karim Ahmed", "Fatema Begum", "Nusrat Jahan", "Tanvir Hasan",
+             "রহিম উদ্দিন", "করিম আহমেদ", "ফাতেমা বেগম", "নুসরাত জাহান", "তানভীর হাসান"]
+    texts, questions = [], []
+    for i in range(n_records):
+        invoice = f"INV-{rng.randint(10000, 99999)}-{i}"
+        name = rng.choice(names)
+        amount = rng.randint(1000, 99999)
+        filler = synthetic_text(filler_sentences, seed=seed * 100003 + i)
+        if rng.random() < 0.3:
+            record = f"চালান {invoice} গ্রাহক {name} পরিমাণ {amount} টাকা।"
+            questions.append((f"চালান {invoice} এর পরিমাণ কত?", invoice))
+        else:
+            record = f"Invoice {invoice} was issued to {name} for {amount} taka."
+            questions.append((f"What is the amount on invoice {invoice}?", invoice))
+        texts.append(f"{filler}\n{record}")
+    return texts, questions
+
+
+# Write a bilingual plain-text file
+def write_txt(path: str, n_sentences: int, seed: int = 0, bangla_ratio: float = 0.3):
+    """Write synthetic Bangla/English text to a UTF-8 file.
+    Args:
+        path (str): Output file path.
+        n_sentences (int): Number of sentences.
+        seed (int): Random seed.
+        bangla_ratio (float): Fraction of Bangla sentences.
+    Returns:
+        str: The written text."""
+
+    text = synthetic_text(n_sentences, seed=seed, bangla_ratio=bangla_ratio)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return text
+
+
+# Write a bilingual DOCX file, one paragraph per few sentences
+def write_docx(path: str, n_sentences: int, seed: int = 0, sentences_per_paragraph: int = 5):
+    """Write synthetic Bangla/English paragraphs to a DOCX file.
+    Args:
+        path (str): Output file path.
+        n_sentences (int): Number of sentences.
+        seed (int): Random seed.
+        sentences_per_paragraph (int): Sentences per paragraph.
+    Returns:
+        str: The written text, paragraphs separated by newlines."""
+
+    lines = synthetic_text(n_sentences, seed=seed).splitlines()
+    paragraphs = [" ".join(lines[i:i + sentences_per_paragraph])
+                  for i in range(0, len(lines), sentences_per_paragraph)]
+    doc = DocxDocument()
+    for paragraph in paragraphs:
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+    return "\n".join(paragraphs)
+
+
+# Write a SQLite database of bilingual customer and invoice tables
+def write_sqlite(path: str, n_rows: int, tables: int = 2, seed: int = 0):
+    """Write a SQLite database with `tables` invoice tables of n_rows rows each.
+    Args:
+        path (str): Output file path (overwritten).
+        n_rows (int): Rows per table.
+        tables (int): Number of tables.
+        seed (int): Random seed.
+    Returns:
+        int: Total number of rows written."""
+
+    rng = random.Random(seed)
+    names = ["Rahim Uddin", "Karim Ahmed", "Fatema Begum", "রহিম উদ্দিন", "ফাতেমা বেগম", "নুসরাত জাহান"]
+    conn = sqlite3.connect(path)
+    try:
+        for table in range(tables):
+            name = f"invoices_{table}"
+            conn.execute(f"DROP TABLE IF EXISTS {name}")
+            conn.execute(f"CREATE TABLE {name} (id TEXT, customer TEXT, amount INTEGER, note TEXT)")
+            conn.executemany(f"INSERT INTO {name} VALUES (?, ?, ?, ?)", [
+                (f"INV-{table}-{i}", rng.choice(names), rng.randint(100, 99999),
+                 synthetic_text(1, seed=seed * 7919 + table * n_rows + i))
+                for i in range(n_rows)
+            ])
+        conn.commit()
+    finally:
+        conn.close()
+    return n_rows * tables
+
+
+# Write a rendered page image, as a phone photo or scan of a page
+def write_image(path: str, n_sentences: int = 30, seed: int = 0, scale: float = 1.0):
+    """Render English text into a PNG page image.
+    Args:
+        path (str): Output file path.
+        n_sentences (int): Sentences on the page.
+        seed (int): Random seed.
+        scale (float): Image size relative to an A4 page at 150 dpi.
+    Returns:
+        str: The rendered text."""
+
+    text = synthetic_text(n_sentences, seed=seed, bangla_ratio=0)
+    img = render_page(text, width=int(1240 * scale), height=int(1754 * scale), font_size=max(8, int(22 * scale)))
+    img.save(path)
+    return text
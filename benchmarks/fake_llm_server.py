@@ -0,0 +1,110 @@
+"""
+Local stand-in for a chat-completions API (Groq or OpenAI compatible).
+
+Answers every request with a fixed-length reply after a configurable time to
+first token and at a configurable token rate, both blocking and streamed, so
+the API can be load tested offline. Point the app at it with:
+
+    LLM_PROVIDER=groq   LLM_BASE_URL=http://127.0.0.1:9000 GROQ_API_KEY=unused
+    LLM_PROVIDER=openai LLM_BASE_URL=http://127.0.0.1:9000/v1
+
+Usage:
+    python -m benchmarks.fake_llm_server --port 9000 --first-token-ms 300 --tokens-per-s 80 --reply-tokens 60
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+WORDS = ["The", "document", "states", "that", "the", "payment", "is", "due", "within", "thirty", "days"]
+
+
+# Build the fake API
+def create_app(first_token_ms: float, tokens_per_s: float, reply_tokens: int):
+    """Create the fake chat-completions app.
+    Args:
+        first_token_ms (float): Milliseconds before the first token.
+        tokens_per_s (float): Tokens generated per second after the first one.
+        reply_tokens (int): Tokens per reply.
+    Returns:
+        FastAPI: The app."""
+
+    app = FastAPI(title="Fake chat-completions API")
+    tokens = [WORDS[i % len(WORDS)] if i == 0 else " " + WORDS[i % len(WORDS)] for i in range(reply_tokens)]
+    token_delay = 1 / tokens_per_s if tokens_per_s > 0 else 0.0
+    stats = {"requests": 0, "active": 0, "max_active": 0}
+
+    def usage(messages):
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in messages)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": reply_tokens,
+                "total_tokens": prompt_tokens + reply_tokens}
+
+    def chunk(completion_id, model, delta, finish_reason=None):
+        return "data: " + json.dumps({
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }) + "\n\n"
+
+    async def completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        stats["requests"] += 1
+        stats["active"] += 1
+        stats["max_active"] = max(stats["max_active"], stats["active"])
+
+        if body.get("stream"):
+            async def events():
+                try:
+                    await asyncio.sleep(first_token_ms / 1000)
+                    yield chunk(completion_id, model, {"role": "assistant", "content": ""})
+                    for i, token in enumerate(tokens):
+                        if i:
+                            await asyncio.sleep(token_delay)
+                        yield chunk(completion_id, model, {"content": token})
+                    yield chunk(completion_id, model, {}, "stop")
+                    yield "data: [DONE]\n\n"
+                finally:
+                    stats["active"] -= 1
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        try:
+            await asyncio.sleep(first_token_ms / 1000 + token_delay * max(0, reply_tokens - 1))
+        finally:
+            stats["active"] -= 1
+        return {
+            "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                         "finish_reason": "stop"}],
+            "usage": usage(body.get("messages", [])),
+        }
+
+    # Groq clients post under /openai/v1, OpenAI clients under /v1
+    app.add_api_route("/openai/v1/chat/completions", completions, methods=["POST"])
+    app.add_api_route("/v1/chat/completions", completions, methods=["POST"])
+    app.add_api_route("/stats", lambda: stats, methods=["GET"])
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=9000, help="Port to listen on")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Milliseconds before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=80, help="Token rate after the first token")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="Tokens per reply")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.first_token_ms, args.tokens_per_s, args.reply_tokens),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Health-check responsiveness while the server is busy with uploads.
+
+Sends several uploads concurrently to a running server and polls the health
+endpoint until every ingestion job is done or failed. Uploads return as soon
+as their job is queued, so each job is polled on /jobs/{job_id}. If blocking
+work leaks onto the event loop the health latency jumps to the length of an
+ingestion; with the work offloaded it stays in the low milliseconds.
+
+Usage:
+    uvicorn main.server.api:app &
+    python -m benchmarks.health_under_load --file scanned.pdf --uploads 8
+"""
+
+import argparse
+import json
+import mimetypes
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+from benchmarks.common import summarize
+
+
+# Upload one file and wait for its ingestion job
+def upload(base_url, file_path, timeout):
+    """Upload a file to the server and poll its job until it is done or failed.
+    Args:
+        base_url (str): The API base URL.
+        file_path (Path): The file to upload.
+        timeout (float): Seconds to wait for the job.
+    Returns:
+        tuple: (upload status code, job status, upload seconds, ingestion seconds)"""
+
+    # The upload response echoes the content type, so one is always sent
+    content_type = mimetypes.guess_type(file_path.name)[0] or "application/octet-stream"
+    start = time.perf_counter()
+    with open(file_path, "rb") as f:
+        response = requests.post(f"{base_url}/uploadfile", files={"file": (file_path.name, f, content_type)})
+    accepted = time.perf_counter() - start
+    if not response.ok:
+        return response.status_code, "rejected", accepted, accepted
+
+    job_id = response.json()["job_id"]
+    while True:
+        status = requests.get(f"{base_url}/jobs/{job_id}", timeout=60).json().get("status")
+        if status in ("done", "failed") or time.perf_counter() - start > timeout:
+            return response.status_code, status, accepted, time.perf_counter() - start
+        time.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--file", type=Path, required=True, help="File to upload (a scanned PDF is a good stress case)")
+    parser.add_argument("--uploads", type=int, default=8, help="Concurrent uploads")
+    parser.add_argument("--interval", type=float, default=0.05, help="Seconds between health checks")
+    parser.add_argument("--timeout", type=float, default=1800, help="Seconds to wait for each ingestion job")
+    args = parser.parse_args()
+
+    done = threading.Event()
+    health_latencies = []
+
+    # Poll the health endpoint until every ingestion job finishes
+    def poll_health():
+        while not done.is_set():
+            start = time.perf_counter()
+            requests.get(f"{args.url}/", timeout=60)
+            health_latencies.append(time.perf_counter() - start)
+            time.sleep(args.interval)
+
+    poller = threading.Thread(target=poll_health)
+    poller.start()
+    with ThreadPoolExecutor(max_workers=args.uploads) as pool:
+        uploads = list(pool.map(lambda _: upload(args.url, args.file, args.timeout), range(args.uploads)))
+    done.set()
+    poller.join()
+
+    print(json.dumps({
+        "uploads": args.uploads,
+        "upload_status": sorted({status for status, _, _, _ in uploads}),
+        "job_status": sorted({str(job_status) for _, job_status, _, _ in uploads}),
+        "upload": summarize([accepted for _, _, accepted, _ in uploads]),
+        "ingest": summarize([ingested for _, _, _, ingested in uploads]),
+        "health_checks": len(health_latencies),
+        "health": summarize(health_latencies),
+        "health_max_ms": round(max(health_latencies) * 1000, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
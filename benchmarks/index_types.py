@@ -0,0 +1,113 @@
+"""
+Recall versus latency versus memory of the FAISS index types.
+
+Builds every index type that process_vector_store.choose_index() can pick
+(flat, HNSW and IVF-PQ, the first two also with float16 storage) over the same
+synthetic embeddings. The embeddings are unit vectors drawn around --clusters
+topic centres, so neighbourhoods look like those of real chunk embeddings.
+Queries are perturbed copies of random chunks.
+
+For every index and search setting (efSearch for HNSW, nprobe for IVF-PQ) it
+reports recall@10 against exact search, single-query latency and the
+serialized bytes per vector, plus build and training time. It also reports the
+type that INDEX_TYPE=auto picks for --vectors under the current INDEX_* settings.
+
+Usage:
+    python -m benchmarks.index_types --vectors 100000 --dim 768 --queries 200
+"""
+
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from benchmarks.common import summarize
+from main.modules.process_vector_store import build_index, choose_index, set_search_params
+
+K = 10
+
+
+# Unit vectors around random topic centres
+def synthetic_embeddings(n: int, dim: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+# Search one query at a time, as a chat turn does
+def run_queries(index, queries):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], K)
+        latencies.append(time.perf_counter() - start)
+        results.append(ids[0])
+    return latencies, np.array(results)
+
+
+def recall_at_k(results, truth):
+    return round(float(np.mean([len(set(r) & set(t)) / K for r, t in zip(results, truth)])), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50000, help="Indexed vectors (chunks)")
+    parser.add_argument("--dim", type=int, default=768, help="Vector dimension")
+    parser.add_argument("--clusters", type=int, default=200, help="Topic centres of the synthetic vectors")
+    parser.add_argument("--queries", type=int, default=200, help="Queries timed per setting")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128], help="HNSW efSearch values")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64], help="IVF-PQ nprobe values")
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.vectors, args.dim, args.clusters)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(len(vectors), size=args.queries)]
+    queries = queries + 0.3 * rng.normal(size=queries.shape).astype(np.float32) / np.sqrt(args.dim)
+
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(vectors)
+    _, truth = exact.search(queries, K)
+
+    results = {"vectors": args.vectors, "dim": args.dim, "auto": choose_index(args.vectors, args.dim, "auto"),
+               "indexes": []}
+    for name, index_type, float16, settings in [
+        ("flat", "flat", False, [{}]),
+        ("flat_fp16", "flat", True, [{}]),
+        ("hnsw", "hnsw", False, [{"efSearch": ef} for ef in args.ef_search]),
+        ("hnsw_fp16", "hnsw", True, [{"efSearch": ef} for ef in args.ef_search]),
+        ("ivfpq", "ivfpq", False, [{"nprobe": nprobe} for nprobe in args.nprobe]),
+    ]:
+        params = choose_index(args.vectors, args.dim, index_type, float16)
+        if params["type"] != index_type:
+            print(json.dumps({"index": name, "skipped": f"too few vectors, would use {params['type']}"}), flush=True)
+            continue
+
+        start = time.perf_counter()
+        index, params = build_index(vectors, params)
+        build_seconds = time.perf_counter() - start
+        bytes_per_vector = round(faiss.serialize_index(index).size / args.vectors, 1)
+
+        for search in settings:
+            set_search_params(index, search)
+            latencies, found = run_queries(index, queries)
+            row = {
+                "index": name,
+                "factory": params["factory"],
+                "search": search,
+                "recall@10": recall_at_k(found, truth),
+                "latency": summarize(latencies),
+                "bytes_per_vector": bytes_per_vector,
+                "build_s": round(build_seconds, 2),
+                "train_vectors": params["train_vectors"],
+            }
+            results["indexes"].append(row)
+            print(json.dumps(row), flush=True)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
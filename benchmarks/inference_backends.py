@@ -0,0 +1,152 @@
+"""
+Accuracy versus speed of the inference backends for the embedder and the re-ranker.
+
+Uses a fixed local corpus of synthetic bilingual invoice records with one
+lookup question per record. For each backend it reports:
+
+    embedder: load time, embedding throughput, mean cosine similarity of the
+              record vectors to the fp32 torch vectors, dense recall@k of the
+              questions and top-10 overlap with the torch ranking
+    reranker: load time, latency per question for the candidate list, hit
+              rate of the right record in the top 3 and top-3 agreement with
+              the torch re-ranker
+
+The candidates re-ranked for every backend are the torch embedder's top
+--candidates, so re-ranker results differ only by the re-ranker backend.
+Set INFERENCE_THREADS, EMBED_BATCH_SIZE, RERANK_BATCH_SIZE and the
+*_MAX_SEQ_LENGTH variables to compare configurations.
+
+Usage:
+    python -m benchmarks.inference_backends --records 300 --backends torch torch-int8 onnx onnx-int8
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.common import summarize
+from benchmarks.corpus import records_corpus
+from main.modules.inference import BACKENDS
+from main.modules.process_vector_store import load_embedding_model, preprocess_text
+from main.modules.rag_chat import load_reranker
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+# Embed the corpus and questions with one backend
+def run_embedder(backend, texts, questions, ks):
+    """Embed records and questions and score dense retrieval.
+    Args:
+        backend (str): The inference backend.
+        texts (list): Record texts.
+        questions (list): One question per record, in the same order.
+        ks (list): Cut-offs for recall@k.
+    Returns:
+        tuple: (result dict, record vectors, question-by-record ranking)"""
+
+    start = time.perf_counter()
+    model = load_embedding_model(backend)
+    load_seconds = time.perf_counter() - start
+
+    model.embed_documents(texts[:8])  # warm-up
+    start = time.perf_counter()
+    doc_vectors = _normalize(model.embed_documents(texts))
+    embed_seconds = time.perf_counter() - start
+    query_latencies = []
+    query_vectors = []
+    for question in questions:
+        start = time.perf_counter()
+        query_vectors.append(model.embed_query(question))
+        query_latencies.append(time.perf_counter() - start)
+
+    ranking = np.argsort(-(_normalize(query_vectors) @ doc_vectors.T), axis=1)
+    ranks = [int(np.where(row == i)[0][0]) for i, row in enumerate(ranking)]
+    return {
+        "load_s": round(load_seconds, 2),
+        "texts_per_s": round(len(texts) / embed_seconds, 1),
+        "query_latency": summarize(query_latencies),
+        **{f"recall@{k}": round(sum(rank < k for rank in ranks) / len(ranks), 4) for k in ks},
+    }, doc_vectors, ranking
+
+
+# Re-rank the same candidates with one backend
+def run_reranker(backend, texts, questions, candidates):
+    """Score every question's candidates with the cross-encoder.
+    Args:
+        backend (str): The inference backend.
+        texts (list): Record texts.
+        questions (list): One question per record, in the same order.
+        candidates (np.ndarray): Candidate record indices per question.
+    Returns:
+        tuple: (result dict, top-3 record indices per question)"""
+
+    start = time.perf_counter()
+    reranker = load_reranker(backend).model
+    load_seconds = time.perf_counter() - start
+
+    latencies, top3 = [], []
+    for question, ids in zip(questions, candidates):
+        start = time.perf_counter()
+        scores = np.asarray(list(reranker.score([(question, texts[i]) for i in ids])))
+        latencies.append(time.perf_counter() - start)
+        top3.append([int(ids[j]) for j in np.argsort(-scores)[:3]])
+
+    hits = sum(i in top for i, top in enumerate(top3))
+    return {
+        "load_s": round(load_seconds, 2),
+        "latency_per_question": summarize(latencies),
+        "top3_hit_rate": round(hits / len(questions), 4),
+    }, top3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=300, help="Invoice records in the corpus")
+    parser.add_argument("--queries", type=int, default=100, help="Questions asked (one per record)")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS,
+                        help="Backends to compare; torch is always run as the reference")
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 3, 10], help="Cut-offs for recall@k")
+    parser.add_argument("--candidates", type=int, default=8, help="Candidates re-ranked per question")
+    args = parser.parse_args()
+
+    texts, pairs = records_corpus(args.records)
+    texts = [preprocess_text(text) for text in texts]
+    questions = [question for question, _ in pairs[:args.queries]]
+    backends = ["torch"] + [backend for backend in args.backends if backend != "torch"]
+
+    results = {"records": len(texts), "queries": len(questions), "embedder": {}, "reranker": {}}
+    reference = {}
+    for backend in backends:
+        row, doc_vectors, ranking = run_embedder(backend, texts, questions, args.ks)
+        if backend == "torch":
+            reference = {"vectors": doc_vectors, "ranking": ranking}
+        row["cosine_to_torch"] = round(float(np.mean(np.sum(doc_vectors * reference["vectors"], axis=1))), 4)
+        row["top10_overlap_with_torch"] = round(float(np.mean([
+            len(set(a[:10]) & set(b[:10])) / 10 for a, b in zip(ranking, reference["ranking"])
+        ])), 4)
+        results["embedder"][backend] = row
+        print(json.dumps({"embedder": backend, **row}), flush=True)
+
+    candidates = reference["ranking"][:, :args.candidates]
+    reference_top3 = None
+    for backend in backends:
+        row, top3 = run_reranker(backend, texts, questions, candidates)
+        if backend == "torch":
+            reference_top3 = top3
+        row["top3_agreement_with_torch"] = round(float(np.mean([
+            len(set(a) & set(b)) / 3 for a, b in zip(top3, reference_top3)
+        ])), 4)
+        results["reranker"][backend] = row
+        print(json.dumps({"reranker": backend, **row}), flush=True)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+End-to-end load test: concurrent sessions uploading documents and chatting.
+
+Each of --sessions concurrent virtual users uploads its own synthetic
+Bangla/English document to /uploadfile, waits for ingestion through
+/jobs/{job_id}, then sends --turns questions to /rag_chat. The server's
+resident memory (the API process and its worker processes, read from /proc)
+is sampled throughout.
+
+With --spawn the test starts the fake chat-completions server
+(benchmarks/fake_llm_server.py) and the API itself, pointed at each other, in a
+temporary working directory, so it runs fully offline. Otherwise it targets
+--url and samples the memory of --server-pid when given. Server settings such
+as ANSWER_CACHE or INGEST_WORKERS are taken from the environment.
+
+Reports throughput, p50/p95/p99 latency and error rate per endpoint and the
+memory samples as JSON.
+
+Usage:
+    python -m benchmarks.load_test --spawn --sessions 20 --turns 5 --first-token-ms 300
+    python -m benchmarks.load_test --url http://localhost:8000 --server-pid 1234 --sessions 20
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.common import summarize, synthetic_text
+
+QUERIES = [
+    "What is the payment deadline?",
+    "Which clause covers renewal?",
+    "What does the document say about the budget review?",
+    "চুক্তির সময়সীমা কত?",
+    "গ্রাহক সেবা সম্পর্কে কী বলা হয়েছে?",
+]
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Resident memory of a process and all its descendants
+def process_tree_rss_mb(pid: int):
+    """Sum VmRSS over a process and its descendants (Linux /proc).
+    Args:
+        pid (int): The root process ID.
+    Returns:
+        float: Resident memory in MiB, or None if the process is gone."""
+
+    total_kb, stack, seen = 0, [pid], set()
+    while stack:
+        current = stack.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    stack.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            if current == pid:
+                return None
+    return round(total_kb / 1024, 1)
+
+
+# Wait until a server answers
+def wait_until_up(url: str, process, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            requests.get(url, timeout=2)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.5)
+    raise TimeoutError(f"{url} did not come up within {timeout} seconds")
+
+
+# Start the fake LLM and the API as subprocesses
+def spawn_servers(args, workdir):
+    """Start the fake chat-completions server and the API pointed at it.
+    Args:
+        args (Namespace): Command line arguments.
+        workdir (str): Working directory for the API's sessions, indexes and caches.
+    Returns:
+        tuple: (API base URL, API process, fake LLM process)"""
+
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")]))}
+    llm = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.fake_llm_server", "--port", str(args.llm_port),
+        "--first-token-ms", str(args.first_token_ms), "--tokens-per-s", str(args.tokens_per_s),
+        "--reply-tokens", str(args.reply_tokens),
+    ], cwd=REPO_ROOT, env=env)
+    wait_until_up(f"http://127.0.0.1:{args.llm_port}/stats", llm, 60)
+
+    api_env = {**env, "LLM_PROVIDER": "groq", "LLM_BASE_URL": f"http://127.0.0.1:{args.llm_port}",
+               "GROQ_API_KEY": "unused"}
+    api = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main.server.api:app", "--host", "127.0.0.1",
+        "--port", str(args.port), "--log-level", "warning",
+    ], cwd=workdir, env=api_env)
+    url = f"http://127.0.0.1:{args.port}"
+    wait_until_up(f"{url}/", api, args.startup_timeout)
+    return url, api, llm
+
+
+# One virtual user: upload, wait for ingestion, chat
+def run_session(url: str, index: int, args, record):
+    """Run one session end to end, recording every request.
+    Args:
+        url (str): API base URL.
+        index (int): Session number, also the document seed.
+        args (Namespace): Command line arguments.
+        record (callable): Called with (endpoint, seconds, ok)."""
+
+    text = synthetic_text(args.sentences, seed=index if args.distinct_docs else 0)
+    start = time.perf_counter()
+    try:
+        response = requests.post(f"{url}/uploadfile", timeout=args.timeout,
+                                 files={"file": (f"doc_{index}.txt", text.encode("utf-8"), "text/plain")})
+        record("upload", time.perf_counter() - start, response.ok)
+        if not response.ok:
+            return
+        upload = response.json()
+    except requests.RequestException:
+        record("upload", time.perf_counter() - start, False)
+        return
+
+    # Ingestion time is measured from the upload until the job reports done
+    while True:
+        try:
+            job = requests.get(f"{url}/jobs/{upload['job_id']}", timeout=args.timeout).json()
+        except requests.RequestException:
+            job = {"status": "unknown"}
+        if job.get("status") in ("done", "failed") or time.perf_counter() - start > args.timeout:
+            record("ingest", time.perf_counter() - start, job.get("status") == "done")
+            break
+        time.sleep(0.2)
+    if job.get("status") != "done":
+        return
+
+    for turn in range(args.turns):
+        question = QUERIES[(index + turn) % len(QUERIES)]
+        start = time.perf_counter()
+        try:
+            response = requests.post(f"{url}/rag_chat", timeout=args.timeout, json={
+                "query": {"query": question}, "session_id": upload["session_id"],
+            })
+            record("rag_chat", time.perf_counter() - start, response.ok)
+        except requests.RequestException:
+            record("rag_chat", time.perf_counter() - start, False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL (ignored with --spawn)")
+    parser.add_argument("--server-pid", type=int, help="API process ID for memory sampling (ignored with --spawn)")
+    parser.add_argument("--spawn", action="store_true", help="Start the fake LLM and the API locally")
+    parser.add_argument("--port", type=int, default=8799, help="API port with --spawn")
+    parser.add_argument("--llm-port", type=int, default=9799, help="Fake LLM port with --spawn")
+    parser.add_argument("--first-token-ms", type=float, default=300, help="Fake LLM time to first token")
+    parser.add_argument("--tokens-per-s", type=float, default=80, help="Fake LLM token rate")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="Fake LLM tokens per reply")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions")
+    parser.add_argument("--turns", type=int, default=5, help="Chat turns per session")
+    parser.add_argument("--sentences", type=int, default=200, help="Sentences per uploaded document")
+    parser.add_argument("--same-doc", dest="distinct_docs", action="store_false",
+                        help="Upload the same document in every session")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="Seconds between memory samples")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-request and per-ingestion timeout")
+    parser.add_argument("--startup-timeout", type=float, default=600, help="Seconds to wait for the API to start")
+    parser.add_argument("--output", help="Write the JSON results to this file as well")
+    args = parser.parse_args()
+
+    workdir = tempfile.TemporaryDirectory()
+    api = llm = None
+    try:
+        if args.spawn:
+            url, api, llm = spawn_servers(args, workdir.name)
+            pid = api.pid
+        else:
+            url, pid = args.url.rstrip("/"), args.server_pid
+
+        requests_log = {}
+        log_lock = threading.Lock()
+
+        def record(endpoint, seconds, ok):
+            with log_lock:
+                requests_log.setdefault(endpoint, []).append((seconds, ok))
+
+        # Sample server memory until the sessions finish
+        done = threading.Event()
+        memory = []
+        started = time.perf_counter()
+
+        def sample_memory():
+            while pid and not done.is_set():
+                rss = process_tree_rss_mb(pid)
+                if rss is not None:
+                    memory.append({"t_s": round(time.perf_counter() - started, 1), "rss_mb": rss})
+                done.wait(args.sample_interval)
+
+        sampler = threading.Thread(target=sample_memory, daemon=True)
+        sampler.start()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            list(pool.map(lambda i: run_session(url, i, args, record), range(args.sessions)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        sampler.join()
+
+        endpoints = {}
+        for endpoint, entries in requests_log.items():
+            ok = [seconds for seconds, success in entries if success]
+            endpoints[endpoint] = {
+                "requests": len(entries),
+                "errors": len(entries) - len(ok),
+                "error_rate": round(1 - len(ok) / len(entries), 4),
+                "per_s": round(len(ok) / elapsed, 2),
+                **(summarize(ok) if ok else {}),
+            }
+
+        results = {
+            "sessions": args.sessions,
+            "turns": args.turns,
+            "elapsed_s": round(elapsed, 2),
+            "endpoints": endpoints,
+            "memory": {
+                "peak_rss_mb": max((sample["rss_mb"] for sample in memory), default=None),
+                "samples": memory,
+            },
+        }
+        if llm is not None:
+            results["fake_llm"] = requests.get(f"http://127.0.0.1:{args.llm_port}/stats", timeout=10).json()
+
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(output)
+        print(output)
+    finally:
+        for process in (api, llm):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+        workdir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
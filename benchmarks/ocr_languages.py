@@ -0,0 +1,86 @@
+"""
+Throughput and accuracy of per-page OCR script detection on a mixed corpus.
+
+Renders synthetic page images of three kinds, English-only, Bangla-only and
+mixed (about half the lines in each script), and OCRs every page twice with
+the OCR cache disabled:
+
+    fixed:  always OCR_LANGUAGE (ben+eng by default), the old behaviour
+    detect: the language packs chosen per page by detect_ocr_language()
+
+For each strategy and page kind it reports pages per second, the word recall
+of the OCR text against the rendered text and, for detect, the language packs
+chosen and the time spent on detection alone.
+
+Pillow's default font has no Bengali glyphs, so Bangla lines are drawn with
+--bangla-font (e.g. NotoSansBengali-Regular.ttf; Pillow with libraqm shapes the
+conjuncts correctly). Without one only the English pages are run. Tune
+OCR_SCRIPT_MIN_CONFIDENCE and OCR_DETECT_MAX_SIDE with this script.
+
+Usage:
+    python -m benchmarks.ocr_languages --pages 4 --bangla-font /usr/share/fonts/truetype/noto/NotoSansBengali-Regular.ttf
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.common import synthetic_text, word_recall
+from benchmarks.corpus import render_page
+
+KINDS = {"english": 0.0, "bangla": 1.0, "mixed": 0.5}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=4, help="Pages of each kind")
+    parser.add_argument("--sentences", type=int, default=20, help="Sentences per page")
+    parser.add_argument("--bangla-font", default=os.environ.get("BANGLA_FONT"),
+                        help="TrueType font with Bengali glyphs (default: $BANGLA_FONT)")
+    args = parser.parse_args()
+
+    # Read at import, so every page is really detected and OCR'd
+    os.environ["OCR_CACHE_DIR"] = ""
+    from main.modules.document_handler import OCR_LANGUAGE, detect_ocr_language, ocr_image
+
+    kinds = KINDS if args.bangla_font else {"english": KINDS["english"]}
+    if not args.bangla_font:
+        print("No --bangla-font given, running the English pages only", flush=True)
+
+    pages = {
+        kind: [(text, render_page(text, bangla_font=args.bangla_font))
+               for text in (synthetic_text(args.sentences, seed=page, bangla_ratio=ratio) for page in range(args.pages))]
+        for kind, ratio in kinds.items()
+    }
+
+    results = {"ocr_language": OCR_LANGUAGE, "pages_per_kind": args.pages, "kinds": {}}
+    for kind, rendered in pages.items():
+        row = {}
+        for strategy in ("fixed", "detect"):
+            recall, chosen = [], {}
+            start = time.perf_counter()
+            for text, img in rendered:
+                ocr_text, lang = ocr_image(img, OCR_LANGUAGE if strategy == "fixed" else None)
+                recall.append(word_recall(text, ocr_text))
+                chosen[lang] = chosen.get(lang, 0) + 1
+            seconds = time.perf_counter() - start
+            row[strategy] = {
+                "pages_per_s": round(len(rendered) / seconds, 3),
+                "word_recall": round(sum(recall) / len(recall), 4),
+                "languages": chosen,
+            }
+
+        start = time.perf_counter()
+        for _, img in rendered:
+            detect_ocr_language(img)
+        row["detect"]["detection_ms_per_page"] = round((time.perf_counter() - start) * 1000 / len(rendered), 2)
+        row["speedup"] = round(row["detect"]["pages_per_s"] / row["fixed"]["pages_per_s"], 3)
+        results["kinds"][kind] = row
+        print(json.dumps({"kind": kind, **row}, ensure_ascii=False), flush=True)
+
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
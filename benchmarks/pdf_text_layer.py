@@ -0,0 +1,71 @@
+"""
+PDF extraction: text layer first versus OCR on every page.
+
+Builds a mixed PDF of born-digital and scanned pages and extracts it twice on
+a fresh process pool: once with PDF_TEXT_LAYER=0 (OCR every page) and once
+with the text layer first. The OCR cache is disabled so both runs do real work.
+Reports time, OCR'd pages and word recall against the source text.
+
+Usage:
+    python -m benchmarks.pdf_text_layer --pages 30 --scanned-every 3
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import word_recall
+from benchmarks.corpus import mixed_pdf
+from main.modules import document_handler
+from main.modules.document_handler import extract_pdf_pages
+
+
+def run(pdf_path, texts, text_layer: bool, workers: int):
+    # Workers are spawned, so they pick up these settings at import
+    os.environ["PDF_TEXT_LAYER"] = "1" if text_layer else "0"
+    os.environ["OCR_CACHE_DIR"] = ""
+    # The text layers are read from this process's setting
+    document_handler.PDF_TEXT_LAYER = text_layer
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        start = time.perf_counter()
+        pages = extract_pdf_pages(pdf_path, executor=pool)
+        seconds = time.perf_counter() - start
+
+    recalls = [word_recall(text, page["text"]) for text, page in zip(texts, pages)]
+    return {
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(len(pages) / seconds, 2),
+        "ocr_pages": [page["page"] for page in pages if page["ocr"]],
+        "word_recall": round(sum(recalls) / len(recalls), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=30, help="Pages in the mixed PDF")
+    parser.add_argument("--scanned-every", type=int, default=3, help="Every N-th page is a scan")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Process pool size")
+    args = parser.parse_args()
+
+    data, texts, scanned = mixed_pdf(args.pages, scanned_every=args.scanned_every)
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(data)
+        pdf_path = f.name
+
+    try:
+        print(json.dumps({
+            "pages": args.pages,
+            "scanned_pages": scanned,
+            "ocr_all": run(pdf_path, texts, text_layer=False, workers=args.workers),
+            "text_layer_first": run(pdf_path, texts, text_layer=True, workers=args.workers),
+        }, indent=2))
+    finally:
+        os.remove(pdf_path)
+
+
+if __name__ == "__main__":
+    main()
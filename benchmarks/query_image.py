@@ -0,0 +1,97 @@
+"""
+Latency and payload size of the image-query path, before and after the fast path.
+
+Renders a synthetic English page as a large colour image (a phone photo or
+screenshot) and measures, per encoding (PNG and JPEG):
+
+    payload:   request bytes of the old client path (decode, re-encode as PNG,
+               base64 inside JSON) and of the multipart path (the file as is)
+    baseline:  the old server path: base64 decode, then tesseract on the
+               full-resolution image with OCR_LANGUAGE
+    fast:      extract_from_query_image on a cold cache (EXIF orientation,
+               grayscale, downscale to QUERY_IMAGE_MAX_SIDE, binarize, tesseract)
+    cached:    extract_from_query_image for an image seen before
+    preprocess: preprocess_for_ocr alone
+
+plus the word recall of both OCR outputs against the rendered text, so a
+QUERY_IMAGE_MAX_SIDE that is too small shows up as lost accuracy.
+
+Usage:
+    QUERY_IMAGE_MAX_SIDE=1600 python -m benchmarks.query_image --scale 2 --repeat 5
+"""
+
+import argparse
+import base64
+import json
+import os
+import tempfile
+from io import BytesIO
+
+from benchmarks.common import summarize, synthetic_text, time_calls, word_recall
+from benchmarks.corpus import render_page
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=30, help="Sentences on the rendered page")
+    parser.add_argument("--scale", type=float, default=2.0, help="Image size relative to an A4 page at 150 dpi")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per path")
+    args = parser.parse_args()
+
+    # Read at import, so every cold call below really runs OCR
+    cache_dir = tempfile.TemporaryDirectory()
+    os.environ["OCR_CACHE_DIR"] = cache_dir.name
+    from PIL import Image
+    from pytesseract import image_to_string
+    from main.modules import document_handler
+    from main.modules.document_handler import (OCR_LANGUAGE, QUERY_IMAGE_MAX_SIDE, extract_from_query_image,
+                                               preprocess_for_ocr)
+
+    text = synthetic_text(args.sentences, seed=1, bangla_ratio=0)
+    page = render_page(text, width=int(1240 * args.scale), height=int(1754 * args.scale),
+                       font_size=max(8, int(22 * args.scale))).convert("RGB")
+
+    results = {"image_size": list(page.size), "query_image_max_side": QUERY_IMAGE_MAX_SIDE,
+               "ocr_language": OCR_LANGUAGE, "encodings": {}}
+    for fmt in ("PNG", "JPEG"):
+        buffer = BytesIO()
+        page.save(buffer, format=fmt, quality=90)
+        data = buffer.getvalue()
+
+        # The old client re-encoded every image as PNG before base64
+        png = BytesIO()
+        Image.open(BytesIO(data)).save(png, format="PNG")
+        encoded = base64.b64encode(png.getvalue()).decode()
+        old_payload = json.dumps({"query": {"query": "", "image": encoded}, "session_id": "0" * 36}).encode()
+
+        def baseline():
+            return image_to_string(Image.open(BytesIO(base64.b64decode(encoded))), lang=OCR_LANGUAGE)
+
+        def fast_cold():
+            document_handler.OCR_CACHE_DIR = ""
+            try:
+                return extract_from_query_image(data)
+            finally:
+                document_handler.OCR_CACHE_DIR = cache_dir.name
+
+        row = {
+            "payload_bytes": {"json_base64_png": len(old_payload), "multipart": len(data)},
+            "preprocessed_size": list(preprocess_for_ocr(Image.open(BytesIO(data))).size),
+            "baseline": summarize(time_calls(baseline, repeat=args.repeat)),
+            "fast": summarize(time_calls(fast_cold, repeat=args.repeat)),
+            "preprocess": summarize(time_calls(lambda: preprocess_for_ocr(Image.open(BytesIO(data))),
+                                               repeat=args.repeat)),
+        }
+        extract_from_query_image(data)
+        row["cached"] = summarize(time_calls(lambda: extract_from_query_image(data), repeat=args.repeat))
+        row["word_recall"] = {"baseline": round(word_recall(text, baseline()), 4),
+                              "fast": round(word_recall(text, fast_cold()), 4)}
+        results["encodings"][fmt.lower()] = row
+        print(json.dumps({"encoding": fmt.lower(), **row}), flush=True)
+
+    cache_dir.cleanup()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Retrieval quality and latency: dense-only versus hybrid BM25 + dense.
+
+Indexes synthetic bilingual invoice records (IDs, names and amounts amid
+generic filler) and asks one lookup question per record. For each method it
+reports recall@k of the candidate list (for k beyond the candidate count,
+recall over all candidates), the hit rate of the re-ranked top documents the
+LLM sees, and the latency of candidate retrieval and of retrieval plus re-ranking.
+
+    dense:  FAISS top --dense-only-k, then the cross-encoder (the previous path)
+    hybrid: FAISS top DENSE_CANDIDATES and BM25 top SPARSE_CANDIDATES, fused with
+            reciprocal rank fusion to RERANK_CANDIDATES, then the cross-encoder
+
+Usage:
+    python -m benchmarks.retrieval_eval --records 300 --queries 100
+"""
+
+import argparse
+import json
+import time
+
+from langchain_core.documents import Document
+
+from benchmarks.common import summarize
+from benchmarks.corpus import records_corpus
+from main.modules import registry
+from main.modules.hybrid_search import build_bm25, hybrid_search
+from main.modules.process_vector_store import index_documents, preprocess_text
+from main.modules.rag_chat import DENSE_CANDIDATES, RERANK_CANDIDATES, RRF_K, SPARSE_CANDIDATES
+
+
+# Evaluate one retrieval method over all questions
+def evaluate(retrieve, questions, ks):
+    """Run every question through a retrieval function and the re-ranker.
+    Args:
+        retrieve (callable): Maps a question to a candidate list, best first.
+        questions (list): (question, invoice ID) pairs.
+        ks (list): Cut-offs for recall@k.
+    Returns:
+        dict: Recall@k, re-ranked hit rate and latencies."""
+
+    reranker = registry.get("reranker")
+    hits = {k: 0 for k in ks}
+    reranked_hits = 0
+    candidate_latencies, total_latencies = [], []
+    for question, invoice in questions:
+        start = time.perf_counter()
+        candidates = retrieve(question)
+        retrieved = time.perf_counter()
+        top = reranker.compress_documents(candidates, question) if candidates else []
+        done = time.perf_counter()
+
+        candidate_latencies.append(retrieved - start)
+        total_latencies.append(done - start)
+        ranks = [i for i, doc in enumerate(candidates) if invoice in doc.page_content]
+        for k in ks:
+            hits[k] += bool(ranks and ranks[0] < k)
+        reranked_hits += any(invoice in doc.page_content for doc in top)
+
+    n = len(questions)
+    return {
+        "candidates": len(candidates),
+        **{f"recall@{k}": round(hits[k] / n, 4) for k in ks},
+        "reranked_hit_rate": round(reranked_hits / n, 4),
+        "retrieval_latency": summarize(candidate_latencies),
+        "end_to_end_latency": summarize(total_latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=300, help="Invoice records in the corpus")
+    parser.add_argument("--queries", type=int, default=100, help="Questions asked (one per record)")
+    parser.add_argument("--ks", type=int, nargs="+", default=[1, 3, 5, 10], help="Cut-offs for recall@k")
+    parser.add_argument("--dense-only-k", type=int, default=10, help="Candidates re-ranked by the dense-only path")
+    args = parser.parse_args()
+
+    texts, questions = records_corpus(args.records)
+    questions = questions[:args.queries]
+
+    start = time.perf_counter()
+    vector_store = index_documents(Document(page_content=preprocess_text(text)) for text in texts)
+    index_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    bm25 = build_bm25(vector_store)
+    bm25_seconds = time.perf_counter() - start
+
+    registry.get("reranker")
+    print(json.dumps({
+        "records": args.records,
+        "queries": len(questions),
+        "chunks": vector_store.index.ntotal,
+        "faiss_build_s": round(index_seconds, 3),
+        "bm25_build_s": round(bm25_seconds, 3),
+        "dense": evaluate(lambda q: vector_store.similarity_search(q, k=args.dense_only_k), questions, args.ks),
+        "hybrid": evaluate(lambda q: hybrid_search(vector_store, bm25, q, DENSE_CANDIDATES, SPARSE_CANDIDATES,
+                                                   RERANK_CANDIDATES, RRF_K), questions, args.ks),
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
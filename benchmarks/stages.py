@@ -0,0 +1,308 @@
+"""
+Stage-level benchmark suite for the ingestion and chat pipeline.
+
+Generates deterministic synthetic inputs (Bangla/English TXT and DOCX, SQLite
+databases, rendered page images and PDFs) and times each pipeline stage in
+isolation: extraction per format, query image OCR, preprocess_text, semantic_text_splitter,
+chunk embedding, FAISS and BM25 index builds, hybrid retrieval, re-ranking and
+a full rag_chat() turn against a local stub LLM.
+
+Every stage runs in its own spawned process, so its peak RSS is not inflated
+by earlier stages (it does include the imports and models the stage needs).
+Inputs are built and models loaded before timing; each stage is warmed up
+once and then timed --repeat times. The embedding, OCR and answer caches are
+disabled so every call does real work.
+
+Results are written as JSON with p50/p95/mean latency, throughput and peak RSS
+per stage, plus the commit and machine they were measured on. Pass the JSON of
+an earlier run as --baseline to add the p50 change per stage.
+
+Usage:
+    python -m benchmarks.stages --output stages.json [--stages extract_db rerank] [--baseline old.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import StubChatModel, peak_rss_mb, summarize, synthetic_text, time_calls
+from benchmarks import corpus
+
+QUERIES = [
+    "What is the payment deadline?",
+    "Which clause covers renewal?",
+    "What is the amount on invoice INV-0-42?",
+    "চুক্তির সময়সীমা কত?",
+    "গ্রাহক রহিম উদ্দিন এর পরিমাণ কত?",
+]
+
+
+# Inputs shared by the retrieval stages: chunks, vectors and indexes of one text document
+def _indexed_text(params):
+    from langchain_core.documents import Document
+    from main.modules.hybrid_search import build_bm25
+    from main.modules.process_vector_store import build_vector_store, chunk_and_embed, preprocess_text
+
+    text = preprocess_text(synthetic_text(params["sentences"], seed=1))
+    chunks, vectors = chunk_and_embed([Document(page_content=text)])
+    vector_store = build_vector_store(chunks, vectors)
+    return chunks, vectors, vector_store, build_bm25(vector_store)
+
+
+def _next_query():
+    queries = iter(range(1 << 30))
+    return lambda: QUERIES[next(queries) % len(QUERIES)]
+
+
+# Each stage builds its inputs and returns (callable to time, units per call, unit name)
+def stage_extract_txt(params, workdir):
+    from main.modules.document_handler import extract_from_txt
+
+    path = os.path.join(workdir, "doc.txt")
+    corpus.write_txt(path, params["sentences"], seed=1)
+    return lambda: extract_from_txt(path), os.path.getsize(path), "bytes"
+
+
+def stage_extract_docx(params, workdir):
+    from main.modules.document_handler import extract_from_docx
+
+    path = os.path.join(workdir, "doc.docx")
+    text = corpus.write_docx(path, params["sentences"], seed=1)
+    return lambda: extract_from_docx(path), len(text.encode("utf-8")), "bytes"
+
+
+def stage_extract_db(params, workdir):
+    from main.modules.document_handler import iter_db_documents
+
+    path = os.path.join(workdir, "doc.sqlite")
+    rows = corpus.write_sqlite(path, params["rows"], seed=1)
+    return lambda: sum(1 for _ in iter_db_documents(path)), rows, "rows"
+
+
+def stage_ocr_image(params, workdir):
+    from main.modules.document_handler import extract_from_image
+
+    path = os.path.join(workdir, "page.png")
+    corpus.write_image(path, seed=1)
+    return lambda: extract_from_image(path), 1, "pages"
+
+
+def stage_ocr_query_image(params, workdir):
+    from main.modules.document_handler import extract_from_query_image
+
+    path = os.path.join(workdir, "query.png")
+    corpus.write_image(path, seed=1, scale=2.0)
+    with open(path, "rb") as f:
+        data = f.read()
+    return lambda: extract_from_query_image(data), 1, "images"
+
+
+def stage_extract_pdf_text_layer(params, workdir):
+    from main.modules.document_handler import read_text_layers
+
+    path = os.path.join(workdir, "digital.pdf")
+    pages = [synthetic_text(20, seed=page, bangla_ratio=0) for page in range(params["pages"])]
+    with open(path, "wb") as f:
+        f.write(corpus.digital_pdf(pages))
+    return lambda: read_text_layers(path), len(pages), "pages"
+
+
+def stage_extract_pdf_ocr(params, workdir):
+    from main.modules.document_handler import ocr_pdf_page
+
+    path = os.path.join(workdir, "scanned.pdf")
+    pages = [synthetic_text(20, seed=page, bangla_ratio=0) for page in range(params["pages"])]
+    with open(path, "wb") as f:
+        f.write(corpus.scanned_pdf(pages))
+    return lambda: [ocr_pdf_page(path, page) for page in range(1, len(pages) + 1)], len(pages), "pages"
+
+
+def stage_preprocess_text(params, workdir):
+    from main.modules.process_vector_store import preprocess_text
+
+    text = synthetic_text(params["sentences"], seed=1)
+    return lambda: preprocess_text(text), len(text.encode("utf-8")), "bytes"
+
+
+def stage_semantic_text_splitter(params, workdir):
+    from main.modules import registry
+    from main.modules.process_vector_store import preprocess_text, semantic_text_splitter
+
+    registry.get("embeddings")
+    text = preprocess_text(synthetic_text(params["sentences"], seed=1))
+    return lambda: semantic_text_splitter(text), params["sentences"], "sentences"
+
+
+def stage_embed_chunks(params, workdir):
+    from main.modules.process_vector_store import embed_chunks
+
+    chunks, _, _, _ = _indexed_text(params)
+    return lambda: embed_chunks(chunks), len(chunks), "chunks"
+
+
+def stage_build_faiss(params, workdir):
+    from main.modules.process_vector_store import build_vector_store
+
+    chunks, vectors, _, _ = _indexed_text(params)
+    return lambda: build_vector_store(chunks, vectors), len(chunks), "chunks"
+
+
+def stage_build_bm25(params, workdir):
+    from main.modules.hybrid_search import build_bm25
+
+    chunks, _, vector_store, _ = _indexed_text(params)
+    return lambda: build_bm25(vector_store), len(chunks), "chunks"
+
+
+def stage_hybrid_search(params, workdir):
+    from main.modules.hybrid_search import hybrid_search
+    from main.modules.rag_chat import DENSE_CANDIDATES, RERANK_CANDIDATES, RRF_K, SPARSE_CANDIDATES
+
+    _, _, vector_store, bm25 = _indexed_text(params)
+    query = _next_query()
+    return (lambda: hybrid_search(vector_store, bm25, query(), DENSE_CANDIDATES, SPARSE_CANDIDATES,
+                                  RERANK_CANDIDATES, RRF_K)), 1, "queries"
+
+
+def stage_rerank(params, workdir):
+    from main.modules import registry
+    from main.modules.hybrid_search import hybrid_search
+    from main.modules.rag_chat import DENSE_CANDIDATES, RERANK_CANDIDATES, RRF_K, SPARSE_CANDIDATES
+
+    _, _, vector_store, bm25 = _indexed_text(params)
+    reranker = registry.get("reranker")
+    candidates = [(q, hybrid_search(vector_store, bm25, q, DENSE_CANDIDATES, SPARSE_CANDIDATES,
+                                    RERANK_CANDIDATES, RRF_K)) for q in QUERIES]
+    turn = iter(range(1 << 30))
+
+    def rerank():
+        q, docs = candidates[next(turn) % len(candidates)]
+        return reranker.compress_documents(docs, q)
+
+    return rerank, 1, "queries"
+
+
+def stage_rag_chat(params, workdir):
+    from main.modules import registry
+    from main.modules.rag_chat import rag_chat
+
+    registry.register("llm", lambda: StubChatModel(first_token_delay=0.0, token_delay=0.0))
+    registry.get("rag_chain")
+    _, _, vector_store, bm25 = _indexed_text(params)
+    query = _next_query()
+    return lambda: rag_chat(query(), [], vector_store, bm25), 1, "queries"
+
+
+STAGES = {
+    "extract_txt": stage_extract_txt,
+    "extract_docx": stage_extract_docx,
+    "extract_db": stage_extract_db,
+    "ocr_image": stage_ocr_image,
+    "ocr_query_image": stage_ocr_query_image,
+    "extract_pdf_text_layer": stage_extract_pdf_text_layer,
+    "extract_pdf_ocr": stage_extract_pdf_ocr,
+    "preprocess_text": stage_preprocess_text,
+    "semantic_text_splitter": stage_semantic_text_splitter,
+    "embed_chunks": stage_embed_chunks,
+    "build_faiss": stage_build_faiss,
+    "build_bm25": stage_build_bm25,
+    "hybrid_search": stage_hybrid_search,
+    "rerank": stage_rerank,
+    "rag_chat": stage_rag_chat,
+}
+
+
+# Run one stage in the current (freshly spawned) process
+def run_stage(name: str, params: dict):
+    """Build a stage's inputs, warm it up and time it.
+    Args:
+        name (str): Stage name from STAGES.
+        params (dict): Input sizes and repeat count.
+    Returns:
+        dict: Latency summary, throughput, units and peak RSS."""
+
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        run, units, unit = STAGES[name](params, workdir)
+        setup_seconds = time.perf_counter() - start
+
+        run()
+        latencies = time_calls(run, repeat=params["repeat"])
+        latency = summarize(latencies)
+        return {
+            **latency,
+            "units_per_call": units,
+            "unit": unit,
+            f"{unit}_per_s": round(units / (latency["p50_ms"] / 1000), 2) if latency["p50_ms"] else None,
+            "setup_s": round(setup_seconds, 2),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+# Describe where the results were measured
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES), help="Stages to run")
+    parser.add_argument("--sentences", type=int, default=400, help="Sentences in the TXT/DOCX and indexed text")
+    parser.add_argument("--rows", type=int, default=5000, help="Rows per table in the SQLite database")
+    parser.add_argument("--pages", type=int, default=4, help="Pages in the PDFs")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per stage")
+    parser.add_argument("--output", help="Write the JSON results to this file as well")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    # Spawned stage processes read these at import
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+    os.environ["OCR_CACHE_DIR"] = ""
+    os.environ["ANSWER_CACHE"] = "0"
+
+    params = {"sentences": args.sentences, "rows": args.rows, "pages": args.pages, "repeat": args.repeat}
+    results = {"environment": environment(), "params": params, "stages": {}}
+    for name in args.stages:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            try:
+                results["stages"][name] = pool.submit(run_stage, name, params).result()
+            except Exception as e:
+                results["stages"][name] = {"error": f"{type(e).__name__}: {e}"}
+        print(json.dumps({"stage": name, **results["stages"][name]}, ensure_ascii=False), flush=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        results["baseline"] = {"commit": baseline.get("environment", {}).get("commit"),
+                               "params": baseline.get("params")}
+        for name, row in results["stages"].items():
+            old = baseline.get("stages", {}).get(name, {})
+            if old.get("p50_ms") and row.get("p50_ms") is not None:
+                row["p50_change"] = round(row["p50_ms"] / old["p50_ms"] - 1, 4)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Time to first token: streaming versus blocking chat.
+
+Starts the API in-process with a stub LLM that streams a fixed reply at a
+fixed token rate, indexes a synthetic document into a session, then times
+chat turns against /rag_chat (the whole answer arrives at once) and
+/rag_chat/stream (sources, then tokens, then the final history).
+
+Usage:
+    python -m benchmarks.stream_ttft --turns 10 --first-token-delay 0.3 --token-delay 0.02
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+
+import requests
+import uvicorn
+
+from langchain_core.messages import AIMessage
+
+# The queries repeat across turns, so the answer cache would serve every turn after the
+# first few; it is read at import, before the app modules below
+os.environ["ANSWER_CACHE"] = "0"
+
+from benchmarks.common import StubChatModel, summarize, synthetic_text
+import main.modules.rag_chat  # noqa: F401  (registers the real factories first)
+from main.modules import registry
+from main.modules.index_store import save_index
+from main.modules.process_vector_store import get_vector_store, preprocess_text
+from main.server.api import app
+from main.server.session import session_state
+
+QUERIES = [
+    "What is the payment deadline?",
+    "Which clause covers renewal?",
+    "চুক্তির সময়সীমা কত?",
+]
+
+
+# Run the API on a background thread
+def start_server(port: int):
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread
+
+
+# Time one streamed turn
+def stream_turn(base_url, session_id, query):
+    """Send one chat turn to the streaming endpoint.
+    Returns:
+        dict: Seconds until the sources event, the first token and the done event."""
+
+    timings = {}
+    start = time.perf_counter()
+    payload = {"query": {"query": query}, "session_id": session_id}
+    with requests.post(f"{base_url}/rag_chat/stream", json=payload, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(decode_unicode=True):
+            if not line.startswith("event: "):
+                continue
+            event = line[len("event: "):]
+            if event == "error":
+                raise RuntimeError("Streaming chat failed")
+            key = {"sources": "sources", "token": "first_token", "done": "done"}.get(event)
+            if key and key not in timings:
+                timings[key] = time.perf_counter() - start
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10, help="Chat turns timed per endpoint")
+    parser.add_argument("--sentences", type=int, default=200, help="Size of the indexed document")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Stub LLM delay before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Stub LLM delay between tokens")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the in-process server")
+    args = parser.parse_args()
+
+    registry.register("llm", lambda: StubChatModel(
+        reply=" ".join(["word"] * 60),
+        first_token_delay=args.first_token_delay,
+        token_delay=args.token_delay,
+    ))
+
+    server, thread = start_server(args.port)
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        session_id = str(uuid.uuid4())
+        session_state[session_id] = {
+            "chat_history": [AIMessage(content="Hello! How can I assist you today?")],
+            "index_key": save_index(get_vector_store(preprocess_text(synthetic_text(args.sentences)))),
+            "status": "ready",
+        }
+
+        blocking = []
+        for turn in range(args.turns):
+            start = time.perf_counter()
+            response = requests.post(f"{base_url}/rag_chat", json={
+                "query": {"query": QUERIES[turn % len(QUERIES)]}, "session_id": session_id,
+            })
+            response.raise_for_status()
+            blocking.append(time.perf_counter() - start)
+
+        streamed = [stream_turn(base_url, session_id, QUERIES[turn % len(QUERIES)])
+                    for turn in range(args.turns)]
+
+        print(json.dumps({
+            "turns": args.turns,
+            "blocking": {"first_token": summarize(blocking), "total": summarize(blocking)},
+            "streaming": {
+                "sources": summarize([t["sources"] for t in streamed]),
+                "first_token": summarize([t["first_token"] for t in streamed]),
+                "total": summarize([t["done"] for t in streamed]),
+            },
+        }, indent=2))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-from io import BytesIO
+import time
 import streamlit as st
 import requests
-import base64
+import json
 from PIL import Image
 
 # Configure page
@@ -18,12 +18,13 @@ if 'messages' not in st.session_state:
 
 
 # Helper functions
-def upload_file(file):
+def upload_file(file, session_id=None):
     """
     Upload a file to the backend API for processing.
 
     Args:
         file (UploadedFile): The file object selected by the user in Streamlit.
+        session_id (str, optional): Add the file to this existing session instead of starting a new one.
 
     Returns:
         tuple: (success (bool), response (dict or str))
@@ -32,31 +33,113 @@ def upload_file(file):
     """
     try:
         files = {"file": (file.name, file.getvalue(), file.type)}
-        response = requests.post(f"{API_BASE_URL}/uploadfile", files=files)
-        return response.status_code == 200, response.json() if response.status_code == 200 else response.text
+        data = {"session_id": session_id} if session_id else None
+        response = requests.post(f"{API_BASE_URL}/uploadfile", files=files, data=data)
+        return response.status_code == 202, response.json() if response.status_code == 202 else response.text
     except Exception as e:
         return False, str(e)
 
-def send_message(query, session_id):
+def wait_for_job(job_id, poll_interval=1.0):
     """
-    Send a chat message (and optional image) to the backend RAG chat API.
+    Poll the backend until an ingestion job finishes.
+
+    Args:
+        job_id (str): The job ID returned by the upload endpoint.
+        poll_interval (float): Seconds between status checks.
+
+    Returns:
+        tuple: (success (bool), response (dict or str))
+            - success: True if the document was indexed, False otherwise.
+            - response: The final job status if successful, or error message string.
+    """
+    try:
+        while True:
+            response = requests.get(f"{API_BASE_URL}/jobs/{job_id}")
+            if response.status_code != 200:
+                return False, response.text
+            job = response.json()
+            if job["status"] == "done":
+                return True, job
+            if job["status"] == "failed":
+                return False, job["error"]
+            time.sleep(poll_interval)
+    except Exception as e:
+        return False, str(e)
+
+def list_documents(session_id):
+    """
+    List the documents of a chat session.
 
     Args:
-        query (dict): The user query and optional image in base64 format.
         session_id (str): The current chat session ID.
 
+    Returns:
+        list: The session's documents, or an empty list if they could not be fetched.
+    """
+    try:
+        response = requests.get(f"{API_BASE_URL}/sessions/{session_id}/documents")
+        return response.json()["documents"] if response.status_code == 200 else []
+    except Exception:
+        return []
+
+def remove_document(session_id, doc_id):
+    """
+    Remove a document from a chat session.
+
+    Args:
+        session_id (str): The current chat session ID.
+        doc_id (str): The document to remove.
+
     Returns:
         tuple: (success (bool), response (dict or str))
-            - success: True if the chat request succeeded, False otherwise.
-            - response: JSON response from the API if successful, or error message string.
     """
     try:
-        payload = {"query": query, "session_id": session_id}
-        response = requests.post(f"{API_BASE_URL}/rag_chat", json=payload)
+        response = requests.delete(f"{API_BASE_URL}/sessions/{session_id}/documents/{doc_id}")
         return response.status_code == 200, response.json() if response.status_code == 200 else response.text
     except Exception as e:
         return False, str(e)
 
+def stream_message(query, session_id, state, image=None):
+    """
+    Stream a chat answer from the backend RAG chat streaming API.
+
+    Yields answer tokens as they arrive so the UI can render them immediately.
+    The final chat history, or an error message, is stored in `state`.
+
+    Args:
+        query (str): The user query.
+        session_id (str): The current chat session ID.
+        state (dict): Receives "response" on success or "error" on failure.
+        image (UploadedFile, optional): An image sent as is in a multipart request.
+
+    Yields:
+        str: Answer tokens.
+    """
+    try:
+        # The image bytes are posted as they are, without re-encoding or base64
+        data = {"query": query, "session_id": session_id}
+        files = {"image": (image.name, image.getvalue(), image.type)} if image else None
+        with requests.post(f"{API_BASE_URL}/rag_chat/stream/multipart", data=data, files=files,
+                           stream=True) as response:
+            if response.status_code != 200:
+                state["error"] = response.text
+                return
+
+            event = None
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    data = json.loads(line[len("data: "):])
+                    if event == "token":
+                        yield data["token"]
+                    elif event == "done":
+                        state["response"] = data["response"]
+                    elif event == "error":
+                        state["error"] = data["detail"]
+    except Exception as e:
+        state["error"] = str(e)
+
 # Main UI
 st.title("🤖 RAG Chat Assistant")
 
@@ -74,6 +157,10 @@ if not st.session_state.session_id:
         if st.button("Process Document", type="primary"):
             with st.spinner("Processing document..."):
                 success, result = upload_file(uploaded_file)
+                if success:
+                    success, job = wait_for_job(result["job_id"])
+                    if not success:
+                        result = job
                 
                 if success:
                     st.session_state.session_id = result['session_id']
@@ -87,6 +174,35 @@ if not st.session_state.session_id:
 
 # Chat interface
 else:
+    # Documents in this session
+    with st.sidebar:
+        st.markdown("### Documents")
+        for doc in list_documents(st.session_state.session_id):
+            col1, col2 = st.columns([4, 1])
+            with col1:
+                st.write(f"{doc['filename']} ({doc['status']})")
+            with col2:
+                if st.button("✖", key=f"remove_{doc['doc_id']}", help="Remove from this session"):
+                    success, result = remove_document(st.session_state.session_id, doc["doc_id"])
+                    if not success:
+                        st.error(f"Error: {result}")
+                    st.rerun()
+
+        new_file = st.file_uploader(
+            "Add a document",
+            type=['pdf', 'txt', 'docx', 'doc', 'jpg', 'jpeg', 'png', 'db', 'sqlite'],
+            key="add_document"
+        )
+        if new_file and st.button("Add to Chat"):
+            with st.spinner("Processing document..."):
+                success, result = upload_file(new_file, session_id=st.session_state.session_id)
+                if success:
+                    success, result = wait_for_job(result["job_id"])
+                if success:
+                    st.rerun()
+                else:
+                    st.error(f"Error: {result}")
+
     # Display message history
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
@@ -106,17 +222,11 @@ else:
         )
 
     if user_query or uploaded_image:
-        image_base64 = None
         display_image = None
         
         # Handle image if uploaded
         if uploaded_image:
-            image = Image.open(uploaded_image)
-            display_image = image.copy()
-            
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            image_base64 = base64.b64encode(buffered.getvalue()).decode()
+            display_image = Image.open(uploaded_image).copy()
         
         # Add user message to session state
         user_message = {
@@ -135,26 +245,17 @@ else:
             if display_image:
                 st.image(display_image, caption="Uploaded Image", use_container_width=True)
         
-        # Create API payload
-        prompt = {
-            "query": user_query if user_query else "",
-            "image": image_base64 if image_base64 else None
-        }
-        
-        # Get AI response
-        with st.spinner("Thinking..."):
-            success, result = send_message(query=prompt, session_id=st.session_state.session_id)
-            
-            if success:
-                response = result["response"]
-                st.session_state.messages.append({"role": "assistant", "content": response})
-                
-                with st.chat_message("assistant"):
-                    st.write(response)
-                
-                st.rerun()  # This will reset the file uploader
-            else:
-                st.error(f"Error: {result}")
+        # Stream the AI response as it is generated
+        state = {}
+        with st.chat_message("assistant"):
+            st.write_stream(stream_message(query=user_query if user_query else "", session_id=st.session_state.session_id,
+                                           state=state, image=uploaded_image))
+
+        if "response" in state:
+            st.session_state.messages.append({"role": "assistant", "content": state["response"]})
+            st.rerun()  # This will reset the file uploader
+        else:
+            st.error(f"Error: {state.get('error', 'No response generated')}")
     
     # Action buttons
     col1, col2 = st.columns(2)
@@ -0,0 +1,191 @@
+"""
+Semantic cache of answers to repeated and near-duplicate questions.
+Entries are scoped to an index key, the content hash of a session's indexed
+documents, so an answer is only reused for the same set of documents. Questions
+match exactly after normalization or by the cosine similarity of their embeddings.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from main.modules import registry
+from main.modules.embedding_cache import normalize_text
+
+# Set ANSWER_CACHE=0 to answer every question with the full RAG chain
+ANSWER_CACHE = os.environ.get("ANSWER_CACHE", "1") == "1"
+
+# Minimum cosine similarity between question embeddings for a near-duplicate hit
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("ANSWER_CACHE_THRESHOLD", 0.95))
+
+# Seconds a cached answer stays valid
+ANSWER_CACHE_TTL = float(os.environ.get("ANSWER_CACHE_TTL", 3600))
+
+# Maximum cached answers; least recently used entries are evicted beyond it
+ANSWER_CACHE_SIZE = int(os.environ.get("ANSWER_CACHE_SIZE", 2048))
+
+
+# Tokens containing digits: IDs, amounts and dates
+NUMBER_TOKEN_REGEX = re.compile(r"[\w\u0980-\u09FF-]*[\d\u09E6-\u09EF][\w\u0980-\u09FF-]*")
+
+
+# Exact-match key for a question: case, spacing and trailing punctuation are ignored
+def question_key(question: str):
+    return normalize_text(question).casefold().rstrip("?.!। ")
+
+
+# IDs and numbers in a question; embeddings barely separate questions that differ only in these
+def question_numbers(question: str):
+    return frozenset(NUMBER_TOKEN_REGEX.findall(question.casefold()))
+
+
+class AnswerCache:
+    """In-memory answer cache with TTL and LRU eviction, shared by all sessions.
+    Args:
+        threshold (float): Minimum cosine similarity for a near-duplicate hit.
+        ttl (float): Seconds an entry stays valid.
+        max_entries (int): Maximum number of entries.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_ms = 0.0
+        # (index key, normalized question) -> entry, least recently used first
+        self._entries = OrderedDict()
+        # index key -> {normalized question: entry}, to search one key's entries only
+        self._by_index = {}
+        self._lock = threading.Lock()
+
+    # Unit-length question embedding, so a dot product is the cosine similarity
+    def _embed(self, question: str):
+        vector = np.asarray(registry.get("embeddings").embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        scoped = self._by_index.get(key[0])
+        if scoped is not None:
+            scoped.pop(key[1], None)
+            if not scoped:
+                del self._by_index[key[0]]
+
+    def _hit(self, key, entry, similarity: float, start: float, metrics):
+        self._entries.move_to_end(key)
+        lookup_ms = (time.perf_counter() - start) * 1000
+        saved_ms = max(0.0, entry["cost_ms"] - lookup_ms)
+        self.hits += 1
+        self.saved_ms += saved_ms
+        if metrics is not None:
+            metrics["answer_cache"] = "hit"
+            metrics["answer_cache_similarity"] = round(similarity, 4)
+            metrics["answer_cache_question"] = entry["question"]
+            metrics["answer_cache_saved_ms"] = round(saved_ms, 2)
+        return entry
+
+    # Find a cached answer for a question
+    def lookup(self, index_key: str, question: str, metrics=None):
+        """Return the cached entry for a question, or None on a miss.
+        Exact matches skip the question embedding; near-duplicates are matched
+        by cosine similarity among the entries of the same index key that
+        mention the same IDs and numbers.
+        Args:
+            index_key (str): The session's index key.
+            question (str): The question.
+            metrics (dict, optional): Filled with the cache outcome of the turn.
+        Returns:
+            tuple: (entry dict with "answer" and "sources", or None; question embedding, or None)"""
+
+        start = time.perf_counter()
+        key = (index_key, question_key(question))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry["created"] <= self.ttl:
+                return self._hit(key, entry, 1.0, start, metrics), None
+
+        vector = self._embed(question)
+        numbers = question_numbers(question)
+        now = time.time()
+        with self._lock:
+            best_key, best_similarity = None, -1.0
+            for text, entry in list(self._by_index.get(index_key, {}).items()):
+                if now - entry["created"] > self.ttl:
+                    self._drop((index_key, text))
+                    continue
+                if entry["numbers"] != numbers:
+                    continue
+                similarity = float(np.dot(entry["vector"], vector))
+                if similarity > best_similarity:
+                    best_key, best_similarity = (index_key, text), similarity
+
+            if best_key is not None and best_similarity >= self.threshold:
+                return self._hit(best_key, self._entries[best_key], best_similarity, start, metrics), vector
+
+            self.misses += 1
+        if metrics is not None:
+            metrics["answer_cache"] = "miss"
+        return None, vector
+
+    # Store the answer to a question
+    def store(self, index_key: str, question: str, vector, answer: str, sources, cost_ms: float):
+        """Cache an answer.
+        Args:
+            index_key (str): The session's index key.
+            question (str): The question.
+            vector (np.ndarray): Its embedding from lookup(), or None to compute it.
+            answer (str): The generated answer.
+            sources (list): The retrieved documents the answer was based on.
+            cost_ms (float): Time taken to produce the answer, reported as saved on later hits."""
+
+        if vector is None:
+            vector = self._embed(question)
+        key = (index_key, question_key(question))
+        entry = {"question": question, "vector": vector, "numbers": question_numbers(question), "answer": answer, "sources": sources, "cost_ms": cost_ms, "created": time.time()}
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = entry
+            self._by_index.setdefault(index_key, {})[key[1]] = entry
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    # Count a turn that could not use the cache
+    def bypass(self, reason: str, metrics=None):
+        with self._lock:
+            self.bypassed += 1
+        if metrics is not None:
+            metrics["answer_cache"] = "bypass"
+            metrics["answer_cache_reason"] = reason
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_index.clear()
+
+    def stats(self):
+        """Return cache counters for this process.
+        Returns:
+            dict: hits, misses, bypassed turns, hit rate over lookups, total
+                latency saved in milliseconds and current entries."""
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "saved_ms": round(self.saved_ms, 2),
+                "entries": len(self._entries),
+            }
+
+
+answer_cache = AnswerCache(ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_TTL, ANSWER_CACHE_SIZE)
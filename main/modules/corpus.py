@@ -0,0 +1,271 @@
+"""
+Shared corpus of documents indexed once for all sessions.
+With SHARED_CORPUS=1 every uploaded document is identified by its content hash
+(doc_id) and its chunks are embedded and indexed once, whatever the number of
+sessions that upload it. Each document is saved as its own index through
+index_store, so it gets the index type chosen for its size and is loaded
+lazily into the LRU of resident indexes like any other index. The corpus only
+records which index holds each doc_id. Sessions reference doc ids; retrieval
+searches the indexes of the session's documents and merges the results.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict
+
+import numpy as np
+from langchain_core.documents import Document
+from rank_bm25 import BM25Okapi
+
+from main.modules import registry
+from main.modules.hybrid_search import tokenize
+from main.modules.index_store import index_exists, load_index, save_index
+from main.modules.process_vector_store import EMBEDDING_MODEL_ID
+
+# Ingest new documents into the shared corpus instead of per-session indexes
+SHARED_CORPUS = os.environ.get("SHARED_CORPUS", "0") == "1"
+
+# Directory holding one record (doc_id -> index key) per document, per embedding model
+CORPUS_DIR = os.environ.get("CORPUS_DIR", "corpus")
+
+# Number of document selections (sessions' document sets) kept with their BM25 index
+MAX_CORPUS_SELECTIONS = int(os.environ.get("MAX_CORPUS_SELECTIONS", 64))
+
+# Prefix of the index keys of sessions reading from the shared corpus
+CORPUS_KEY_PREFIX = "corpus-"
+
+
+# Key of a session's documents in the shared corpus
+def corpus_key(filenames: Dict[str, str]):
+    """Compute the index key of a session reading a set of corpus documents.
+    The key also covers the file names the session gave them, so the answer
+    cache, which is scoped by this key, never returns an answer citing another
+    session's file names.
+    Args:
+        filenames (dict): The session's file name by doc_id of its indexed documents.
+    Returns:
+        str: The key, or None if there are no documents."""
+
+    if not filenames:
+        return None
+    digest = hashlib.sha256(EMBEDDING_MODEL_ID.encode("utf-8"))
+    for doc_id in sorted(filenames):
+        digest.update(f"\0{doc_id}\0{filenames[doc_id]}".encode("utf-8"))
+    return CORPUS_KEY_PREFIX + digest.hexdigest()
+
+
+def is_corpus_key(key: str):
+    """Whether an index key refers to documents in the shared corpus."""
+
+    return bool(key) and key.startswith(CORPUS_KEY_PREFIX)
+
+
+class CorpusView:
+    """The chunks of one session's documents, searchable like its own FAISS vector store.
+    Chunks are returned with the session's file name as their source.
+    Args:
+        selection (dict): The documents' index keys, chunk IDs and BM25 index from SharedCorpus.
+        filenames (dict): The session's file name by doc_id."""
+
+    def __init__(self, selection: Dict, filenames: Dict[str, str]):
+        self.selection = selection
+        self.filenames = filenames
+        # hybrid_search reads chunks through vector_store.docstore.search()
+        self.docstore = self
+
+    # BM25 corpus order: (index key, docstore ID) of every chunk, set by SharedCorpus.bm25()
+    @property
+    def index_to_docstore_id(self):
+        return self.selection["ids"]
+
+    def search(self, chunk_id):
+        """Return a chunk by its (index key, docstore ID)."""
+
+        key, docstore_id = chunk_id
+        return self._label(load_index(key).docstore.search(docstore_id))
+
+    def _label(self, doc: Document):
+        source = self.filenames.get(doc.metadata.get("doc_id"), doc.metadata.get("source"))
+        return Document(page_content=doc.page_content, metadata={**doc.metadata, "source": source}, id=doc.id)
+
+    def similarity_search(self, query: str, k: int = 4):
+        """Return the k chunks of the session's documents nearest to the query.
+        Each document's index is searched for its own top k, then the results
+        are merged by distance."""
+
+        vector = np.asarray([registry.get("embeddings").embed_query(query)], dtype=np.float32)
+        hits = []
+        for key in self.selection["keys"]:
+            vector_store = load_index(key)
+            distances, positions = vector_store.index.search(vector, k)
+            hits.extend((distance, position, vector_store)
+                        for distance, position in zip(distances[0], positions[0]) if position >= 0)
+        hits.sort(key=lambda hit: hit[0])
+        return [self._label(vector_store.docstore.search(vector_store.index_to_docstore_id[int(position)]))
+                for _, position, vector_store in hits[:k]]
+
+
+class SharedCorpus:
+    """Records of the index holding each unique document.
+    Records are small JSON files, read once; the indexes themselves are
+    loaded on demand by index_store.
+    Args:
+        directory (str): Directory for the document records."""
+
+    def __init__(self, directory: str):
+        model_hash = hashlib.sha256(EMBEDDING_MODEL_ID.encode("utf-8")).hexdigest()[:16]
+        self.directory = os.path.join(directory, model_hash)
+        self.records: Dict[str, Dict] = {}
+        self.deduplicated = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._selections: "OrderedDict[tuple, Dict]" = OrderedDict()
+
+    def _record_path(self, doc_id: str):
+        return os.path.join(self.directory, f"{doc_id}.json")
+
+    # Read the document records
+    def load(self):
+        """Read the document records, once. Reads from disk, so call this off the event loop."""
+
+        with self._lock:
+            if self._loaded:
+                return
+            names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+            for name in names:
+                if name.endswith(".json") and not name.startswith("."):
+                    with open(os.path.join(self.directory, name)) as f:
+                        self.records[name[:-len(".json")]] = json.load(f)
+            self._loaded = True
+
+    # Drop a document whose index was purged
+    def _forget(self, doc_id: str):
+        with self._lock:
+            self.records.pop(doc_id, None)
+        try:
+            os.remove(self._record_path(doc_id))
+        except FileNotFoundError:
+            pass
+
+    def has(self, doc_id: str):
+        """Whether a document is already in the corpus, counting it as a
+        deduplicated upload if so. Loads the records on first use.
+        A document whose index was purged is forgotten, so it is indexed again."""
+
+        self.load()
+        record = self.records.get(doc_id)
+        if record is None:
+            return False
+        if not index_exists(record["index_key"]):
+            self._forget(doc_id)
+            return False
+        with self._lock:
+            self.deduplicated += 1
+        return True
+
+    # Add a document's chunks to the corpus
+    def add(self, doc_id: str, vector_store):
+        """Save a document's chunks as its own index and record it under its doc_id.
+        Args:
+            doc_id (str): The document ID (content hash).
+            vector_store (FAISS): The document's chunks with a flat index.
+        Returns:
+            str: The key of the document's index."""
+
+        self.load()
+        key = save_index(vector_store)
+        record = {"index_key": key, "chunks": vector_store.index.ntotal}
+
+        # Written to a temporary file and renamed, so a restart never reads a partial record
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        with open(tmp_path, "w") as f:
+            json.dump(record, f)
+        os.replace(tmp_path, self._record_path(doc_id))
+        with self._lock:
+            self.records[doc_id] = record
+        return key
+
+    # Index keys and BM25 index of a set of documents
+    def _selection(self, doc_ids):
+        selection_key = tuple(sorted(doc_ids))
+        with self._lock:
+            selection = self._selections.get(selection_key)
+            if selection is not None:
+                self._selections.move_to_end(selection_key)
+                return selection
+
+        keys = []
+        for doc_id in selection_key:
+            record = self.records.get(doc_id)
+            if record is None or not index_exists(record["index_key"]):
+                raise FileNotFoundError(f"Document {doc_id} is not in the shared corpus")
+            keys.append(record["index_key"])
+        selection = {"keys": keys, "ids": None, "bm25": None}
+
+        with self._lock:
+            self._selections[selection_key] = selection
+            while len(self._selections) > MAX_CORPUS_SELECTIONS:
+                self._selections.popitem(last=False)
+        return selection
+
+    # Get the view of a session's documents
+    def view(self, filenames: Dict[str, str]):
+        """Return a searchable view of some documents in the corpus.
+        Reads from disk, so call this off the event loop.
+        Args:
+            filenames (dict): The session's file name by doc_id of its indexed documents.
+        Returns:
+            CorpusView: The documents' chunks.
+        Raises:
+            FileNotFoundError: If a document is no longer in the corpus."""
+
+        self.load()
+        return CorpusView(self._selection(filenames), filenames)
+
+    # Get the BM25 index of a view's chunks
+    def bm25(self, view: CorpusView):
+        """Return the BM25 index over a view's chunks, built on first use.
+        Loads the documents' indexes, so call this off the event loop.
+        Args:
+            view (CorpusView): The view from view().
+        Returns:
+            BM25Okapi: The BM25 index, or None if the view has no chunks."""
+
+        selection = view.selection
+        if selection["ids"] is None:
+            ids, texts = [], []
+            for key in selection["keys"]:
+                vector_store = load_index(key)
+                for i in range(vector_store.index.ntotal):
+                    docstore_id = vector_store.index_to_docstore_id[i]
+                    ids.append((key, docstore_id))
+                    texts.append(vector_store.docstore.search(docstore_id).page_content)
+            selection["bm25"] = BM25Okapi([tokenize(text) for text in texts]) if texts else None
+            selection["ids"] = ids
+        return selection["bm25"]
+
+    # Drop the records of documents whose index was purged
+    def purge(self):
+        """Forget documents whose index no longer exists, e.g. after purge_indexes().
+        Reads from disk, so call this off the event loop."""
+
+        self.load()
+        for doc_id, record in list(self.records.items()):
+            if not index_exists(record["index_key"], touch=False):
+                self._forget(doc_id)
+
+    def stats(self):
+        """Return the number of documents and chunks in the corpus and the uploads deduplicated."""
+
+        with self._lock:
+            return {"documents": len(self.records),
+                    "chunks": sum(record["chunks"] for record in self.records.values()),
+                    "deduplicated": self.deduplicated}
+
+
+shared_corpus = SharedCorpus(CORPUS_DIR)
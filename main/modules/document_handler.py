@@ -1,9 +1,62 @@
+import hashlib
 import os
 import sqlite3
+import tempfile
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from urllib.request import pathname2url
 from docx import Document
-from bangla_pdf_ocr import process_pdf
-from PIL import Image
-from pytesseract import image_to_string
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image, ImageOps
+from pypdf import PdfReader
+from pytesseract import image_to_osd, image_to_string
+
+# OCR language packs and rasterization resolution for scanned pages
+# OCR_LANGUAGE is also the fallback for pages whose script cannot be told apart
+OCR_LANGUAGE = os.environ.get("OCR_LANGUAGE", "ben+eng")
+OCR_DPI = int(os.environ.get("OCR_DPI", 150))
+
+# Per-page script detection: tesseract's orientation and script detection (OSD)
+# runs on a copy downscaled to OCR_DETECT_MAX_SIDE pixels and the dominant script
+# is mapped to its language packs ("Script:packs,..."). Pages with an unmapped
+# script or a script confidence below OCR_SCRIPT_MIN_CONFIDENCE, typically mixed
+# Bangla/English pages, are OCR'd with OCR_LANGUAGE
+OCR_SCRIPT_DETECTION = os.environ.get("OCR_SCRIPT_DETECTION", "1") != "0"
+OCR_SCRIPT_LANGUAGES = dict(
+    item.strip().split(":", 1)
+    for item in os.environ.get("OCR_SCRIPT_LANGUAGES", "Latin:eng,Bengali:ben").split(",") if ":" in item
+)
+OCR_SCRIPT_MIN_CONFIDENCE = float(os.environ.get("OCR_SCRIPT_MIN_CONFIDENCE", 2.0))
+OCR_DETECT_MAX_SIDE = int(os.environ.get("OCR_DETECT_MAX_SIDE", 1200))
+
+# Directory for cached OCR results, keyed by page content hash (empty to disable)
+OCR_CACHE_DIR = os.environ.get("OCR_CACHE_DIR", "cache/ocr")
+
+# Images sent with a chat query are downscaled so their longer side is at most
+# this many pixels (0 to keep full resolution), converted to grayscale and,
+# unless disabled, binarized before OCR
+QUERY_IMAGE_MAX_SIDE = int(os.environ.get("QUERY_IMAGE_MAX_SIDE", 1600))
+QUERY_IMAGE_BINARIZE = os.environ.get("QUERY_IMAGE_BINARIZE", "1") != "0"
+
+# EXIF tag holding a photo's camera orientation
+ORIENTATION_TAG = 0x0112
+
+# Read a PDF page's embedded text layer before falling back to OCR
+PDF_TEXT_LAYER = os.environ.get("PDF_TEXT_LAYER", "1") != "0"
+
+# A text layer is usable if it has at least this many non-space characters
+# and at most this fraction of unusable glyphs (replacement, private-use, control)
+MIN_TEXT_LAYER_CHARS = int(os.environ.get("MIN_TEXT_LAYER_CHARS", 20))
+MAX_GARBAGE_RATIO = float(os.environ.get("MAX_GARBAGE_RATIO", 0.2))
+
+# SQLite streaming: rows per fetchmany call, rows/bytes per emitted document,
+# and per-table caps (0 for no cap)
+DB_BATCH_ROWS = int(os.environ.get("DB_BATCH_ROWS", 1000))
+DB_ROWS_PER_DOCUMENT = int(os.environ.get("DB_ROWS_PER_DOCUMENT", 50))
+DB_DOCUMENT_BYTES = int(os.environ.get("DB_DOCUMENT_BYTES", 8000))
+DB_MAX_ROWS_PER_TABLE = int(os.environ.get("DB_MAX_ROWS_PER_TABLE", 100000))
+DB_MAX_BYTES_PER_TABLE = int(os.environ.get("DB_MAX_BYTES_PER_TABLE", 50 * 1024 * 1024))
 
 
 def extract_text_from_file(file_path: bytes, ext: str):
@@ -24,9 +77,344 @@ def extract_text_from_file(file_path: bytes, ext: str):
         raise ValueError("Unsupported file type")
        
        
-# Extract text from PDF file using bangla-pdf-ocr
+# Read a cached OCR result
+def ocr_cache_get(key: str):
+    """Return the cached OCR text for a content hash, or None."""
+
+    if not OCR_CACHE_DIR:
+        return None
+    path = os.path.join(OCR_CACHE_DIR, key[:2], f"{key}.txt")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+# Store an OCR result in the cache
+# Written to a temporary file and renamed so concurrent workers never see partial text
+def ocr_cache_put(key: str, text: str):
+    """Cache the OCR text for a content hash."""
+
+    if not OCR_CACHE_DIR:
+        return
+    directory = os.path.join(OCR_CACHE_DIR, key[:2])
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, os.path.join(directory, f"{key}.txt"))
+
+
+# Hash an image's pixels, the OCR cache key of a page regardless of its file format
+def image_digest(img):
+    digest = hashlib.sha256()
+    digest.update(f"{img.mode}\0{img.size}\0".encode())
+    digest.update(img.tobytes())
+    return digest.hexdigest()
+
+
+def _cache_key(*parts):
+    return hashlib.sha256("\0".join(str(part) for part in parts).encode()).hexdigest()
+
+
+# Settings that change which language packs a page is OCR'd with
+def _language_settings():
+    return (OCR_LANGUAGE, OCR_SCRIPT_DETECTION, sorted(OCR_SCRIPT_LANGUAGES.items()), OCR_SCRIPT_MIN_CONFIDENCE,
+            OCR_DETECT_MAX_SIDE)
+
+
+# Read the dominant script from tesseract's OSD output
+def parse_osd(osd: str):
+    """Parse the "Script" and "Script confidence" lines of tesseract OSD output.
+    Args:
+        osd (str): The output of pytesseract.image_to_osd().
+    Returns:
+        tuple: (script name or None, script confidence)"""
+
+    fields = {}
+    for line in osd.splitlines():
+        if ":" in line:
+            name, value = line.split(":", 1)
+            fields[name.strip()] = value.strip()
+    try:
+        confidence = float(fields.get("Script confidence", 0))
+    except ValueError:
+        confidence = 0.0
+    return fields.get("Script") or None, confidence
+
+
+# Choose the OCR language packs of an image from its dominant script
+def detect_ocr_language(img, digest: str = None):
+    """Pick the tesseract language packs for one page or image, e.g. "eng" for
+    an English-only page instead of evaluating both models with "ben+eng".
+    The choice is cached by image content hash.
+    Args:
+        img (PIL.Image.Image): The image.
+        digest (str, optional): The image's image_digest(), if already computed.
+    Returns:
+        str: The language packs, OCR_LANGUAGE when the script is unclear."""
+
+    if not OCR_SCRIPT_DETECTION or "+" not in OCR_LANGUAGE:
+        return OCR_LANGUAGE
+
+    key = _cache_key("script", *_language_settings(), digest or image_digest(img))
+    lang = ocr_cache_get(key)
+    if lang:
+        return lang
+
+    sample = img.convert("L")
+    if OCR_DETECT_MAX_SIDE and max(sample.size) > OCR_DETECT_MAX_SIDE:
+        sample.thumbnail((OCR_DETECT_MAX_SIDE, OCR_DETECT_MAX_SIDE))
+    try:
+        script, confidence = parse_osd(image_to_osd(sample))
+    except Exception:
+        # OSD refuses pages with too few characters, and needs the osd language pack
+        script, confidence = None, 0.0
+
+    lang = OCR_LANGUAGE
+    if confidence >= OCR_SCRIPT_MIN_CONFIDENCE:
+        lang = OCR_SCRIPT_LANGUAGES.get(script, OCR_LANGUAGE)
+    ocr_cache_put(key, lang)
+    return lang
+
+
+# OCR a PIL image, reusing the cached result for identical pixels
+def ocr_image(img, lang: str = None):
+    """OCR an image with pytesseract, cached by image content hash.
+    Args:
+        img (PIL.Image.Image): The image.
+        lang (str, optional): Tesseract language packs, chosen by
+            detect_ocr_language() when not given.
+    Returns:
+        tuple: (recognized text, language packs used)"""
+
+    digest = image_digest(img)
+    lang = lang or detect_ocr_language(img, digest)
+    key = _cache_key(lang, digest)
+
+    text = ocr_cache_get(key)
+    if text is None:
+        text = image_to_string(img, lang=lang)
+        ocr_cache_put(key, text)
+    return text, lang
+
+
+# Otsu's threshold of a grayscale image, from its histogram
+def otsu_threshold(img):
+    """Return the gray level that best separates text from background.
+    Args:
+        img (PIL.Image.Image): A grayscale ("L") image.
+    Returns:
+        int: The threshold (0-255)."""
+
+    histogram = img.histogram()
+    total = sum(histogram)
+    weighted_total = sum(level * count for level, count in enumerate(histogram))
+    background = weighted_background = 0
+    best_threshold, best_variance = 127, -1.0
+    for level, count in enumerate(histogram):
+        background += count
+        if background == 0:
+            continue
+        foreground = total - background
+        if foreground == 0:
+            break
+        weighted_background += level * count
+        mean_background = weighted_background / background
+        mean_foreground = (weighted_total - weighted_background) / foreground
+        variance = background * foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_threshold, best_variance = level, variance
+    return best_threshold
+
+
+# Prepare a query image for fast OCR
+def preprocess_for_ocr(img, max_side: int = QUERY_IMAGE_MAX_SIDE, binarize: bool = QUERY_IMAGE_BINARIZE):
+    """Apply the EXIF orientation, convert to grayscale, downscale and binarize an image.
+    Tesseract binarizes internally anyway; doing it on a downscaled grayscale
+    image first cuts the pixels it has to process.
+    Args:
+        img (PIL.Image.Image): The decoded image.
+        max_side (int): Maximum length of the longer side in pixels (0 for no limit).
+        binarize (bool): Threshold the image to black and white (Otsu).
+    Returns:
+        PIL.Image.Image: The grayscale or black-and-white image."""
+
+    # JPEGs are decoded directly at a reduced scale when they are larger than needed
+    if max_side and max(img.size) > max_side:
+        img.draft("L", (max_side, max_side))
+    if img.getexif().get(ORIENTATION_TAG, 1) != 1:
+        img = ImageOps.exif_transpose(img)
+    img = img.convert("L")
+    if max_side and max(img.size) > max_side:
+        img.thumbnail((max_side, max_side))
+    if binarize:
+        threshold = otsu_threshold(img)
+        img = img.point(lambda level: 255 if level > threshold else 0)
+    return img
+
+
+# Cache key of a query image: its encoded bytes plus everything that changes the OCR result
+def query_image_key(data: bytes):
+    digest = hashlib.sha256()
+    digest.update(f"query\0{_language_settings()}\0{QUERY_IMAGE_MAX_SIDE}\0{QUERY_IMAGE_BINARIZE}\0".encode())
+    digest.update(data)
+    return digest.hexdigest()
+
+
+# Look up the OCR text of a query image without decoding it
+def cached_query_image_text(data: bytes):
+    """Return the cached OCR text of an encoded query image, or None.
+    Args:
+        data (bytes): The encoded image (PNG, JPEG, ...).
+    Returns:
+        str: The cached text, or None if the image has not been seen."""
+
+    return ocr_cache_get(query_image_key(data))
+
+
+# OCR an image sent with a chat query
+def extract_from_query_image(data: bytes):
+    """Decode, preprocess and OCR a query image, caching the text by the
+    hash of the encoded bytes (and, through ocr_image, of the preprocessed pixels).
+    Args:
+        data (bytes): The encoded image (PNG, JPEG, ...).
+    Returns:
+        str: The extracted text, or "" if the image cannot be read."""
+
+    key = query_image_key(data)
+    text = ocr_cache_get(key)
+    if text is not None:
+        return text
+    try:
+        img = preprocess_for_ocr(Image.open(BytesIO(data)))
+        text, _ = ocr_image(img)
+    except Exception as e:
+        print(f"Error processing query image: {str(e)}")
+        return ""
+    ocr_cache_put(key, text)
+    return text
+
+
+# Count the pages of a PDF file
+def pdf_page_count(file_path):
+    """Return the number of pages in a PDF file."""
+
+    return int(pdfinfo_from_path(file_path)["Pages"])
+
+
+# Check whether a page's text layer can be used instead of OCR
+def has_usable_text(text: str):
+    """Decide whether extracted text-layer text is good enough to skip OCR.
+    Args:
+        text (str): Text read from the PDF's text layer.
+    Returns:
+        bool: True if the text has enough characters and few garbage glyphs."""
+
+    chars = "".join(text.split())
+    if len(chars) < MIN_TEXT_LAYER_CHARS:
+        return False
+
+    garbage = sum(
+        1 for ch in chars
+        if ch == "\ufffd" or unicodedata.category(ch) in ("Co", "Cn", "Cc", "Cs")
+    )
+    return garbage / len(chars) <= MAX_GARBAGE_RATIO
+
+
+# Read the text layer of every page of a PDF in one pass
+# Module-level so it can run in a worker process; the PDF is parsed once for all pages
+def read_text_layers(file_path):
+    """Read each page's embedded text layer, keeping only the usable ones.
+    Args:
+        file_path (str): The path to the PDF file.
+    Returns:
+        list: One entry per page, the page's text or None if it must be OCR'd."""
+
+    reader = PdfReader(file_path)
+    texts = []
+    for page_number, page in enumerate(reader.pages, start=1):
+        try:
+            text = page.extract_text() or ""
+            texts.append(text if has_usable_text(text) else None)
+        except Exception as e:
+            print(f"Error reading text layer of page {page_number} in '{file_path}': {str(e)}")
+            texts.append(None)
+    return texts
+
+
+# Rasterize and OCR a single PDF page
+# Module-level so it can run in a worker process
+def ocr_pdf_page(file_path, page_number: int):
+    """OCR one PDF page.
+    Args:
+        file_path (str): The path to the PDF file.
+        page_number (int): The 1-based page number.
+    Returns:
+        dict: The page number, its text, "ocr" set to True and the OCR
+            language packs used ("ocr_language")."""
+
+    images = convert_from_path(file_path, dpi=OCR_DPI, first_page=page_number, last_page=page_number)
+    if not images:
+        return {"page": page_number, "text": "", "ocr": True}
+    text, lang = ocr_image(images[0])
+    return {"page": page_number, "text": text, "ocr": True, "ocr_language": lang}
+
+
+# Extract text page by page from a PDF file
+def extract_pdf_pages(file_path, executor=None, progress=None):
+    """Extract text from a PDF file page by page.
+    The text layers of all pages are read in one pass over the PDF. Only the
+    pages without a usable text layer are then rasterized and OCR'd, in
+    parallel on a process pool, and reassembled in page order. OCR results
+    are cached, so a repeated or retried job only OCRs the pages it has not
+    seen before.
+    Args:
+        file_path (str): The path to the PDF file.
+        executor (Executor, optional): Pool to run pages on. A temporary
+            process pool is used if not given.
+        progress (callable, optional): Called with (pages done, total pages).
+    Returns:
+        list: One dict per page with "page" (1-based), "text" and "ocr"."""
+
+    total = pdf_page_count(file_path)
+    pool = executor or ProcessPoolExecutor()
+    try:
+        texts = [None] * total
+        if PDF_TEXT_LAYER:
+            try:
+                layers = pool.submit(read_text_layers, file_path).result()
+                texts = layers[:total] + [None] * (total - len(layers))
+            except Exception as e:
+                print(f"Error reading text layer of PDF file '{file_path}': {str(e)}")
+
+        pages = {page: {"page": page, "text": text, "ocr": False}
+                 for page, text in enumerate(texts, start=1) if text is not None}
+        done = len(pages)
+        if progress:
+            progress(done, total)
+
+        futures = {page: pool.submit(ocr_pdf_page, file_path, page)
+                   for page in range(1, total + 1) if page not in pages}
+        for page, future in futures.items():
+            try:
+                pages[page] = future.result()
+            except Exception as e:
+                print(f"Error processing page {page} of PDF file '{file_path}': {str(e)}")
+                pages[page] = {"page": page, "text": "", "ocr": True}
+            done += 1
+            if progress:
+                progress(done, total)
+        return [pages[page] for page in range(1, total + 1)]
+    finally:
+        if executor is None:
+            pool.shutdown()
+
+
+# Extract text from PDF file, using OCR for pages without a text layer
 def extract_from_pdf(file_path):
-    """Extract text from PDF file using OCR
+    """Extract text from PDF file, using OCR for pages without a usable text layer
     Args:
         file_path (str): The path to the PDF file.
     Returns:
@@ -37,11 +425,11 @@ def extract_from_pdf(file_path):
         return ""  
       
     try:
-        extracted_text = process_pdf(file_path, language="ben+eng")
-        return extracted_text if extracted_text else ""
+        pages = extract_pdf_pages(file_path)
+        return "\n".join(page["text"] for page in pages)
         
     except Exception as e:
-        print(f"Error processing PDF file '{file_path.name}': {str(e)}")
+        print(f"Error processing PDF file '{file_path}': {str(e)}")
         return ""
     
 
@@ -66,23 +454,35 @@ def extract_from_docx(file_path):
         return ""
     
 
-# Extract text from image file using pytesseract
-def extract_from_image(file_path):
-    """Extract text from image file using OCR
+# OCR an image file, recording the language packs used
+def extract_image(file_path):
+    """Extract text from an image file using OCR.
     Args:
         file_path (str): The path to the image file.
     Returns:
-        str: The extracted text from the image file."""
-    
+        dict: The extracted "text" and the OCR language packs used ("ocr_language")."""
+
     try:
         # Open the image file as PIL Image
         img = Image.open(file_path)
 
-        # Use pytesseract to extract text from the image
-        return image_to_string(img, lang='ben+eng')
+        # Use pytesseract to extract text from the image, cached by pixel content
+        text, lang = ocr_image(img)
+        return {"text": text, "ocr_language": lang}
     except Exception as e:
         print(f"Error processing image file '{file_path}': {str(e)}")
-        return ""
+        return {"text": "", "ocr_language": None}
+
+
+# Extract text from image file using pytesseract
+def extract_from_image(file_path):
+    """Extract text from image file using OCR
+    Args:
+        file_path (str): The path to the image file.
+    Returns:
+        str: The extracted text from the image file."""
+
+    return extract_image(file_path)["text"]
     
 
 # Extract text from TXT file
@@ -103,47 +503,82 @@ def extract_from_txt(file_path):
 
 
 
-def extract_from_db(file_path):
-    """Extract text from SQLite database file
+# Stream documents from a SQLite database
+# Rows are read in fetchmany batches from a read-only connection and grouped into
+# small documents, so memory stays bounded regardless of the database size
+def iter_db_documents(file_path, batch_size: int = None, max_rows: int = None, max_bytes: int = None):
+    """Stream a SQLite database as row-group documents.
     Args:
         file_path (str): The path to the SQLite database file.
-    Returns:
-        str: The extracted text from the database file."""
-    
+        batch_size (int, optional): Rows fetched per fetchmany call.
+        max_rows (int, optional): Row cap per table (0 for no cap).
+        max_bytes (int, optional): Text byte cap per table (0 for no cap).
+    Yields:
+        dict: "text" (a header line with the table and column names followed by
+            one " | "-joined line per row) and "metadata" (table, columns, rows)."""
+
+    batch_size = batch_size or DB_BATCH_ROWS
+    max_rows = DB_MAX_ROWS_PER_TABLE if max_rows is None else max_rows
+    max_bytes = DB_MAX_BYTES_PER_TABLE if max_bytes is None else max_bytes
+
+    uri = f"file:{pathname2url(os.path.abspath(file_path))}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True)
     try:
-        # Connect to the SQLite database
-        conn = sqlite3.connect(file_path)
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
 
-        # Create a cursor object to execute SQL queries
-        cursor = conn.cursor()
-        
-        # Get the names of all tables in the database
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
+        for table_name in tables:
+            cursor = conn.execute('SELECT * FROM "{}"'.format(table_name.replace('"', '""')))
+            columns = [column[0] for column in cursor.description]
+            header = f"Table {table_name}: " + " | ".join(columns)
 
-        # Fetch all table names
-        tables = cursor.fetchall()
-        
-        extracted_text = ""
-        for table in tables:
-            table_name = table[0]
+            lines, group_start, group_bytes = [], 1, 0
+            row_count, table_bytes = 0, 0
+            capped = False
+            while not capped:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    line = " | ".join(map(str, row))
+                    line_bytes = len(line.encode("utf-8"))
+                    if (max_rows and row_count >= max_rows) or (max_bytes and table_bytes + line_bytes > max_bytes):
+                        capped = True
+                        break
+                    lines.append(line)
+                    row_count += 1
+                    table_bytes += line_bytes
+                    group_bytes += line_bytes
 
-            # Fetch all rows from the table
-            cursor.execute(f"SELECT * FROM {table_name}")
+                    # Flush a row group once it is large enough to chunk on its own
+                    if len(lines) >= DB_ROWS_PER_DOCUMENT or group_bytes >= DB_DOCUMENT_BYTES:
+                        yield _db_document(table_name, columns, header, lines, group_start, row_count)
+                        lines, group_start, group_bytes = [], row_count + 1, 0
 
-            # Fetch all rows and concatenate them into a string
-            rows = cursor.fetchall()
-            for row in rows:
-                extracted_text += " | ".join(map(str, row)) + "\n"
-        
+            if lines:
+                yield _db_document(table_name, columns, header, lines, group_start, row_count)
+            cursor.close()
+    finally:
         conn.close()
-        return extracted_text.strip()
-    except Exception as e:
-        print(f"Error processing DB file '{file_path}': {str(e)}")
-        return ""
-    
-
 
 
+# Build one row-group document
+def _db_document(table_name, columns, header, lines, first_row, last_row):
+    return {
+        "text": header + "\n" + "\n".join(lines),
+        "metadata": {"table": table_name, "columns": columns, "rows": f"{first_row}-{last_row}"},
+    }
 
 
+def extract_from_db(file_path):
+    """Extract text from SQLite database file
+    Args:
+        file_path (str): The path to the SQLite database file.
+    Returns:
+        str: The extracted text from the database file."""
     
+    try:
+        return "\n".join(document["text"] for document in iter_db_documents(file_path)).strip()
+    except Exception as e:
+        print(f"Error processing DB file '{file_path}': {str(e)}")
+        return ""
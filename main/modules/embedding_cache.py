@@ -0,0 +1,184 @@
+"""
+Persistent, content-addressed cache for embedding vectors.
+Vectors are stored in SQLite keyed by (model name, normalized text hash), so
+repeated chunks and re-uploaded documents need no model forward passes.
+SQLite's WAL mode makes the cache safe to share between worker processes.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Fraction of the size budget kept after an eviction pass
+EVICT_TO_RATIO = 0.9
+
+# Vectors inserted between two exact recounts of the cache size, which also pick up
+# the vectors inserted by other processes
+RECOUNT_INTERVAL = 1000
+
+
+# Normalize text before hashing so whitespace-only differences share an entry
+def normalize_text(text: str):
+    """Normalize text for cache keys: Unicode NFC and collapsed whitespace.
+    Args:
+        text (str): The text to normalize.
+    Returns:
+        str: The normalized text."""
+
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper backed by a disk cache.
+    Args:
+        embeddings (Embeddings): The underlying embedding model.
+        model_name (str): Model name, part of every cache key.
+        path (str): SQLite database file.
+        max_bytes (int): Size budget for stored vectors; least recently used
+            entries are evicted beyond it.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, path: str, max_bytes: int):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+
+        # Running estimate of the stored bytes, so inserts need no full-table SUM
+        self._size_lock = threading.Lock()
+        self._total_bytes = None
+        self._inserted_since_recount = 0
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+
+    # One connection per thread; SQLite serializes writers across processes
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _key(self, kind: str, text: str):
+        payload = f"{self.model_name}\0{kind}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    # Look up vectors for texts, computing and storing the missing ones
+    def _embed(self, kind: str, texts: List[str], compute):
+        keys = [self._key(kind, text) for text in texts]
+        conn = self._connect()
+
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), 500):
+            batch = unique_keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        now = time.time()
+        if found:
+            with conn:
+                conn.executemany("UPDATE embeddings SET last_access = ? WHERE key = ?",
+                                 [(now, key) for key in found])
+
+        # Identical texts in one call are embedded once
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = compute(list(missing.values()))
+            rows = []
+            for key, vector in zip(missing, vectors):
+                blob = np.asarray(vector, dtype=np.float32).tobytes()
+                rows.append((key, blob, len(blob), now))
+                found[key] = list(vector)
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, size, last_access) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+            self._evict(conn, sum(row[2] for row in rows), len(rows))
+
+        with self._stats_lock:
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        return [found[key] for key in keys]
+
+    # Evict least recently used vectors beyond the size budget
+    # The size is tracked incrementally and only recounted when it crosses the budget
+    # or every RECOUNT_INTERVAL inserted vectors
+    def _evict(self, conn, added_bytes: int, added_rows: int):
+        with self._size_lock:
+            self._inserted_since_recount += added_rows
+            if self._total_bytes is not None and self._inserted_since_recount < RECOUNT_INTERVAL:
+                self._total_bytes += added_bytes
+                if self._total_bytes <= self.max_bytes:
+                    return
+            self._inserted_since_recount = 0
+
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+        with self._size_lock:
+            self._total_bytes = total
+        if total <= self.max_bytes:
+            return
+
+        target = total - int(self.max_bytes * EVICT_TO_RATIO)
+        freed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM embeddings ORDER BY last_access"):
+            stale.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        with conn:
+            conn.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        with self._size_lock:
+            self._total_bytes = total - freed
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, reusing cached vectors where possible."""
+
+        return self._embed("document", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing a cached vector where possible."""
+
+        return self._embed("query", [text], lambda texts: [self.embeddings.embed_query(texts[0])])[0]
+
+    def stats(self):
+        """Return cache hit/miss counters for this process.
+        Returns:
+            dict: hits, misses and hit rate."""
+
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
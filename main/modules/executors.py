@@ -0,0 +1,95 @@
+"""
+Shared worker pools for blocking work called from async endpoints.
+CPU-bound stages (OCR, text extraction) run on a process pool so they cannot
+hold the event loop or the GIL. I/O-bound stages and model inference (which
+releases the GIL and needs the models resident in this process) run on a
+thread pool.
+"""
+
+import asyncio
+import contextvars
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Pool sizes
+CPU_WORKERS = int(os.environ.get("CPU_WORKERS", os.cpu_count() or 1))
+IO_WORKERS = int(os.environ.get("IO_WORKERS", 16))
+
+_process_pool = None
+_thread_pool = None
+_pool_lock = threading.Lock()
+
+
+# Get the shared process pool, creating it on first use
+def get_process_pool():
+    """Return the process pool for CPU-bound work.
+    Workers are spawned rather than forked so they never inherit model
+    weights or threads from the server process.
+    Returns:
+        ProcessPoolExecutor: The shared process pool."""
+
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+    return _process_pool
+
+
+# Get the shared thread pool, creating it on first use
+def get_thread_pool():
+    """Return the thread pool for I/O-bound work and model inference.
+    Returns:
+        ThreadPoolExecutor: The shared thread pool."""
+
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+    return _thread_pool
+
+
+# Run a CPU-bound function on the process pool
+async def run_cpu(func, *args, **kwargs):
+    """Run a picklable, module-level function on the process pool.
+    Args:
+        func (callable): The function to run.
+    Returns:
+        Any: The function's return value."""
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(func, *args, **kwargs))
+
+
+# Run a blocking function on the thread pool
+async def run_io(func, *args, **kwargs):
+    """Run a blocking function on the thread pool, keeping the caller's context.
+    Args:
+        func (callable): The function to run.
+    Returns:
+        Any: The function's return value."""
+
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_thread_pool(), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+# Shut down the pools
+def shutdown():
+    """Shut down both pools, e.g. when the application stops."""
+
+    global _process_pool, _thread_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=False, cancel_futures=True)
+            _thread_pool = None
@@ -0,0 +1,114 @@
+"""
+Chat history windowing for the prompts.
+The most recent messages are passed verbatim within a token budget; older
+messages are folded into a rolling summary that is extended incrementally with
+only the messages that left the window since the last refresh. The session
+keeps the full history, so clients still receive every message.
+"""
+
+import os
+
+from langchain_core.messages import SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from main.modules import registry
+from main.modules.telemetry import llm_span_handler
+
+# Token budget for the verbatim part of the history passed to the prompts
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", 1500))
+
+# Maximum number of messages passed verbatim (a turn is a question and an answer)
+HISTORY_MAX_MESSAGES = int(os.environ.get("HISTORY_MAX_MESSAGES", 12))
+
+# Messages that must leave the window before the summary is refreshed;
+# until then they stay verbatim, so the budget may be exceeded by this many messages
+HISTORY_SUMMARY_BATCH = int(os.environ.get("HISTORY_SUMMARY_BATCH", 4))
+
+# Summary prompt
+summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", "You maintain a concise running summary of a conversation between a user and an assistant "
+               "about their documents. Keep names, numbers, dates and the questions asked. "
+               "Reply with the updated summary only, in the language of the conversation."),
+    ("user", "Current summary:\n{summary}\n\nNew messages:\n{messages}\n\nUpdated summary:")
+])
+
+
+# Estimate the number of LLM tokens in a text
+# Latin text averages about 4 characters per token; Bangla script is split much finer
+def estimate_tokens(text: str):
+    """Estimate the token count of a text without a tokenizer.
+    Args:
+        text (str): The text.
+    Returns:
+        int: Approximate number of tokens."""
+
+    ascii_chars = sum(1 for ch in text if ord(ch) < 128)
+    return 1 + ascii_chars // 4 + (len(text) - ascii_chars) // 2
+
+
+# Find where the verbatim window starts
+def window_start(chat_history):
+    """Return the index of the oldest message that fits in the verbatim window.
+    Args:
+        chat_history (list): The full chat history.
+    Returns:
+        int: Index into chat_history."""
+
+    start = len(chat_history)
+    tokens = 0
+    while start > 0 and len(chat_history) - start < HISTORY_MAX_MESSAGES:
+        tokens += estimate_tokens(chat_history[start - 1].content)
+        # The latest message is always kept, however long
+        if tokens > HISTORY_TOKEN_BUDGET and start < len(chat_history):
+            break
+        start -= 1
+    return start
+
+
+# Build the history passed to the prompts for a session
+def history_window(session):
+    """Return the summary of older messages followed by the recent messages.
+    Args:
+        session (dict): The session state, with "chat_history" and optionally
+            "history_summary" and "summarized_messages".
+    Returns:
+        list: Messages for the prompts."""
+
+    chat_history = session["chat_history"]
+    summarized = session.get("summarized_messages", 0)
+
+    # Messages that left the window but are not summarized yet stay verbatim
+    start = max(summarized, window_start(chat_history) - HISTORY_SUMMARY_BATCH)
+    window = chat_history[start:]
+    if session.get("history_summary"):
+        window = [SystemMessage(content=f"Summary of the earlier conversation:\n{session['history_summary']}")] + window
+    return window
+
+
+# Fold messages that left the window into the rolling summary
+async def refresh_summary(session):
+    """Extend the session's summary with the messages that left the window,
+    once at least HISTORY_SUMMARY_BATCH of them are pending.
+    Args:
+        session (dict): The session state.
+    Returns:
+        bool: True if the summary was updated."""
+
+    chat_history = session["chat_history"]
+    summarized = session.get("summarized_messages", 0)
+    start = window_start(chat_history)
+    if start - summarized < HISTORY_SUMMARY_BATCH:
+        return False
+
+    messages = "\n".join(f"{msg.type}: {msg.content}" for msg in chat_history[summarized:start])
+    chain = summary_prompt | registry.get("llm") | StrOutputParser()
+    summary = await chain.ainvoke({"summary": session.get("history_summary") or "(none)", "messages": messages},
+                                  config={"callbacks": [llm_span_handler]})
+
+    # Another refresh may have finished first
+    if session.get("summarized_messages", 0) != summarized:
+        return False
+    session["history_summary"] = summary.strip()
+    session["summarized_messages"] = start
+    return True
@@ -0,0 +1,99 @@
+"""
+Sparse lexical retrieval (BM25) and reciprocal rank fusion with dense results.
+BM25 catches exact IDs, names and numbers that dense embeddings blur, so fusing
+both lists gives better recall with fewer candidates sent to the re-ranker.
+"""
+
+import re
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+# Words are runs of word characters; the Bengali block is listed explicitly
+# because its vowel signs and virama are not \w and would otherwise split words
+TOKEN_REGEX = re.compile(r"[\w\u0980-\u09FF]+")
+
+
+# Split text into lowercase terms for BM25
+def tokenize(text: str):
+    """Tokenize text for BM25.
+    Args:
+        text (str): The text to tokenize.
+    Returns:
+        list: Lowercase terms."""
+
+    return TOKEN_REGEX.findall(text.lower())
+
+
+# Build a BM25 index over a vector store's chunks
+def build_bm25(vector_store):
+    """Build a BM25 index whose corpus order matches the FAISS index order.
+    Args:
+        vector_store (FAISS): The vector store.
+    Returns:
+        BM25Okapi: The BM25 index, or None if the vector store is empty."""
+
+    texts = [vector_store.docstore.search(vector_store.index_to_docstore_id[i]).page_content
+             for i in range(vector_store.index.ntotal)]
+    if not texts:
+        return None
+    return BM25Okapi([tokenize(text) for text in texts])
+
+
+# Retrieve chunks by BM25 score
+def sparse_search(vector_store, bm25, query: str, k: int):
+    """Return the top-k chunks by BM25 score, skipping chunks sharing no term with the query.
+    Args:
+        vector_store (FAISS): The vector store holding the chunks.
+        bm25 (BM25Okapi): Its BM25 index from build_bm25().
+        query (str): The query.
+        k (int): Number of chunks to return.
+    Returns:
+        list: Documents, best first."""
+
+    terms = tokenize(query)
+    if not terms or k <= 0:
+        return []
+    scores = bm25.get_scores(terms)
+    top = np.argsort(-scores)[:k]
+    return [vector_store.docstore.search(vector_store.index_to_docstore_id[int(i)])
+            for i in top if scores[i] > 0]
+
+
+# Fuse ranked lists with reciprocal rank fusion
+def reciprocal_rank_fusion(rankings, k: int = 60):
+    """Fuse ranked document lists by summing 1 / (k + rank) per document.
+    Args:
+        rankings (list): Lists of documents, each best first.
+        k (int): Rank offset; larger values flatten the contribution of top ranks.
+    Returns:
+        list: Unique documents ordered by fused score."""
+
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc.id or doc.page_content
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            docs.setdefault(key, doc)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+# Retrieve candidates from both indexes and fuse them
+def hybrid_search(vector_store, bm25, query: str, dense_k: int, sparse_k: int, fused_k: int, rrf_k: int = 60):
+    """Retrieve dense and BM25 candidates and fuse them with reciprocal rank fusion.
+    Args:
+        vector_store (FAISS): The vector store.
+        bm25 (BM25Okapi): Its BM25 index, or None for dense retrieval only.
+        query (str): The query.
+        dense_k (int): Dense candidates.
+        sparse_k (int): BM25 candidates.
+        fused_k (int): Candidates kept after fusion.
+        rrf_k (int): Reciprocal rank fusion offset.
+    Returns:
+        list: Up to fused_k documents, best first."""
+
+    rankings = [vector_store.similarity_search(query, k=dense_k)]
+    if bm25 is not None:
+        rankings.append(sparse_search(vector_store, bm25, query, sparse_k))
+    return reciprocal_rank_fusion(rankings, k=rrf_k)[:fused_k]
@@ -0,0 +1,344 @@
+"""
+On-disk store for FAISS vector stores.
+Each index is saved once under a directory named by a hash of its content, so
+identical documents share one copy and concurrent sessions never overwrite each
+other. Indexes are loaded lazily on first use and kept in a small LRU of resident
+indexes; flat and HNSW reads are memory-mapped so the OS pages vectors in only as searched.
+A BM25 index over the same chunks is saved next to each FAISS index.
+Indexes are built flat during ingestion and saved as the FAISS index type chosen
+for their size (flat, HNSW or IVF-PQ, see process_vector_store.choose_index),
+with the chosen parameters in index_params.json. Appending and removing chunks
+rebuild from the saved vectors, since HNSW and IVF-PQ cannot be merged or
+have vectors removed losslessly.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+from main.modules import registry
+from main.modules.hybrid_search import build_bm25
+from main.modules.process_vector_store import EMBEDDING_MODEL_ID, choose_index, fit_index, set_search_params
+
+# Directory holding one sub-directory per saved index
+INDEX_DIR = os.environ.get("INDEX_DIR", "indexes")
+
+# Number of indexes kept in memory; least recently used ones are released beyond it
+MAX_RESIDENT_INDEXES = int(os.environ.get("MAX_RESIDENT_INDEXES", 64))
+
+# Memory-map index files instead of reading them into RAM
+INDEX_MMAP = os.environ.get("INDEX_MMAP", "1") == "1"
+
+# Flat and HNSW vectors are only memory-mapped with IO_FLAG_MMAP_IFC (FAISS >= 1.10);
+# IO_FLAG_MMAP only maps on-disk IVF lists, so older FAISS versions read the vectors into RAM
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+
+# Minimum seconds between two last-use updates of a resident index's directory
+TOUCH_INTERVAL = 3600
+
+# Resident entries: {"vector_store": FAISS, "bm25": BM25Okapi or None once loaded}
+_resident: "OrderedDict[str, dict]" = OrderedDict()
+_lock = threading.Lock()
+
+# Last time each index directory was marked as used
+_touched = {}
+
+
+# Hash the content of a vector store
+def index_key(vector_store: FAISS):
+    """Compute a content key from the embedding model, the index parameters
+    chosen for the chunk count and the indexed chunks. The parameters are
+    covered so that a new INDEX_* configuration saves a new index instead of
+    reusing one built with the old settings.
+    Args:
+        vector_store (FAISS): The vector store.
+    Returns:
+        str: Hex digest identifying the index content."""
+
+    params = choose_index(vector_store.index.ntotal, vector_store.index.d)
+    digest = hashlib.sha256(EMBEDDING_MODEL_ID.encode("utf-8"))
+    digest.update(b"\0" + json.dumps(params, sort_keys=True).encode("utf-8"))
+    for i in range(vector_store.index.ntotal):
+        doc = vector_store.docstore.search(vector_store.index_to_docstore_id[i])
+        digest.update(b"\0" + doc.page_content.encode("utf-8"))
+        digest.update(b"\0" + json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _index_path(key: str):
+    return os.path.join(INDEX_DIR, key)
+
+
+# Record the last use of an index on its directory so purge_indexes keeps it
+# Hits on resident indexes are rate-limited to one update per TOUCH_INTERVAL
+def _touch(key: str, force: bool = True):
+    now = time.time()
+    if not force and now - _touched.get(key, 0) < TOUCH_INTERVAL:
+        return
+    _touched[key] = now
+    try:
+        os.utime(_index_path(key))
+    except FileNotFoundError:
+        pass
+
+
+# Keep an index resident, releasing the least recently used beyond the limit
+def _remember(key: str, vector_store: FAISS, bm25=None):
+    with _lock:
+        _resident[key] = {"vector_store": vector_store, "bm25": bm25}
+        _resident.move_to_end(key)
+        while len(_resident) > MAX_RESIDENT_INDEXES:
+            _resident.popitem(last=False)
+
+
+# Save a vector store under its content key
+def save_index(vector_store: FAISS):
+    """Save a vector store atomically under its content-keyed directory.
+    The flat index is first rebuilt as the index type chosen for its size. The
+    index is written to a temporary directory and renamed into place, so
+    readers never see a partial index. Already saved content is not rewritten.
+    Args:
+        vector_store (FAISS): The vector store with a flat index, replaced in place.
+    Returns:
+        str: The index key."""
+
+    key = index_key(vector_store)
+    path = _index_path(key)
+    if os.path.isdir(path):
+        # Share the saved copy, which may be memory-mapped, instead of this one
+        _touch(key)
+        with _lock:
+            if key in _resident:
+                return key
+        _remember(key, _read_index(key, mmap=INDEX_MMAP))
+        return key
+
+    params, vectors = fit_index(vector_store)
+    bm25 = build_bm25(vector_store)
+    os.makedirs(INDEX_DIR, exist_ok=True)
+    tmp_path = os.path.join(INDEX_DIR, f".tmp-{uuid.uuid4().hex}")
+    vector_store.save_local(tmp_path)
+    with open(os.path.join(tmp_path, "bm25.pkl"), "wb") as f:
+        pickle.dump(bm25, f)
+    with open(os.path.join(tmp_path, "index_params.json"), "w") as f:
+        json.dump(params, f)
+
+    # PQ codes cannot be decoded back to the original vectors, so keep them for rebuilds
+    if params["type"] == "ivfpq":
+        np.save(os.path.join(tmp_path, "vectors.npy"), vectors.astype(np.float32))
+    try:
+        os.rename(tmp_path, path)
+    except OSError:
+        # Another writer saved the same content first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    _touch(key)
+
+    _remember(key, vector_store, bm25)
+    return key
+
+
+# Check that an index is still saved
+def index_exists(key: str, touch: bool = True):
+    """Whether an index is saved under a key.
+    Args:
+        key (str): The index key.
+        touch (bool): Count a successful check as a use of the index, so purge_indexes keeps it.
+    Returns:
+        bool: True if the index exists."""
+
+    if not os.path.isdir(_index_path(key)):
+        return False
+    if touch:
+        _touch(key, force=False)
+    return True
+
+
+# Read the parameters an index was built with
+def index_params(key: str):
+    """Return the index type and parameters saved with an index.
+    Indexes saved before index selection are flat.
+    Args:
+        key (str): The index key.
+    Returns:
+        dict: The parameters from process_vector_store.choose_index()."""
+
+    try:
+        with open(os.path.join(_index_path(key), "index_params.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"type": "flat", "factory": "Flat", "search": {}}
+
+
+# Read a saved vector store from disk
+def _read_index(key: str, mmap: bool):
+    path = _index_path(key)
+    if not os.path.isdir(path):
+        raise FileNotFoundError(f"Index {key} not found")
+
+    # Fall back to a full read for index files FAISS cannot memory-map
+    index_file = os.path.join(path, "index.faiss")
+    try:
+        index = faiss.read_index(index_file, MMAP_FLAG if mmap else 0)
+    except RuntimeError:
+        index = faiss.read_index(index_file)
+    set_search_params(index, index_params(key)["search"])
+
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    # Last use is tracked on the directory so unused indexes can be purged
+    _touch(key)
+    return FAISS(
+        embedding_function=registry.get("embeddings"),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+
+# Read a saved vector store into a private, writable flat index
+def _read_flat(key: str):
+    """Read a saved vector store with its vectors in a flat index, so chunks
+    can be merged in or removed before it is saved again.
+    Args:
+        key (str): The index key.
+    Returns:
+        FAISS: The vector store with an IndexFlatL2."""
+
+    path = _index_path(key)
+    vectors_file = os.path.join(path, "vectors.npy")
+    if os.path.exists(vectors_file):
+        vectors = np.load(vectors_file).astype(np.float32)
+        vector_store = _read_index(key, mmap=True)
+    else:
+        vector_store = _read_index(key, mmap=False)
+        if isinstance(vector_store.index, faiss.IndexFlat):
+            return vector_store
+        vectors = vector_store.index.reconstruct_n(0, vector_store.index.ntotal)
+
+    vector_store.index = faiss.IndexFlatL2(vectors.shape[1])
+    vector_store.index.add(vectors)
+    return vector_store
+
+
+# Get a vector store by key, loading it from disk if it is not resident
+def load_index(key: str):
+    """Return the vector store saved under a key.
+    Resident indexes may be shared by several sessions, so callers must not modify them.
+    Loading reads from disk, so call this off the event loop.
+    Args:
+        key (str): The index key from save_index().
+    Returns:
+        FAISS: The vector store.
+    Raises:
+        FileNotFoundError: If no index is saved under the key."""
+
+    with _lock:
+        entry = _resident.get(key)
+        if entry is not None:
+            _resident.move_to_end(key)
+    if entry is not None:
+        _touch(key, force=False)
+        return entry["vector_store"]
+
+    vector_store = _read_index(key, mmap=INDEX_MMAP)
+    _remember(key, vector_store)
+    return vector_store
+
+
+# Get the BM25 index saved next to a vector store
+def load_bm25(key: str):
+    """Return the BM25 index of the chunks saved under a key.
+    Indexes saved before BM25 was added get one built from their chunks.
+    Args:
+        key (str): The index key from save_index().
+    Returns:
+        BM25Okapi: The BM25 index, or None if the index has no chunks."""
+
+    vector_store = load_index(key)
+    with _lock:
+        entry = _resident.get(key)
+        if entry is not None and entry["bm25"] is not None:
+            return entry["bm25"]
+
+    bm25_file = os.path.join(_index_path(key), "bm25.pkl")
+    if os.path.exists(bm25_file):
+        with open(bm25_file, "rb") as f:
+            bm25 = pickle.load(f)
+    else:
+        bm25 = build_bm25(vector_store)
+
+    with _lock:
+        entry = _resident.get(key)
+        if entry is not None:
+            entry["bm25"] = bm25
+    return bm25
+
+
+# Append new chunks to a saved index
+def append_to_index(key: str, vector_store: FAISS):
+    """Save a new index holding the chunks of a saved index followed by new ones.
+    The saved vectors are read into a private, writable flat index; the new
+    chunks are added without re-embedding anything.
+    Args:
+        key (str): The key of the saved index.
+        vector_store (FAISS): The new chunks. Its index is emptied by the merge.
+    Returns:
+        str: The key of the combined index."""
+
+    combined = _read_flat(key)
+    combined.merge_from(vector_store)
+    return save_index(combined)
+
+
+# Remove one document's chunks from a saved index
+def remove_from_index(key: str, doc_id: str):
+    """Save a new index without the chunks of one document.
+    Args:
+        key (str): The key of the saved index.
+        doc_id (str): The "doc_id" metadata of the chunks to remove.
+    Returns:
+        str: The key of the remaining index, or None if no chunks remain."""
+
+    vector_store = _read_flat(key)
+    ids = [doc_key for doc_key, doc in vector_store.docstore._dict.items() if doc.metadata.get("doc_id") == doc_id]
+    if len(ids) == vector_store.index.ntotal:
+        return None
+    if ids:
+        vector_store.delete(ids)
+    return save_index(vector_store)
+
+
+# Delete indexes not used for a while
+def purge_indexes(max_age: float):
+    """Delete saved indexes whose last use is older than max_age seconds.
+    Args:
+        max_age (float): Maximum age in seconds."""
+
+    if not os.path.isdir(INDEX_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(INDEX_DIR):
+        path = os.path.join(INDEX_DIR, name)
+        if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            with _lock:
+                _resident.pop(name, None)
+            _touched.pop(name, None)
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def resident_keys():
+    """Return the keys of the indexes currently held in memory."""
+
+    with _lock:
+        return list(_resident)
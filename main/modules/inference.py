@@ -0,0 +1,124 @@
+"""
+CPU inference backends for the embedding model and the cross-encoder re-ranker.
+"torch" runs the fp32 PyTorch model, "torch-int8" quantizes its linear layers
+to int8 dynamically, "onnx" runs the model on ONNX Runtime and "onnx-int8" runs
+a dynamically quantized ONNX export. The ONNX backends need the optional
+`sentence-transformers[onnx]` extra (onnxruntime and optimum).
+"""
+
+import os
+import shutil
+import uuid
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Intra-op threads for PyTorch and ONNX Runtime (0 keeps the library default)
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", 0))
+
+# Directory holding the quantized ONNX exports, one sub-directory per model
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "models/onnx")
+
+# Target instruction set of the int8 ONNX export: arm64, avx2, avx512 or avx512_vnni
+ONNX_QUANTIZATION = os.environ.get("ONNX_QUANTIZATION", "avx2")
+
+
+# Validate a backend name from the configuration
+def check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    return backend
+
+
+# Apply the configured thread count to PyTorch
+def set_threads():
+    if INFERENCE_THREADS > 0:
+        import torch
+        torch.set_num_threads(INFERENCE_THREADS)
+
+
+# ONNX Runtime keyword arguments passed through sentence-transformers
+def _onnx_kwargs():
+    try:
+        import onnxruntime
+    except ImportError as exc:
+        raise ImportError(
+            "The ONNX backends need onnxruntime and optimum. "
+            "Install them with `pip install sentence-transformers[onnx]`."
+        ) from exc
+
+    kwargs = {"provider": "CPUExecutionProvider"}
+    if INFERENCE_THREADS > 0:
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = INFERENCE_THREADS
+        kwargs["session_options"] = options
+    return kwargs
+
+
+# File name of the quantized export inside a model directory
+def _quantized_file():
+    return f"onnx/model_qint8_{ONNX_QUANTIZATION}.onnx"
+
+
+# Export a dynamically quantized ONNX model once and return its directory
+def _export_quantized(model_name: str, model_class):
+    """Export a model to ONNX with dynamic int8 quantization under ONNX_MODEL_DIR.
+    The export is written to a temporary directory and renamed into place, so
+    concurrent workers never load a half-written model.
+    Args:
+        model_name (str): The Hugging Face model name.
+        model_class (type): SentenceTransformer or CrossEncoder.
+    Returns:
+        str: The local model directory."""
+
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    path = os.path.join(ONNX_MODEL_DIR, model_name.replace("/", "--"))
+    if os.path.exists(os.path.join(path, _quantized_file())):
+        return path
+
+    os.makedirs(ONNX_MODEL_DIR, exist_ok=True)
+    tmp_path = os.path.join(ONNX_MODEL_DIR, f".tmp-{uuid.uuid4().hex}")
+    try:
+        # Exports the fp32 ONNX graph when the model repository has none
+        model = model_class(model_name, backend="onnx", model_kwargs={"provider": "CPUExecutionProvider"})
+        model.save_pretrained(tmp_path)
+        export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, tmp_path)
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.rename(tmp_path, path)
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+
+# Resolve the model path and constructor arguments for a backend
+def model_source(model_name: str, backend: str, model_class):
+    """Return what to pass to a sentence-transformers model constructor.
+    Args:
+        model_name (str): The Hugging Face model name.
+        backend (str): One of BACKENDS.
+        model_class (type): SentenceTransformer or CrossEncoder, used for the int8 export.
+    Returns:
+        tuple: (model name or local path, constructor keyword arguments)"""
+
+    check_backend(backend)
+    if backend == "onnx":
+        return model_name, {"backend": "onnx", "model_kwargs": _onnx_kwargs()}
+    if backend == "onnx-int8":
+        kwargs = _onnx_kwargs()
+        return _export_quantized(model_name, model_class), {
+            "backend": "onnx", "model_kwargs": {"file_name": _quantized_file(), **kwargs}
+        }
+    return model_name, {}
+
+
+# Quantize the linear layers of a PyTorch model in place
+def quantize_linear(model):
+    """Apply dynamic int8 quantization to the linear layers of a model.
+    Args:
+        model (torch.nn.Module): The loaded model.
+    Returns:
+        torch.nn.Module: The same model, quantized."""
+
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
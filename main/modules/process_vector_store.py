@@ -1,15 +1,122 @@
+import os
 import re
-from langchain_experimental.text_splitter import SemanticChunker
+import time
+from itertools import islice
+import faiss
+import numpy as np
+from langchain_core.documents import Document
 from langchain_community.vectorstores import FAISS
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from main.modules import registry
+from main.modules.embedding_cache import CachedEmbeddings
+from main.modules.inference import check_backend, model_source, quantize_linear, set_threads
+from main.modules.telemetry import span
+
 # Define the embedding model to be used
-EMBEDDING_MODEL = "intfloat/multilingual-e5-base"
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "intfloat/multilingual-e5-base")
+
+# Inference backend for the embedding model: torch, torch-int8, onnx or onnx-int8
+EMBEDDING_BACKEND = check_backend(os.environ.get("EMBEDDING_BACKEND", "torch"))
+
+# Vectors differ slightly between backends, so caches and index keys tell them apart
+EMBEDDING_MODEL_ID = EMBEDDING_MODEL if EMBEDDING_BACKEND == "torch" else f"{EMBEDDING_MODEL}@{EMBEDDING_BACKEND}"
+
+# Number of chunks embedded per model call
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", 32))
+
+# Tokens per text seen by the embedding model; longer texts are truncated
+EMBED_MAX_SEQ_LENGTH = int(os.environ.get("EMBED_MAX_SEQ_LENGTH", 512))
+
+# Number of extracted documents (pages, row groups) chunked and indexed per batch
+INDEX_BATCH_DOCUMENTS = int(os.environ.get("INDEX_BATCH_DOCUMENTS", 64))
+
+# Sentence boundaries for semantic chunking: Latin punctuation and the Bangla danda
+SENTENCE_SPLIT_REGEX = r"(?<=[.?!।])\s+"
+
+# Distance percentile above which consecutive sentences start a new chunk
+BREAKPOINT_PERCENTILE = float(os.environ.get("BREAKPOINT_PERCENTILE", 95))
+
+# How chunk vectors are produced:
+# "mean" derives them from the sentence embeddings (single pass),
+# "embed" embeds the chunk texts in one extra batched pass
+CHUNK_VECTORS = os.environ.get("CHUNK_VECTORS", "mean")
+
+# FAISS index type of a saved index: "auto" picks flat, HNSW or IVF-PQ from the chunk
+# count and the targets below; "flat", "hnsw" or "ivfpq" force one
+INDEX_TYPE = os.environ.get("INDEX_TYPE", "auto")
+
+# Latency target: exact (flat) search up to this many chunks
+INDEX_FLAT_MAX_CHUNKS = int(os.environ.get("INDEX_FLAT_MAX_CHUNKS", 20000))
+
+# Memory target per index: larger HNSW indexes are compressed with IVF-PQ instead
+INDEX_MAX_MB = float(os.environ.get("INDEX_MAX_MB", 256))
 
-# Initialize the embeddings
-embeddings = HuggingFaceEmbeddings(
-            model_name=EMBEDDING_MODEL
+# Store flat and HNSW vectors as float16 (half the memory, negligible recall loss)
+INDEX_FLOAT16 = os.environ.get("INDEX_FLOAT16", "0") == "1"
+
+# HNSW graph degree and search/construction beam widths
+INDEX_HNSW_M = int(os.environ.get("INDEX_HNSW_M", 32))
+INDEX_HNSW_EF_SEARCH = int(os.environ.get("INDEX_HNSW_EF_SEARCH", 64))
+INDEX_HNSW_EF_CONSTRUCTION = int(os.environ.get("INDEX_HNSW_EF_CONSTRUCTION", 80))
+
+# IVF-PQ: lists probed per query, target code bytes per vector, and the minimum
+# number of chunks to train it on (smaller indexes use HNSW)
+INDEX_IVF_NPROBE = int(os.environ.get("INDEX_IVF_NPROBE", 16))
+INDEX_PQ_BYTES = int(os.environ.get("INDEX_PQ_BYTES", 96))
+INDEX_IVF_MIN_CHUNKS = int(os.environ.get("INDEX_IVF_MIN_CHUNKS", 10000))
+
+# Vectors sampled to train IVF-PQ (and scalar quantizers)
+INDEX_TRAIN_SAMPLE = int(os.environ.get("INDEX_TRAIN_SAMPLE", 50000))
+
+# Disk cache for embedding vectors (set EMBEDDING_CACHE_PATH empty to disable)
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite")
+EMBEDDING_CACHE_MAX_MB = int(os.environ.get("EMBEDDING_CACHE_MAX_MB", 1024))
+
+
+# Load the embedding model on an inference backend
+def load_embedding_model(backend: str = EMBEDDING_BACKEND):
+    """Load the embedding model without the disk cache.
+    Args:
+        backend (str): torch, torch-int8, onnx or onnx-int8.
+    Returns:
+        HuggingFaceEmbeddings: The embedding model."""
+
+    from sentence_transformers import SentenceTransformer
+
+    set_threads()
+    model_name, model_kwargs = model_source(EMBEDDING_MODEL, backend, SentenceTransformer)
+    embeddings = HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs={"batch_size": EMBED_BATCH_SIZE}
         )
+    embeddings._client.max_seq_length = EMBED_MAX_SEQ_LENGTH
+    if backend == "torch-int8":
+        quantize_linear(embeddings._client)
+    return embeddings
+
+
+# Load the embedding model (called once per process by the registry)
+def load_embeddings():
+    """Load the embedding model on the configured backend, wrapped in the disk cache when enabled.
+    Returns:
+        Embeddings: The embedding model."""
+
+    embeddings = load_embedding_model()
+    if not EMBEDDING_CACHE_PATH:
+        return embeddings
+
+    os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH) or ".", exist_ok=True)
+    return CachedEmbeddings(
+        embeddings,
+        model_name=EMBEDDING_MODEL_ID,
+        path=EMBEDDING_CACHE_PATH,
+        max_bytes=EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+    )
+
+
+registry.register("embeddings", load_embeddings)
 
 # Preprocess extracted text by cleaning lines
 def preprocess_text(text: str):
@@ -35,8 +142,115 @@ def preprocess_text(text: str):
     return "\n".join(cleaned_lines)
 
 
+# Split text into sentences
+def split_sentences(text: str):
+    """Split text into sentences on Latin punctuation and the Bangla danda.
+    Args:
+        text (str): The text to split.
+    Returns:
+        list: The non-empty sentences."""
+
+    return [sentence for sentence in re.split(SENTENCE_SPLIT_REGEX, text) if sentence.strip()]
+
+
+# Split a document into the units embedded by chunk_and_embed
+# Database row groups rarely have sentence punctuation, so each row is a unit;
+# otherwise a whole group would be one unit, truncated to the embedding window
+def split_units(doc: Document):
+    """Split a document into sentences, or into lines for a database row group.
+    Args:
+        doc (Document): The document to split.
+    Returns:
+        tuple: (the non-empty units, the separator to join them with)"""
+
+    if doc.metadata.get("table"):
+        return [line for line in doc.page_content.split("\n") if line.strip()], "\n"
+    return split_sentences(doc.page_content), " "
+
+
+# Find semantic breakpoints between consecutive sentence windows
+def find_breakpoints(vectors):
+    """Find the indices after which a new chunk starts.
+    A breakpoint is placed where the cosine distance between consecutive
+    sentence windows is above the BREAKPOINT_PERCENTILE of all distances.
+    Args:
+        vectors (np.ndarray): One embedding per sentence window, shape (n, dim).
+    Returns:
+        list: Sentence indices that end a chunk."""
+
+    if len(vectors) < 2:
+        return []
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    distances = 1 - np.einsum("ij,ij->i", unit[:-1], unit[1:])
+    threshold = np.percentile(distances, BREAKPOINT_PERCENTILE)
+    return np.flatnonzero(distances > threshold).tolist()
+
+
+# Function to split documents into semantic chunks and embed them in a single pass
+# Each sentence window is embedded once; those embeddings both place the chunk
+# boundaries and (in "mean" mode) give the chunk vectors, so chunks are not embedded again
+def chunk_and_embed(documents, progress=None, with_vectors=True):
+    """Split documents into semantic chunks and compute their vectors.
+    Args:
+        documents (list): Documents to split; metadata is copied onto their chunks.
+        progress (callable, optional): Called with (embedded, total) sentence counts.
+        with_vectors (bool): Whether to return chunk vectors.
+    Returns:
+        tuple: (chunks, vectors) where vectors is None if with_vectors is False."""
+
+    # Sentences (or database rows) per document, each embedded together with its neighbours
+    # like SemanticChunker with buffer_size=1
+    units_per_doc = [split_units(doc) for doc in documents]
+    windows = []
+    for sentences, separator in units_per_doc:
+        for i in range(len(sentences)):
+            windows.append(separator.join(sentences[max(0, i - 1):i + 2]))
+
+    # Embed all sentence windows of all documents in batches
+    embeddings = registry.get("embeddings")
+    window_vectors = []
+    with span("embed", texts=len(windows)):
+        for start in range(0, len(windows), EMBED_BATCH_SIZE):
+            window_vectors.extend(embeddings.embed_documents(windows[start:start + EMBED_BATCH_SIZE]))
+            if progress:
+                progress(len(window_vectors), len(windows))
+    window_vectors = np.asarray(window_vectors, dtype=np.float32)
+
+    chunks, vectors = [], []
+    offset = 0
+    with span("chunk", sentences=len(windows)) as sizes:
+        for doc, (sentences, separator) in zip(documents, units_per_doc):
+            doc_vectors = window_vectors[offset:offset + len(sentences)]
+            offset += len(sentences)
+
+            start = 0
+            for end in find_breakpoints(doc_vectors) + [len(sentences) - 1]:
+                if end < start:
+                    continue
+                chunks.append(Document(page_content=separator.join(sentences[start:end + 1]),
+                                       metadata=dict(doc.metadata)))
+
+                # Mean of the window vectors, rescaled to their average norm
+                # so chunk vectors stay comparable with query vectors
+                group = doc_vectors[start:end + 1]
+                mean = group.mean(axis=0)
+                mean_norm = np.linalg.norm(mean)
+                if mean_norm:
+                    mean *= np.linalg.norm(group, axis=1).mean() / mean_norm
+                vectors.append(mean.tolist())
+                start = end + 1
+        sizes["chunks"] = len(chunks)
+
+    if not with_vectors:
+        return chunks, None
+    if CHUNK_VECTORS == "embed":
+        vectors = embed_chunks(chunks)
+    return chunks, vectors
+
+
 # Function to split text into semantic chunks
-# This function uses the SemanticChunker to create chunks based on semantic meaning
 def semantic_text_splitter(text):
     """Split text into semantic chunks
 
@@ -49,13 +263,187 @@ def semantic_text_splitter(text):
 
     if not text:
         return []
-    
-    # Create a SemanticChunker instance with the embeddings
-    text_splitter = SemanticChunker(embeddings, breakpoint_threshold_type="percentile")
 
-    docs = text_splitter.create_documents([text])
+    chunks, _ = chunk_and_embed([Document(page_content=text)], with_vectors=False)
+    return chunks
+
+# Embed the chunks in batches
+# Batching lets callers report progress while a large document is embedded
+def embed_chunks(chunks, progress=None):
+    """Embed chunk texts in batches.
+    Args:
+        chunks (list): The chunk documents to embed.
+        progress (callable, optional): Called with the number of chunks embedded so far.
+    Returns:
+        list: One embedding vector per chunk."""
+
+    embeddings = registry.get("embeddings")
+    vectors = []
+    with span("embed", texts=len(chunks)):
+        for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+            batch = chunks[start:start + EMBED_BATCH_SIZE]
+            vectors.extend(embeddings.embed_documents([chunk.page_content for chunk in batch]))
+            if progress:
+                progress(len(vectors))
+    return vectors
+
+
+# Build a FAISS vector store from chunks and their precomputed vectors
+def build_vector_store(chunks, vectors):
+    """Build a FAISS vector store from chunks and their embeddings.
+    Args:
+        chunks (list): The chunk documents.
+        vectors (list): One embedding vector per chunk.
+    Returns:
+        FAISS: A FAISS vector store containing the indexed chunks."""
+
+    return FAISS.from_embeddings(
+        text_embeddings=[(chunk.page_content, vector) for chunk, vector in zip(chunks, vectors)],
+        embedding=registry.get("embeddings"),
+        metadatas=[chunk.metadata for chunk in chunks]
+    )
+
+
+# Choose the FAISS index for a number of vectors
+def choose_index(n_vectors: int, dim: int, index_type: str = None, float16: bool = None):
+    """Pick the index type and parameters for the configured latency and memory targets.
+    Flat (exact) search up to INDEX_FLAT_MAX_CHUNKS, then HNSW while it fits in
+    INDEX_MAX_MB, then IVF-PQ. IVF-PQ needs INDEX_IVF_MIN_CHUNKS vectors to train.
+    Args:
+        n_vectors (int): Number of vectors to index.
+        dim (int): Vector dimension.
+        index_type (str, optional): auto, flat, hnsw or ivfpq (default INDEX_TYPE).
+        float16 (bool, optional): float16 storage for flat and HNSW (default INDEX_FLOAT16).
+    Returns:
+        dict: The index "type", FAISS "factory" string, HNSW "ef_construction" and "search" parameters."""
+
+    index_type = index_type or INDEX_TYPE
+    float16 = INDEX_FLOAT16 if float16 is None else float16
+    storage = "SQfp16" if float16 else "Flat"
+    vector_bytes = dim * (2 if float16 else 4)
+
+    if index_type == "auto":
+        # HNSW keeps about 2 * M neighbour ids per vector on top of the vectors
+        hnsw_mb = n_vectors * (vector_bytes + 2 * INDEX_HNSW_M * 4) / 1024 / 1024
+        if n_vectors <= INDEX_FLAT_MAX_CHUNKS and n_vectors * vector_bytes / 1024 / 1024 <= INDEX_MAX_MB:
+            index_type = "flat"
+        elif hnsw_mb <= INDEX_MAX_MB:
+            index_type = "hnsw"
+        else:
+            index_type = "ivfpq"
+    if index_type == "ivfpq" and n_vectors < INDEX_IVF_MIN_CHUNKS:
+        index_type = "hnsw"
+
+    if index_type == "flat":
+        return {"type": "flat", "factory": storage, "search": {}}
+    if index_type == "hnsw":
+        return {"type": "hnsw", "factory": f"HNSW{INDEX_HNSW_M},{storage}",
+                "ef_construction": INDEX_HNSW_EF_CONSTRUCTION, "search": {"efSearch": INDEX_HNSW_EF_SEARCH}}
+    if index_type == "ivfpq":
+        # About 4 * sqrt(n) lists with at least 39 training vectors each, and the
+        # largest number of 8-bit sub-quantizers within INDEX_PQ_BYTES that divides dim
+        nlist = max(1, min(int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+        m = max(m for m in range(1, min(INDEX_PQ_BYTES, dim) + 1) if dim % m == 0)
+        return {"type": "ivfpq", "factory": f"IVF{nlist},PQ{m}", "search": {"nprobe": INDEX_IVF_NPROBE}}
+    raise ValueError(f"Unknown index type {index_type!r}, expected auto, flat, hnsw or ivfpq")
+
+
+# Set an index's search-time parameters
+def set_search_params(index, search: dict):
+    """Apply the "search" parameters chosen by choose_index() to a built or loaded index."""
+
+    if "efSearch" in search:
+        faiss.downcast_index(index).hnsw.efSearch = search["efSearch"]
+    if "nprobe" in search:
+        faiss.extract_index_ivf(index).nprobe = search["nprobe"]
+
+
+# Build a FAISS index from vectors with the chosen factory
+def build_index(vectors, params: dict):
+    """Train an index on a sample of the vectors, then add all of them in order.
+    Args:
+        vectors (np.ndarray): The vectors, one row per chunk.
+        params (dict): From choose_index().
+    Returns:
+        tuple: (faiss.Index, params with the number of training vectors)"""
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], params["factory"], faiss.METRIC_L2)
+    if params["type"] == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = params.get("ef_construction", INDEX_HNSW_EF_CONSTRUCTION)
+
+    train_vectors = 0
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > INDEX_TRAIN_SAMPLE:
+            rows = np.random.default_rng(0).choice(len(vectors), INDEX_TRAIN_SAMPLE, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+        train_vectors = len(sample)
+    index.add(vectors)
+    set_search_params(index, params["search"])
+    return index, {**params, "train_vectors": train_vectors}
+
+
+# Rebuild a vector store's index as the type chosen for its size
+def fit_index(vector_store: FAISS):
+    """Replace the (flat) index of a vector store with the index chosen by
+    choose_index() for its size, keeping the vector order and docstore ids.
+    Args:
+        vector_store (FAISS): The vector store, modified in place.
+    Returns:
+        tuple: (index parameters to persist, the original float32 vectors)"""
+
+    vectors = vector_store.index.reconstruct_n(0, vector_store.index.ntotal)
+    params = choose_index(*vectors.shape)
+    with span("index_fit", chunks=len(vectors)):
+        vector_store.index, params = build_index(vectors, params)
+    return {**params, "vectors": int(vectors.shape[0]), "dim": int(vectors.shape[1])}, vectors
+
+
+# Stream documents into a vector store in bounded batches
+# Documents can come from a generator (e.g. a large database); only one batch of
+# documents and its chunks is held in memory besides the index itself
+def index_documents(documents, progress=None, timings=None):
+    """Chunk, embed and index documents batch by batch.
+    Args:
+        documents (iterable): Documents to index, consumed lazily.
+        progress (callable, optional): Called with a dict of documents and chunks indexed so far.
+        timings (dict, optional): Accumulates seconds spent in "chunk_embed" and "index".
+    Returns:
+        FAISS: The vector store, or None if the documents produced no chunks."""
+
+    vector_store = None
+    counts = {"documents": 0, "chunks": 0}
+    timings = timings if timings is not None else {}
+    documents = iter(documents)
+    while True:
+        batch = list(islice(documents, INDEX_BATCH_DOCUMENTS))
+        if not batch:
+            break
+
+        start = time.perf_counter()
+        chunks, vectors = chunk_and_embed(batch)
+        chunked = time.perf_counter()
+        if chunks:
+            with span("index_build", chunks=len(chunks)):
+                if vector_store is None:
+                    vector_store = build_vector_store(chunks, vectors)
+                else:
+                    vector_store.add_embeddings(
+                        text_embeddings=[(chunk.page_content, vector) for chunk, vector in zip(chunks, vectors)],
+                        metadatas=[chunk.metadata for chunk in chunks]
+                    )
+        timings["chunk_embed"] = round(timings.get("chunk_embed", 0) + chunked - start, 3)
+        timings["index"] = round(timings.get("index", 0) + time.perf_counter() - chunked, 3)
+
+        counts["documents"] += len(batch)
+        counts["chunks"] += len(chunks)
+        if progress:
+            progress(dict(counts))
+
+    return vector_store
 
-    return docs
 
 # Function to create and return a vector store for the documents
 # This function uses the FAISS vector store to index the semantic chunks
@@ -67,19 +455,15 @@ def get_vector_store(documents):
         FAISS: A FAISS vector store containing the indexed documents."""
     
     try:      
-        chunks = semantic_text_splitter(documents)
+        chunks, vectors = chunk_and_embed([Document(page_content=documents)] if documents else [])
+        if not chunks:
+            raise ValueError("No text available to index.")
 
         # Create a FAISS vector store from the chunks
-        vector_store = FAISS.from_documents(chunks, embeddings)
-
-        # Save the vector store to a local directory
-        # This is useful for later retrieval without needing to reprocess the documents
-        # But we used direct retrieval in the RAG chat
-        # so this was to ensure the vector store are being created 
-        save_path = "vector_store"
-        vector_store.save_local(save_path)
-        return vector_store
+        # Persisting it is up to the caller (see main/modules/index_store.py),
+        # which saves each index under its own content-keyed directory
+        return build_vector_store(chunks, vectors)
     
     
     except Exception as e:
-        raise ValueError(f"Error creating vector store: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"Error creating vector store: {str(e)}")
@@ -1,131 +1,565 @@
+import hashlib
 import os
+import re
+import threading
+import time
+from collections import OrderedDict
 from dotenv import load_dotenv
-from langchain.prompts import ChatPromptTemplate
-from langchain_groq import ChatGroq
-from langchain.chains import create_history_aware_retriever  
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.documents import Document
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_community.cross_encoders import HuggingFaceCrossEncoder
-from langchain.retrievers import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import CrossEncoderReranker
-from langchain_community.cross_encoders import HuggingFaceCrossEncoder
-from main.modules.process_vector_store import get_vector_store
+
+from main.modules import registry
+from main.modules.answer_cache import ANSWER_CACHE, answer_cache
+from main.modules.executors import run_io
+from main.modules.inference import check_backend, model_source, quantize_linear, set_threads
+from main.modules.telemetry import llm_span_handler, span
+from main.modules.hybrid_search import hybrid_search
 
 # Load environment variables
 load_dotenv()
 
 # LLM and re-ranking model configurations
-MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
-RE_RANKING_MODEL = "BAAI/bge-reranker-base"
-
-# Ensure the Groq API key is set in the environment variables
-groq_api_key = os.environ.get("GROQ_API_KEY")
-if not groq_api_key:
-    raise ValueError("GROQ_API_KEY environment variable is not set.")
-
-# Initialize the LLM with Groq API key and model
-llm = ChatGroq(
-    groq_api_key=groq_api_key,
-    model=MODEL,
-    temperature=0.1   
+MODEL = os.environ.get("LLM_MODEL", "meta-llama/llama-4-maverick-17b-128e-instruct")
+
+# LLM provider: "groq" or "openai" (any OpenAI-compatible chat-completions server,
+# e.g. vLLM, llama.cpp or benchmarks/fake_llm_server.py).
+# LLM_BASE_URL overrides the provider's endpoint; LLM_API_KEY overrides its key variable
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "groq")
+LLM_BASE_URL = os.environ.get("LLM_BASE_URL") or None
+LLM_TEMPERATURE = float(os.environ.get("LLM_TEMPERATURE", 0.1))
+RE_RANKING_MODEL = os.environ.get("RE_RANKING_MODEL", "BAAI/bge-reranker-base")
+
+# Re-ranker inference: torch, torch-int8, onnx or onnx-int8, pairs scored per
+# model call, and tokens per (query, chunk) pair
+RERANKER_BACKEND = check_backend(os.environ.get("RERANKER_BACKEND", "torch"))
+RERANK_BATCH_SIZE = int(os.environ.get("RERANK_BATCH_SIZE", 32))
+RERANK_MAX_SEQ_LENGTH = int(os.environ.get("RERANK_MAX_SEQ_LENGTH", 512))
+
+# Retrieval: dense and BM25 candidates are fused with reciprocal rank fusion,
+# and the top RERANK_CANDIDATES go through the cross-encoder
+HYBRID_SEARCH = os.environ.get("HYBRID_SEARCH", "1") == "1"
+DENSE_CANDIDATES = int(os.environ.get("DENSE_CANDIDATES", 20))
+SPARSE_CANDIDATES = int(os.environ.get("SPARSE_CANDIDATES", 20))
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 10))
+RRF_K = int(os.environ.get("RRF_K", 60))
+
+# Query contextualization: "auto" skips the reformulation LLM call when the
+# question does not depend on the history, "always" or "never" force it
+CONTEXTUALIZE = os.environ.get("CONTEXTUALIZE", "auto")
+
+# Questions shorter than this many words are treated as follow-ups
+CONTEXTUALIZE_MIN_WORDS = int(os.environ.get("CONTEXTUALIZE_MIN_WORDS", 5))
+
+# Number of reformulated questions cached by (history, question)
+REFORMULATION_CACHE_SIZE = int(os.environ.get("REFORMULATION_CACHE_SIZE", 1024))
+
+# Word boundaries that also hold inside Bengali words, whose vowel signs are not \w
+_WORD_START = r"(?<![\w\u0980-\u09FF])"
+_WORD_END = r"(?![\w\u0980-\u09FF])"
+
+# Signs that a question refers back to earlier turns (English and Bangla).
+# Common words such as "this", "that", "and" or "এই" only count in their anaphoric use,
+# so self-contained questions that happen to contain them skip the reformulation call
+FOLLOW_UP_REGEX = re.compile(
+    # Opening by continuing the previous question: "And the deadline?", "What about clause 4?"
+    r"^\W*(?:and|but|also|so|then|or|what about|how about|what else|same for|"
+    r"আর|আরও|আবার|তাহলে|এবং|তো|এর)" + _WORD_END + "|"
+    # Personal pronouns pointing at something named earlier
+    # ("এর" also follows IDs as a detached possessive, so it only counts at the start)
+    + _WORD_START + r"(?:they|them|their|theirs|he|him|his|she|her|hers|its|"
+    r"এটা|এটি|এটার|ওটা|ওটি|সেটা|সেটি|সেটার|তা|তার|তাদের|তিনি|তাঁর|উনি|ওনার)" + _WORD_END + "|"
+    # "it", except the impersonal "is it possible", "it is required", ...
+    + _WORD_START + r"it(?!(?:'s|\s+is|\s+was)?\s+(?:possible|necessary|required|true|allowed|mandatory|legal)"
+    + _WORD_END + ")" + _WORD_END + "|"
+    # Demonstratives standing alone instead of before a noun: "What does this mean?", "Is that one paid?"
+    + _WORD_START + r"(?:this|that|these|those)(?=\s*(?:[?.!,]|$)|\s+(?:one|ones)" + _WORD_END + ")|"
+    + _WORD_START + r"(?:this|these|those)(?=\s+(?:is|was|are|were|mean|means)" + _WORD_END + ")|"
+    # Explicit references to earlier turns
+    + _WORD_START + r"(?:the previous|the earlier|the above|mentioned above|as above|the former|the latter|"
+    r"you said|you mentioned|the same|elaborate|explain further|more details?|tell me more|"
+    r"আগের|উপরের|আগে বলা)" + _WORD_END,
+    re.IGNORECASE,
 )
 
-# Function to run RAG chat with the given query and context
-# This function uses the vector store to retrieve relevant documents and answer the query.
-def rag_chat(query, chat_history,text):
-    """Run RAG chat with the given query and context.
-    Args:
-        query (str): The user query to answer.
-        chat_history (list): The chat history to provide context.
-        text (str): The preprocessed text from the document.
+# Contextualization prompt
+contextualize_prompt = ChatPromptTemplate.from_messages([
+    ("system", "Given a chat history and the latest user question, "
+               "reformulate the question so it is standalone. Do NOT answer it."),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("user", "{input}")
+])
+
+# question answer prompt
+qa_prompt_template = ChatPromptTemplate.from_messages([
+    ("system", """You are an assistant for question-answering tasks.
+
+                Use the following pieces of retrieved context to answer the question.
+
+                You MUST PROVIDE the answer in the following format:
+                        **Answer:** [Direct response to the question]
+
+                        **Supporting Context:** "[Exact quote from the source material]"
+
+                        **Source:** Page [X], [Document/Section name if applicable]
+
+                        **Confidence:** [High/Medium/Low] - [Brief explanation of why]
+
+                If you don't know the answer from the context, say you don’t know."""
+                "{context}"),
+    MessagesPlaceholder(variable_name="chat_history"),
+    ("user", "{input}")
+])
+
+# How each retrieved chunk is shown to the LLM, prefixed with its source when known
+document_prompt = PromptTemplate.from_template("{citation}{page_content}")
+
+
+# Initialize the LLM for the configured provider
+# The API key is only required once the LLM is built, so modules importing this
+# one (benchmarks, tests with a stub LLM) need no key
+def load_llm():
+    """Load the chat LLM.
     Returns:
-        str: The answer to the query."""
-    
-    if not query:
-        return "Query cannot be empty."
-    
-    # Creating vector store and retriever
-    vector_store = get_vector_store(text)
-    retriever = vector_store.as_retriever(search_kwargs={"k": 10})
-
-    # Contextualization prompt 
-    contextualize_prompt = ChatPromptTemplate.from_messages([
-        ("system", "Given a chat history and the latest user question, "
-                   "reformulate the question so it is standalone. Do NOT answer it."),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}")
-    ])
-    
-    # Re-ranker for the retrieved documents
-    re_ranker = HuggingFaceCrossEncoder(
-        model_name=RE_RANKING_MODEL)
-    
-    # Cross-encoder compressor
-    compressor = CrossEncoderReranker(model=re_ranker, top_n=3)
-
-    # Contextual compression retriever
-    # This retriever compresses the context using the cross-encoder
-    # and retrieves the most relevant documents based on the query
-    compression_retriever = ContextualCompressionRetriever(
-            base_compressor=compressor, 
-            base_retriever=retriever
+        BaseChatModel: The LLM client."""
+
+    if LLM_PROVIDER == "groq":
+        from langchain_groq import ChatGroq
+
+        api_key = os.environ.get("LLM_API_KEY") or os.environ.get("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ_API_KEY environment variable is not set.")
+        return ChatGroq(
+            groq_api_key=api_key,
+            base_url=LLM_BASE_URL,
+            model=MODEL,
+            temperature=LLM_TEMPERATURE
         )
 
-    # History-aware retriever for contextualizing the query
-    # This retriever uses the chat history to provide context for the query
-    history_aware_retriever = create_history_aware_retriever(
-        llm=llm,
-        retriever=compression_retriever,
-        prompt=contextualize_prompt
-    )
-    
+    if LLM_PROVIDER == "openai":
+        try:
+            from langchain_openai import ChatOpenAI
+        except ImportError as exc:
+            raise ImportError("LLM_PROVIDER=openai needs langchain-openai: `pip install langchain-openai`.") from exc
+
+        # Local servers usually accept any key
+        api_key = os.environ.get("LLM_API_KEY") or os.environ.get("OPENAI_API_KEY") or "unused"
+        return ChatOpenAI(
+            api_key=api_key,
+            base_url=LLM_BASE_URL,
+            model=MODEL,
+            temperature=LLM_TEMPERATURE
+        )
+
+    raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}', expected 'groq' or 'openai'.")
+
+
+# Cross-encoder scoring (query, chunk) pairs in batches of RERANK_BATCH_SIZE
+class BatchedCrossEncoder(HuggingFaceCrossEncoder):
+    batch_size: int = 32
+
+    def score(self, text_pairs):
+        scores = self.client.predict(text_pairs, batch_size=self.batch_size)
+        # Models with two outputs score (not relevant, relevant)
+        if len(scores.shape) > 1:
+            scores = scores[:, 1]
+        return scores
+
+
+# Load the cross-encoder re-ranker for the retrieved documents
+def load_reranker(backend: str = RERANKER_BACKEND):
+    """Load the cross-encoder re-ranker on an inference backend.
+    Args:
+        backend (str): torch, torch-int8, onnx or onnx-int8.
+    Returns:
+        CrossEncoderReranker: Compressor keeping the top 3 documents."""
+
+    from sentence_transformers import CrossEncoder
+
+    set_threads()
+    model_name, model_kwargs = model_source(RE_RANKING_MODEL, backend, CrossEncoder)
+    re_ranker = BatchedCrossEncoder(
+        model_name=model_name,
+        model_kwargs={**model_kwargs, "max_length": RERANK_MAX_SEQ_LENGTH},
+        batch_size=RERANK_BATCH_SIZE)
+    if backend == "torch-int8":
+        quantize_linear(re_ranker.client)
+    return CrossEncoderReranker(model=re_ranker, top_n=3)
+
+
+# Retrieve and re-rank documents from the session's vector store
+# The vector store is passed per call through the runnable config
+# so the compiled chain can be shared by all sessions
+def retrieve_documents(query: str, config: RunnableConfig):
+    """Retrieve documents for a query and re-rank them with the cross-encoder.
+    Dense and BM25 candidates are fused when the session has a BM25 index.
+    Args:
+        query (str): The (standalone) query.
+        config (RunnableConfig): Must carry the session vector store under
+            config["configurable"]["vector_store"], and optionally its BM25
+            index under config["configurable"]["bm25"].
+    Returns:
+        list: The re-ranked documents."""
+
+    vector_store = config["configurable"]["vector_store"]
+    bm25 = config["configurable"].get("bm25") if HYBRID_SEARCH else None
+    with span("retrieve") as sizes:
+        if bm25 is not None:
+            docs = hybrid_search(vector_store, bm25, query, DENSE_CANDIDATES, SPARSE_CANDIDATES,
+                                 RERANK_CANDIDATES, RRF_K)
+        else:
+            docs = vector_store.similarity_search(query, k=RERANK_CANDIDATES)
+        sizes["chunks"] = len(docs)
+    if not docs:
+        return []
+    with span("rerank", chunks=len(docs)):
+        docs = registry.get("reranker").compress_documents(docs, query)
+    return [add_citation(doc) for doc in docs]
+
+
+# Add a citation label built from the chunk's metadata
+def add_citation(doc: Document):
+    """Return a copy of a document with a "citation" label in its metadata,
+    e.g. "[report.pdf, Page 3] " or "[sales.db, Table orders, rows 51-100] ",
+    or an empty label if the source is unknown.
+    Args:
+        doc (Document): A retrieved chunk.
+    Returns:
+        Document: The chunk with the citation label added."""
+
+    parts = []
+    if doc.metadata.get("source"):
+        parts.append(doc.metadata["source"])
+    if doc.metadata.get("page") is not None:
+        parts.append(f"Page {doc.metadata['page']}")
+    if doc.metadata.get("table"):
+        parts.append(f"Table {doc.metadata['table']}, rows {doc.metadata['rows']}")
+    citation = f"[{', '.join(parts)}] " if parts else ""
+    return Document(page_content=doc.page_content, metadata={**doc.metadata, "citation": citation})
+
+
+_reformulations: "OrderedDict[str, str]" = OrderedDict()
+_reformulations_lock = threading.Lock()
+contextualize_counts = {"called": 0, "skipped": 0, "cached": 0}
+
+
+# Split off the history before the current question
+# The chat endpoints append the question to the history before answering
+def prior_history(chat_history, query: str):
+    if chat_history and chat_history[-1].type == "human" and chat_history[-1].content in query:
+        return chat_history[:-1]
+    return chat_history
+
+
+# Decide whether a question needs the chat history to be understood
+def needs_contextualization(query: str, history):
+    """Decide whether the question must be reformulated with the chat history.
+    Args:
+        query (str): The current question.
+        history (list): The chat history before the question.
+    Returns:
+        tuple: (bool, reason)"""
+
+    if CONTEXTUALIZE == "never":
+        return False, "disabled"
+    if not any(msg.type == "human" for msg in history):
+        return False, "no_history"
+    if CONTEXTUALIZE == "always":
+        return True, "forced"
+    if len(query.split()) < CONTEXTUALIZE_MIN_WORDS:
+        return True, "short_question"
+    if FOLLOW_UP_REGEX.search(query):
+        return True, "follow_up_words"
+    return False, "self_contained"
 
-    # question answer prompt
-    qa_prompt_template = ChatPromptTemplate.from_messages([
-        ("system", """You are an assistant for question-answering tasks.
 
-                    Use the following pieces of retrieved context to answer the question.
+# Cache key for a reformulation: the history it depends on and the question
+def reformulation_key(query: str, history):
+    digest = hashlib.sha256()
+    for msg in history:
+        digest.update(f"{msg.type}\0{msg.content}\0".encode("utf-8"))
+    digest.update(query.encode("utf-8"))
+    return digest.hexdigest()
 
-                    You MUST PROVIDE the answer in the following format:
-                            **Answer:** [Direct response to the question]
 
-                            **Supporting Context:** "[Exact quote from the source material]"
+def _cached_reformulation(key: str):
+    with _reformulations_lock:
+        standalone = _reformulations.get(key)
+        if standalone is not None:
+            _reformulations.move_to_end(key)
+        return standalone
 
-                            **Source:** Page [X], [Document/Section name if applicable]
 
-                            **Confidence:** [High/Medium/Low] - [Brief explanation of why]
+def _cache_reformulation(key: str, standalone: str):
+    with _reformulations_lock:
+        _reformulations[key] = standalone
+        while len(_reformulations) > REFORMULATION_CACHE_SIZE:
+            _reformulations.popitem(last=False)
 
-                    If you don't know the answer from the context, say you don’t know."""
-                    "{context}"),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("user", "{input}")
-    ])
 
-  
+# Record how the question was contextualized in the turn's metrics
+def _record(config: RunnableConfig, outcome: str, reason: str, start: float, standalone: str):
+    with _reformulations_lock:
+        contextualize_counts[outcome] += 1
+    metrics = (config.get("configurable") or {}).get("metrics")
+    if metrics is not None:
+        metrics["contextualize"] = outcome
+        metrics["contextualize_reason"] = reason
+        metrics["contextualize_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        metrics["standalone_query"] = standalone
+
+
+# Turn the question into a standalone query for retrieval
+def contextualize_query(inputs: dict, config: RunnableConfig):
+    """Return the retrieval query for a turn, reformulating the question with
+    the chat history only when needed and reusing cached reformulations.
+    Args:
+        inputs (dict): The chain input with "input" and "chat_history".
+        config (RunnableConfig): May carry a per-turn metrics dict under
+            config["configurable"]["metrics"].
+    Returns:
+        str: The standalone query."""
+
+    start = time.perf_counter()
+    query = inputs["input"]
+    history = prior_history(inputs.get("chat_history") or [], query)
+    needed, reason = needs_contextualization(query, history)
+    if not needed:
+        _record(config, "skipped", reason, start, query)
+        return query
+
+    key = reformulation_key(query, history)
+    standalone = _cached_reformulation(key)
+    if standalone is not None:
+        _record(config, "cached", reason, start, standalone)
+        return standalone
+
+    chain = contextualize_prompt | registry.get("llm") | StrOutputParser()
+    with span("contextualize"):
+        standalone = chain.invoke({"input": query, "chat_history": history}, config)
+    _cache_reformulation(key, standalone)
+    _record(config, "called", reason, start, standalone)
+    return standalone
+
+
+# Async variant of contextualize_query
+async def acontextualize_query(inputs: dict, config: RunnableConfig):
+    start = time.perf_counter()
+    query = inputs["input"]
+    history = prior_history(inputs.get("chat_history") or [], query)
+    needed, reason = needs_contextualization(query, history)
+    if not needed:
+        _record(config, "skipped", reason, start, query)
+        return query
+
+    key = reformulation_key(query, history)
+    standalone = _cached_reformulation(key)
+    if standalone is not None:
+        _record(config, "cached", reason, start, standalone)
+        return standalone
+
+    chain = contextualize_prompt | registry.get("llm") | StrOutputParser()
+    with span("contextualize"):
+        standalone = await chain.ainvoke({"input": query, "chat_history": history}, config)
+    _cache_reformulation(key, standalone)
+    _record(config, "called", reason, start, standalone)
+    return standalone
+
+
+# Build the RAG chain once per process
+def build_rag_chain():
+    """Build the retrieval chain shared by all sessions.
+    Returns:
+        Runnable: The compiled RAG chain."""
+
+    llm = registry.get("llm")
+
+    # History-aware retriever for contextualizing the query
+    # The question is reformulated with the chat history only when it depends on it
+    history_aware_retriever = (
+        RunnableLambda(contextualize_query, afunc=acontextualize_query)
+        | RunnableLambda(retrieve_documents)
+    ).with_config(run_name="chat_retriever_chain")
+
     # Question answer chain
     # This chain uses the LLM to answer the question based on the retrieved context
     # It combines the chat history and the context to generate a response
     qa_chain = create_stuff_documents_chain(
         llm=llm,
-        prompt=qa_prompt_template     
+        prompt=qa_prompt_template,
+        document_prompt=document_prompt
     )
 
-    # Retrieval chain 
+    # Retrieval chain
     # This chain combines the history-aware retriever and the question answer chain
     # to provide a complete RAG chat experience
-    rag_chain = create_retrieval_chain(
+    return create_retrieval_chain(
         history_aware_retriever,
         qa_chain
     )
 
+
+registry.register("llm", load_llm)
+registry.register("reranker", load_reranker)
+registry.register("rag_chain", build_rag_chain)
+
+
+# Decide whether a turn may use the answer cache
+# A cached answer is only reused for questions that do not depend on the chat history
+def cache_bypass_reason(query: str, chat_history, index_key):
+    """Return why a turn cannot use the answer cache, or None if it can.
+    Args:
+        query (str): The question.
+        chat_history (list): The chat history passed to the prompts.
+        index_key (str): The session's index key, or None when unknown.
+    Returns:
+        str: The bypass reason, or None."""
+
+    if not ANSWER_CACHE:
+        return "disabled"
+    if not index_key:
+        return "no_index_key"
+    _, reason = needs_contextualization(query, prior_history(chat_history, query))
+    if reason not in ("no_history", "self_contained"):
+        return f"history:{reason}"
+    return None
+
+
+# Function to run RAG chat with the given query and context
+# This function uses the vector store to retrieve relevant documents and answer the query.
+def rag_chat(query, chat_history, vector_store, bm25=None, metrics=None, index_key=None):
+    """Run RAG chat with the given query and context.
+    Args:
+        query (str): The user query to answer.
+        chat_history (list): The chat history to provide context.
+        vector_store (FAISS): The session's vector store built at upload time.
+        bm25 (BM25Okapi, optional): The session's BM25 index for hybrid retrieval.
+        metrics (dict, optional): Filled with per-turn metrics, e.g. whether the
+            contextualization LLM call was skipped.
+        index_key (str, optional): The session's index key; enables the answer cache.
+    Returns:
+        str: The answer to the query."""
+
+    if not query:
+        return "Query cannot be empty."
+
+    start = time.perf_counter()
+    bypass = cache_bypass_reason(query, chat_history, index_key)
+    if bypass:
+        answer_cache.bypass(bypass, metrics)
+    else:
+        with span("answer_cache"):
+            cached, vector = answer_cache.lookup(index_key, query, metrics)
+        if cached is not None:
+            return cached["answer"]
+
+    rag_chain = registry.get("rag_chain")
+
     # Invoke the RAG chain with the query and chat history
     # This will return the answer to the query based on the context and chat history
-    answer = rag_chain.invoke({
-        "input": query,
-        "chat_history": chat_history
-    })
-    
+    answer = rag_chain.invoke(
+        {"input": query, "chat_history": chat_history},
+        config={"configurable": {"vector_store": vector_store, "bm25": bm25, "metrics": metrics},
+                "callbacks": [llm_span_handler]}
+    )
+
+    if not bypass and answer["answer"]:
+        answer_cache.store(index_key, query, vector, answer["answer"], answer["context"],
+                           (time.perf_counter() - start) * 1000)
+    return answer["answer"]
+
+
+# Async variant of rag_chat for the API endpoints
+# The LLM calls use the client's native async support instead of blocking the event loop
+async def arag_chat(query, chat_history, vector_store, bm25=None, metrics=None, index_key=None):
+    """Run RAG chat asynchronously with the given query and context.
+    Args:
+        query (str): The user query to answer.
+        chat_history (list): The chat history to provide context.
+        vector_store (FAISS): The session's vector store built at upload time.
+        bm25 (BM25Okapi, optional): The session's BM25 index for hybrid retrieval.
+        metrics (dict, optional): Filled with per-turn metrics, e.g. whether the
+            contextualization LLM call was skipped.
+        index_key (str, optional): The session's index key; enables the answer cache.
+    Returns:
+        str: The answer to the query."""
+
+    if not query:
+        return "Query cannot be empty."
+
+    # The cache lookup may embed the question, so it runs off the event loop
+    start = time.perf_counter()
+    bypass = cache_bypass_reason(query, chat_history, index_key)
+    if bypass:
+        answer_cache.bypass(bypass, metrics)
+    else:
+        with span("answer_cache"):
+            cached, vector = await run_io(answer_cache.lookup, index_key, query, metrics)
+        if cached is not None:
+            return cached["answer"]
+
+    rag_chain = registry.get("rag_chain")
+
+    answer = await rag_chain.ainvoke(
+        {"input": query, "chat_history": chat_history},
+        config={"configurable": {"vector_store": vector_store, "bm25": bm25, "metrics": metrics},
+                "callbacks": [llm_span_handler]}
+    )
+
+    if not bypass and answer["answer"]:
+        await run_io(answer_cache.store, index_key, query, vector, answer["answer"], answer["context"],
+                     (time.perf_counter() - start) * 1000)
     return answer["answer"]
 
 
+# Streaming variant of rag_chat for the streaming endpoint
+# Retrieved documents are emitted as soon as retrieval finishes, then answer tokens as they arrive
+async def astream_rag_chat(query, chat_history, vector_store, bm25=None, metrics=None, index_key=None):
+    """Stream a RAG chat turn.
+    A cached answer is emitted as a single token after its sources.
+    Args:
+        query (str): The user query to answer.
+        chat_history (list): The chat history to provide context.
+        vector_store (FAISS): The session's vector store built at upload time.
+        bm25 (BM25Okapi, optional): The session's BM25 index for hybrid retrieval.
+        metrics (dict, optional): Filled with per-turn metrics, e.g. whether the
+            contextualization LLM call was skipped.
+        index_key (str, optional): The session's index key; enables the answer cache.
+    Yields:
+        tuple: ("sources", list of Documents) once, then ("token", str) per answer token."""
+
+    start = time.perf_counter()
+    bypass = cache_bypass_reason(query, chat_history, index_key)
+    if bypass:
+        answer_cache.bypass(bypass, metrics)
+    else:
+        with span("answer_cache"):
+            cached, vector = await run_io(answer_cache.lookup, index_key, query, metrics)
+        if cached is not None:
+            yield "sources", cached["sources"]
+            yield "token", cached["answer"]
+            return
+
+    rag_chain = registry.get("rag_chain")
+
+    sources, tokens = [], []
+    async for chunk in rag_chain.astream(
+        {"input": query, "chat_history": chat_history},
+        config={"configurable": {"vector_store": vector_store, "bm25": bm25, "metrics": metrics},
+                "callbacks": [llm_span_handler]}
+    ):
+        if "context" in chunk:
+            sources = chunk["context"]
+            yield "sources", sources
+        if chunk.get("answer"):
+            tokens.append(chunk["answer"])
+            yield "token", chunk["answer"]
+
+    if not bypass and tokens:
+        await run_io(answer_cache.store, index_key, query, vector, "".join(tokens), sources,
+                     (time.perf_counter() - start) * 1000)
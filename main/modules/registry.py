@@ -0,0 +1,87 @@
+"""
+Process-wide registry for models and compiled chains.
+Heavy objects (embedding model, re-ranker, LLM, RAG chain) are built once per
+process on first use and then shared by every request.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+# Objects loaded at application startup (comma separated)
+# Anything registered but not listed here is loaded lazily on first use
+RESIDENT_MODELS = [
+    name.strip()
+    for name in os.environ.get("RESIDENT_MODELS", "embeddings,reranker,rag_chain").split(",")
+    if name.strip()
+]
+
+_factories: Dict[str, Callable[[], Any]] = {}
+_instances: Dict[str, Any] = {}
+_locks: Dict[str, threading.Lock] = {}
+_registry_lock = threading.Lock()
+
+
+# Register a factory for a shared object
+def register(name: str, factory: Callable[[], Any]):
+    """Register a factory that builds a shared object.
+    Args:
+        name (str): The registry key, e.g. "embeddings".
+        factory (callable): Zero-argument function that builds the object."""
+
+    with _registry_lock:
+        _factories[name] = factory
+        _locks.setdefault(name, threading.Lock())
+
+
+# Get a shared object, building it on first use
+def get(name: str):
+    """Return the shared object for a name, building it once if needed.
+    Concurrent first calls wait on a per-name lock so the factory runs once.
+    Args:
+        name (str): The registry key.
+    Returns:
+        Any: The shared object."""
+
+    instance = _instances.get(name)
+    if instance is not None:
+        return instance
+
+    if name not in _factories:
+        raise KeyError(f"Nothing registered under '{name}'")
+
+    with _locks[name]:
+        instance = _instances.get(name)
+        if instance is None:
+            instance = _factories[name]()
+            _instances[name] = instance
+    return instance
+
+
+# Load the configured resident objects
+def preload(names: Optional[List[str]] = None):
+    """Build the resident objects up front, e.g. at application startup.
+    Args:
+        names (list, optional): Registry keys to load. Defaults to RESIDENT_MODELS."""
+
+    for name in names if names is not None else RESIDENT_MODELS:
+        get(name)
+
+
+# Drop a shared object so its memory can be reclaimed
+def unload(name: str):
+    """Drop a shared object. It is rebuilt on the next get().
+    Args:
+        name (str): The registry key."""
+
+    with _locks.get(name, _registry_lock):
+        _instances.pop(name, None)
+
+
+# List the objects currently held in memory
+def loaded():
+    """Return the names of the objects currently built.
+    Returns:
+        list: Registry keys of loaded objects."""
+
+    return sorted(_instances)
@@ -0,0 +1,175 @@
+"""
+Tracing spans around the pipeline stages, exported as Prometheus metrics.
+A span times one stage (extraction per file type, preprocessing, chunking,
+embedding, index build, retrieval, re-ranking, LLM calls) and carries its sizes
+(pages, chunks, tokens). Every span feeds a latency histogram, an in-flight
+gauge and per-unit size counters. Spans inside an HTTP request are also
+collected for that request's Server-Timing header.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import Counter, Gauge, Histogram
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds", "Latency of a pipeline stage", ["stage"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+STAGE_IN_PROGRESS = Gauge("rag_stage_in_progress", "Pipeline stages currently running", ["stage"])
+STAGE_ITEMS = Counter("rag_stage_items_total", "Items processed by a pipeline stage", ["stage", "unit"])
+STAGE_ERRORS = Counter("rag_stage_errors_total", "Pipeline stages that raised", ["stage"])
+
+# Spans of the current HTTP request, or None outside a collecting request
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+# Record a finished span
+def record(stage: str, seconds: float, **sizes):
+    """Record a stage duration and its sizes.
+    Args:
+        stage (str): The stage name, e.g. "rerank".
+        seconds (float): The stage duration.
+        **sizes: Numeric sizes by unit, e.g. chunks=8; other values are only
+            kept on the request's span."""
+
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    for unit, value in sizes.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+            STAGE_ITEMS.labels(stage, unit).inc(value)
+
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds, sizes))
+
+
+# Time a block of code as a pipeline stage
+@contextmanager
+def span(stage: str, **sizes):
+    """Time a stage. Sizes known only at the end can be set on the yielded dict.
+    Args:
+        stage (str): The stage name.
+        **sizes: Sizes known up front, e.g. pages=3.
+    Yields:
+        dict: The span's sizes."""
+
+    STAGE_IN_PROGRESS.labels(stage).inc()
+    start = time.perf_counter()
+    try:
+        yield sizes
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_IN_PROGRESS.labels(stage).dec()
+        record(stage, time.perf_counter() - start, **sizes)
+
+
+# Time each item produced by a streamed stage, e.g. database row groups
+def traced_iter(stage: str, iterable, unit: str = "items"):
+    """Yield from an iterable, recording the time to produce each item as a span.
+    Args:
+        stage (str): The stage name.
+        iterable (iterable): The items.
+        unit (str): Size unit counted once per item.
+    Yields:
+        The items."""
+
+    iterator = iter(iterable)
+    while True:
+        with span(stage) as sizes:
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            sizes[unit] = 1
+        yield item
+
+
+# Start collecting the spans of the current request
+def collect_spans():
+    """Collect the spans recorded in the current context (and the tasks and
+    worker threads it starts) into a new list.
+    Returns:
+        tuple: (list of (stage, seconds, sizes), token for stop_collecting)"""
+
+    spans = []
+    return spans, _request_spans.set(spans)
+
+
+def stop_collecting(token):
+    _request_spans.reset(token)
+
+
+# Format collected spans as a Server-Timing header value
+def server_timing(spans):
+    """Aggregate spans by stage into a Server-Timing header value, e.g.
+    'retrieve;dur=12.3;desc="chunks=20", rerank;dur=45.6;desc="chunks=8"'.
+    Args:
+        spans (list): Spans from collect_spans().
+    Returns:
+        str: The header value."""
+
+    totals = {}
+    for stage, seconds, sizes in spans:
+        total = totals.setdefault(stage, {"seconds": 0.0, "count": 0, "sizes": {}})
+        total["seconds"] += seconds
+        total["count"] += 1
+        for unit, value in sizes.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                total["sizes"][unit] = total["sizes"].get(unit, 0) + value
+            else:
+                total["sizes"][unit] = value
+
+    entries = []
+    for stage, total in totals.items():
+        desc = [f"{unit}={value}" for unit, value in total["sizes"].items()]
+        if total["count"] > 1:
+            desc.insert(0, f"calls={total['count']}")
+        entry = f"{stage};dur={total['seconds'] * 1000:.1f}"
+        if desc:
+            entry += ';desc="' + " ".join(desc).replace('"', "'") + '"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+class LLMSpanHandler(BaseCallbackHandler):
+    """LangChain callback recording every chat model call as an "llm" span,
+    with its token counts and, for streamed calls, an "llm_first_token" span."""
+
+    # Run in the caller's context so spans reach the current request
+    run_inline = True
+
+    def __init__(self):
+        self._runs = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._runs[run_id] = {"start": time.perf_counter(), "first_token": False}
+        STAGE_IN_PROGRESS.labels("llm").inc()
+
+    def on_llm_new_token(self, token, *, run_id: UUID, **kwargs):
+        run = self._runs.get(run_id)
+        if run is not None and not run["first_token"]:
+            run["first_token"] = True
+            record("llm_first_token", time.perf_counter() - run["start"])
+
+    def _finish(self, run_id: UUID, **sizes):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        STAGE_IN_PROGRESS.labels("llm").dec()
+        record("llm", time.perf_counter() - run["start"], **sizes)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        self._finish(run_id, **{unit: usage[unit] for unit in ("prompt_tokens", "completion_tokens") if usage.get(unit)})
+
+    def on_llm_error(self, error, *, run_id: UUID, **kwargs):
+        STAGE_ERRORS.labels("llm").inc()
+        self._finish(run_id)
+
+
+llm_span_handler = LLMSpanHandler()
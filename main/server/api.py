@@ -1,37 +1,78 @@
 """
 Main FastAPI application entry point.
-Includes routers for health check, file upload, and RAG chat endpoints.
+Includes routers for health check, file upload, job status, session documents, RAG chat and metrics endpoints.
 """
 
-from fastapi import FastAPI
-from .endpoints import home, upload_file, chat
+import os
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from prometheus_client import Gauge, Histogram
+from main.modules import executors, registry
+from main.modules.executors import run_io
+from main.modules.corpus import shared_corpus
+from main.modules.index_store import purge_indexes
+from main.modules.telemetry import collect_spans, server_timing, stop_collecting
+from . import jobs
+from .session import SESSION_RETENTION_DAYS, session_state
+from .endpoints import home, upload_file, chat, job_status, documents, metrics
+
+# Add a Server-Timing header with the stage breakdown to every response, not only
+# to requests sending "X-Server-Timing: 1"
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+HTTP_SECONDS = Histogram("http_request_duration_seconds", "HTTP request latency until the response starts",
+                         ["method", "route", "status"])
+HTTP_IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being handled", ["method", "route"])
+
+
+# Load the resident models and chains once, drop expired sessions and indexes (and the corpus
+# records of purged indexes) and start the ingestion workers before serving requests, then
+# release the workers and pools on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    registry.preload()
+    await run_io(session_state.backend.purge, SESSION_RETENTION_DAYS * 24 * 3600)
+    await run_io(purge_indexes, SESSION_RETENTION_DAYS * 24 * 3600)
+    await run_io(shared_corpus.purge)
+    jobs.start()
+    yield
+    await jobs.stop()
+    executors.shutdown()
 
 
 app = FastAPI(
     title="Multi-Format-RAG-Chat API",
     description="API for document upload and Retrieval-Augmented Generation (RAG) chat with multi-format support.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.include_router(home.router)
 app.include_router(upload_file.router)
 app.include_router(chat.router)
-
-
-
-
-
-
-
-
-    
-    
-
-
-
-    
-    
-
-    
-    
-    
+app.include_router(job_status.router)
+app.include_router(documents.router)
+app.include_router(metrics.router)
+
+
+# Time every request by route template and collect its stage spans for Server-Timing
+# Streamed responses only report the stages finished before the stream starts
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    route = next((r.path for r in app.router.routes if r.matches(request.scope)[0].name == "FULL"), "unmatched")
+    HTTP_IN_PROGRESS.labels(request.method, route).inc()
+    spans, token = collect_spans()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        HTTP_SECONDS.labels(request.method, route, str(status)).observe(time.perf_counter() - start)
+        HTTP_IN_PROGRESS.labels(request.method, route).dec()
+        stop_collecting(token)
+
+    if spans and (SERVER_TIMING or request.headers.get("x-server-timing") == "1"):
+        response.headers["Server-Timing"] = server_timing(spans)
+    return response
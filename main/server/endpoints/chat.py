@@ -1,60 +1,198 @@
 import base64
-from io import BytesIO
-from fastapi import APIRouter, HTTPException
+import binascii
+import json
+import os
+import time
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage, AIMessage
+from starlette.background import BackgroundTask
 
-from main.modules.rag_chat import rag_chat
-from main.modules.document_handler import extract_from_image
+from main.modules.rag_chat import arag_chat, astream_rag_chat
+from main.modules.corpus import is_corpus_key, shared_corpus
+from main.modules.document_handler import cached_query_image_text, extract_from_query_image
+from main.modules.executors import run_cpu, run_io
+from main.modules.history import estimate_tokens, history_window, refresh_summary
+from main.modules.index_store import load_bm25, load_index
+from main.modules.telemetry import span
 from main.server.schema import ChatResponse, chatrequest
 from main.server.session import session_state
 
 router = APIRouter()
 
+# Largest image accepted with a multipart chat query
+MAX_QUERY_IMAGE_MB = float(os.environ.get("MAX_QUERY_IMAGE_MB", 10))
 
-# Endpoint for RAG chat with the given query and context.
-@router.post("/rag_chat", response_model = ChatResponse)
-async def rag_chat_endpoint(request: chatrequest):
-    """Endpoint for RAG chat with the given query and context.
+
+# Look up a session that is ready for chat
+async def get_ready_session(session_id: str):
+    """Return the session for a chat turn, rejecting missing or unindexed sessions.
     Args:
-        request (chatrequest): The request containing user query and session ID.
+        session_id (str): The session ID.
     Returns:
-        ChatResponse: The response containing chat history and generated response."""
-    
+        dict: The session state."""
+
     # Validate session ID
-    session = session_state.get(request.session_id)
+    # Evicted sessions are reloaded from disk, so the lookup runs off the event loop
+    session = await run_io(session_state.get, session_id)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    
-    # Retrieve chat history and cleaned text from session
-    chat_history = session["chat_history"]
-    cleaned_text = session["cleaned_text"]
-    
-    # Extract user query and image if present
-    # If the user query is empty, returns an error
-    # If an image is provided, decode it and extract text from the image
-    # This allows to combine the query and image context for the RAG chat
-    user_query = request.query["query"] if "query" in request.query else ""
-    image_base64 = request.query["image"] if "image" in request.query else None
-    
+
+    # Reject chat until the document has been indexed
+    if session["status"] == "failed":
+        raise HTTPException(status_code=409, detail=f"Document processing failed: {session.get('error')}")
+    if session["status"] == "empty":
+        raise HTTPException(status_code=409, detail="Session has no documents")
+    if session["status"] != "ready":
+        raise HTTPException(status_code=409, detail="Document is still being processed")
+
+    return session
+
+
+# Load the indexes of a ready session
+async def get_indexes(session: dict):
+    """Return the session's vector store and BM25 index, loading them from disk on first use.
+    Sessions on the shared corpus get a view restricted to their indexed documents.
+    Args:
+        session (dict): The session state.
+    Returns:
+        tuple: (FAISS vector store or CorpusView, BM25 index)"""
+
     try:
+        if is_corpus_key(session["index_key"]):
+            filenames = {doc["doc_id"]: doc["filename"] for doc in session["documents"] if doc["status"] == "ready"}
+            view = await run_io(shared_corpus.view, filenames)
+            return view, await run_io(shared_corpus.bm25, view)
 
-        combined_input = user_query
-        
-        # Process image if present
-        if image_base64:
-            # Decode the base64 image
-            image_data = base64.b64decode(image_base64)
+        vector_store = await run_io(load_index, session["index_key"])
+        bm25 = await run_io(load_bm25, session["index_key"])
+        return vector_store, bm25
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="Document index is no longer available, please upload it again")
 
-            # Create a BytesIO object from the decoded image data
-            image = BytesIO(image_data)
 
-            # Extract text from the image
-            # This will use OCR to extract text from the image
-            image_context = extract_from_image(image)
-            
-            # and combine it with the user query
-            if image_context.strip():
-                combined_input = f"{user_query}\n\nImage content: {image_context}".strip()
+# Split a JSON chat query into the text and the decoded image
+def parse_query(query: dict):
+    """Read the user query and optional base64 image of a JSON chat request.
+    Args:
+        query (dict): The user query and optional image in base64 format.
+    Returns:
+        tuple: (user query, image bytes or None)"""
+
+    user_query = query["query"] if "query" in query else ""
+    image_base64 = query["image"] if "image" in query else None
+    if not image_base64:
+        return user_query, None
+    try:
+        return user_query, base64.b64decode(image_base64)
+    except binascii.Error:
+        raise HTTPException(status_code=400, detail="Image is not valid base64")
+
+
+# Read the image part of a multipart chat request
+async def read_image(image: Optional[UploadFile]):
+    """Return the uploaded image bytes, or None if no image was sent."""
+
+    if image is None:
+        return None
+    data = await image.read()
+    if len(data) > MAX_QUERY_IMAGE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Image is larger than {MAX_QUERY_IMAGE_MB:g} MB")
+    return data or None
+
+
+# Combine the user query with text extracted from an optional image
+async def build_input(user_query: str, image_data: Optional[bytes], metrics: dict):
+    """Build the model input from the user query and optional image.
+    Args:
+        user_query (str): The user query.
+        image_data (bytes): The encoded image (PNG, JPEG, ...), or None.
+        metrics (dict): Receives image_ocr ("cached" or "ocr") and image_ocr_ms for an image.
+    Returns:
+        str: The combined input."""
+
+    combined_input = user_query
+
+    # Process image if present
+    if image_data:
+        # An image seen before is answered from the OCR cache by its content hash, without decoding it
+        # Otherwise OCR is CPU-bound, so it runs on the process pool on a downscaled, binarized copy
+        start = time.perf_counter()
+        with span("extract_query_image", bytes=len(image_data)) as sizes:
+            image_context = await run_io(cached_query_image_text, image_data)
+            metrics["image_ocr"] = "ocr" if image_context is None else "cached"
+            if image_context is None:
+                image_context = await run_cpu(extract_from_query_image, image_data)
+            sizes["cache"] = "hit" if metrics["image_ocr"] == "cached" else "miss"
+        metrics["image_ocr_ms"] = round((time.perf_counter() - start) * 1000, 2)
+
+        # and combine it with the user query
+        if image_context.strip():
+            combined_input = f"{user_query}\n\nImage content: {image_context}".strip()
+
+    return combined_input
+
+
+# Convert history to JSON-safe format
+# This is to ensure the chat history can be serialized properly
+def history_to_json(chat_history):
+    """Convert LangChain messages to role/content dicts."""
+
+    return [{"role": msg.type, "content": msg.content} for msg in chat_history]
+
+
+# Build the prompt history for a turn and record its size
+def prompt_history(session: dict, metrics: dict):
+    """Return the windowed history for the prompts: a summary of older turns and the recent messages."""
+
+    window = history_window(session)
+    metrics["history_messages"] = len(window)
+    metrics["history_tokens"] = sum(estimate_tokens(msg.content) for msg in window)
+    return window
+
+
+# Fold older turns into the session's rolling summary after a turn
+# Runs after the response is sent; a failed refresh is retried on the next turn
+async def update_summary(session_id: str, session: dict):
+    try:
+        if await refresh_summary(session):
+            await run_io(session_state.save, session_id, session)
+    except Exception as e:
+        print(f"Error refreshing the history summary of session '{session_id}': {str(e)}")
+
+
+# Remove the messages of a failed turn from the history
+# Compared by identity, since another turn may have appended after them
+def discard_turn(chat_history, *messages):
+    for message in messages:
+        for i in range(len(chat_history) - 1, -1, -1):
+            if chat_history[i] is message:
+                del chat_history[i]
+                break
+
+
+# Run one chat turn and return the response body
+async def chat_turn(session_id: str, user_query: str, image_data: Optional[bytes], background_tasks: BackgroundTasks):
+    """Answer a query (and optional image) in a session.
+    Args:
+        session_id (str): The current chat session ID.
+        user_query (str): The user query.
+        image_data (bytes): The encoded image, or None.
+        background_tasks (BackgroundTasks): Runs the history summary refresh after the response.
+    Returns:
+        dict: The chat history, the generated response and the turn's metrics."""
+
+    session = await get_ready_session(session_id)
+
+    # Retrieve chat history and the prebuilt indexes from session
+    chat_history = session["chat_history"]
+    vector_store, bm25 = await get_indexes(session)
+    
+    try:
+
+        metrics = {}
+        combined_input = await build_input(user_query, image_data, metrics)
         
         # Only proceed if we have some input
         if not combined_input.strip():
@@ -65,19 +203,148 @@ async def rag_chat_endpoint(request: chatrequest):
         chat_history.append(HumanMessage(content=user_query if user_query else "Uploaded an image"))
         
         # Get RAG response with combined input
-        response = rag_chat(combined_input, chat_history, cleaned_text)
+        # The prompts get a token-budgeted window of the history; the session keeps all of it
+        # Repeated questions about the same documents are answered from the answer cache
+        response = await arag_chat(combined_input, prompt_history(session, metrics), vector_store, bm25, metrics,
+                                   session["index_key"])
         
         # Add AI response to history
         if response:
             chat_history.append(AIMessage(content=response))
+            await run_io(session_state.save, session_id, session)
+            background_tasks.add_task(update_summary, session_id, session)
             
-            # Convert history to JSON-safe format
-            # This is to ensure the chat history can be serialized properly
-            history_json = [{"role": msg.type, "content": msg.content} for msg in chat_history]
-            
-            return {"chat_history": history_json, "response": response}
+            return {"chat_history": history_to_json(chat_history), "response": response, "metrics": metrics}
         else:
             raise HTTPException(status_code=500, detail="No response generated")
             
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error in RAG chat: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error in RAG chat: {str(e)}")
+
+
+# Endpoint for RAG chat with the given query and context.
+@router.post("/rag_chat", response_model = ChatResponse)
+async def rag_chat_endpoint(request: chatrequest, background_tasks: BackgroundTasks):
+    """Endpoint for RAG chat with the given query and context.
+    Args:
+        request (chatrequest): The request containing user query and session ID.
+    Returns:
+        ChatResponse: The response containing chat history and generated response."""
+
+    user_query, image_data = parse_query(request.query)
+    return await chat_turn(request.session_id, user_query, image_data, background_tasks)
+
+
+# RAG chat endpoint taking the image as a binary multipart part instead of base64 JSON
+@router.post("/rag_chat/multipart", response_model = ChatResponse)
+async def rag_chat_multipart_endpoint(background_tasks: BackgroundTasks, session_id: str = Form(...),
+                                      query: str = Form(""), image: Optional[UploadFile] = File(None)):
+    """Multipart variant of the RAG chat endpoint.
+    Args:
+        session_id (str): The current chat session ID.
+        query (str): The user query.
+        image (UploadFile): An optional image (PNG, JPEG, ...) sent as is.
+    Returns:
+        ChatResponse: The response containing chat history and generated response."""
+
+    return await chat_turn(session_id, query, await read_image(image), background_tasks)
+
+
+# Format one Server-Sent Event
+def sse_event(event: str, data):
+    """Format a Server-Sent Event with a JSON payload."""
+
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+# Stream one chat turn as Server-Sent Events
+async def stream_turn(session_id: str, user_query: str, image_data: Optional[bytes]):
+    """Emit Server-Sent Events: "sources" with the retrieved chunks, one "token"
+    event per generated token, then "done" with the updated chat history and
+    the turn's metrics.
+    Errors after the stream has started are sent as an "error" event, and the
+    turn is removed from the history. The history summary is refreshed after
+    the stream is closed.
+    Args:
+        session_id (str): The current chat session ID.
+        user_query (str): The user query.
+        image_data (bytes): The encoded image, or None.
+    Returns:
+        StreamingResponse: The text/event-stream response."""
+
+    session = await get_ready_session(session_id)
+    chat_history = session["chat_history"]
+    vector_store, bm25 = await get_indexes(session)
+
+    metrics = {}
+    combined_input = await build_input(user_query, image_data, metrics)
+    if not combined_input.strip():
+        raise HTTPException(status_code=400, detail="No query or image content provided")
+
+    question = HumanMessage(content=user_query if user_query else "Uploaded an image")
+    chat_history.append(question)
+
+    async def events():
+        tokens = []
+        answer = None
+        committed = False
+        try:
+            async for kind, payload in astream_rag_chat(combined_input, prompt_history(session, metrics),
+                                                        vector_store, bm25, metrics, session["index_key"]):
+                if kind == "sources":
+                    yield sse_event("sources", [
+                        {"content": doc.page_content, "metadata": doc.metadata} for doc in payload
+                    ])
+                else:
+                    tokens.append(payload)
+                    yield sse_event("token", {"token": payload})
+
+            response = "".join(tokens)
+            if not response:
+                raise ValueError("No response generated")
+            answer = AIMessage(content=response)
+            chat_history.append(answer)
+            await run_io(session_state.save, session_id, session)
+            committed = True
+            yield sse_event("done", {"chat_history": history_to_json(chat_history), "response": response,
+                                     "metrics": metrics})
+
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error in RAG chat: {str(e)}"})
+
+        finally:
+            # A failed or abandoned stream leaves no question without its answer in the history
+            if not committed:
+                discard_turn(chat_history, question, answer)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+                             background=BackgroundTask(update_summary, session_id, session))
+
+
+# Streaming endpoint for RAG chat using Server-Sent Events.
+@router.post("/rag_chat/stream")
+async def rag_chat_stream_endpoint(request: chatrequest):
+    """Streaming variant of the RAG chat endpoint.
+    Args:
+        request (chatrequest): The request containing user query and session ID.
+    Returns:
+        StreamingResponse: The text/event-stream response."""
+
+    user_query, image_data = parse_query(request.query)
+    return await stream_turn(request.session_id, user_query, image_data)
+
+
+# Streaming RAG chat endpoint taking the image as a binary multipart part
+@router.post("/rag_chat/stream/multipart")
+async def rag_chat_stream_multipart_endpoint(session_id: str = Form(...), query: str = Form(""),
+                                             image: Optional[UploadFile] = File(None)):
+    """Multipart variant of the streaming RAG chat endpoint.
+    Args:
+        session_id (str): The current chat session ID.
+        query (str): The user query.
+        image (UploadFile): An optional image (PNG, JPEG, ...) sent as is.
+    Returns:
+        StreamingResponse: The text/event-stream response."""
+
+    return await stream_turn(session_id, query, await read_image(image))
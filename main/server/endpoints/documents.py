@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException
+
+from main.modules.corpus import corpus_key, is_corpus_key
+from main.modules.executors import run_io
+from main.modules.index_store import remove_from_index
+from main.server.schema import SessionDocuments
+from main.server.session import session_state
+
+router = APIRouter()
+
+
+# Look up a session, reloading it if it was evicted
+async def get_session(session_id: str):
+    session = await run_io(session_state.get, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session
+
+
+# Endpoint to list the documents of a session
+@router.get("/sessions/{session_id}/documents", response_model=SessionDocuments)
+async def list_documents(session_id: str):
+    """List the documents added to a session.
+    Args:
+        session_id (str): The session ID.
+    Returns:
+        SessionDocuments: The session status and its documents."""
+
+    session = await get_session(session_id)
+    return {"session_id": session_id, "status": session["status"], "documents": session["documents"]}
+
+
+# Endpoint to remove a document from a session
+@router.delete("/sessions/{session_id}/documents/{doc_id}", response_model=SessionDocuments)
+async def remove_document(session_id: str, doc_id: str):
+    """Remove a document and its chunks from a session.
+    The chat history is kept; later answers no longer draw on the document.
+    Args:
+        session_id (str): The session ID.
+        doc_id (str): The document ID returned by the upload endpoint.
+    Returns:
+        SessionDocuments: The session status and its remaining documents."""
+
+    session = await get_session(session_id)
+
+    async with session_state.lock(session_id):
+        document = next((doc for doc in session["documents"] if doc["doc_id"] == doc_id), None)
+        if document is None:
+            raise HTTPException(status_code=404, detail="Document not found")
+        if document["status"] == "processing":
+            raise HTTPException(status_code=409, detail="Document is still being processed")
+
+        # Only indexed documents have chunks to remove
+        # Documents in the shared corpus stay there for other sessions; the session just stops referencing them
+        if document["status"] == "ready" and is_corpus_key(session["index_key"]):
+            session["index_key"] = corpus_key({doc["doc_id"]: doc["filename"] for doc in session["documents"]
+                                               if doc["status"] == "ready" and doc is not document})
+        elif document["status"] == "ready":
+            session["index_key"] = await run_io(remove_from_index, session["index_key"], doc_id)
+
+        session["documents"].remove(document)
+        if not session["index_key"]:
+            session["status"] = "empty"
+        await run_io(session_state.save, session_id, session)
+
+    return {"session_id": session_id, "status": session["status"], "documents": session["documents"]}
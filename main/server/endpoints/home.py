@@ -1,6 +1,8 @@
 
 from fastapi import APIRouter
 
+from main.modules.answer_cache import answer_cache
+
 router = APIRouter()
 
 # Health check endpoint to verify API is running
@@ -8,6 +10,6 @@ router = APIRouter()
 async def home():
     """Health check endpoint to verify API is running.
     Returns:
-        dict: A simple welcome message."""
+        dict: A simple welcome message and the answer cache counters."""
     
-    return {"message": "Welcome to the Multi-Format-RAG-Chat API"}
\ No newline at end of file
+    return {"message": "Welcome to the Multi-Format-RAG-Chat API", "answer_cache": answer_cache.stats()}
\ No newline at end of file
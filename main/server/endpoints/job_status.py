@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+
+from main.server import jobs
+from main.server.schema import JobStatus
+
+router = APIRouter()
+
+
+# Endpoint to poll the status of an ingestion job
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job_status(job_id: str):
+    """Report the stage, progress and timings of an ingestion job.
+    Args:
+        job_id (str): The job ID returned by the upload endpoint.
+    Returns:
+        JobStatus: The current state of the job."""
+
+    job = jobs.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
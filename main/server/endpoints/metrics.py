@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from main.modules import registry
+from main.modules.answer_cache import answer_cache
+from main.modules.corpus import shared_corpus
+from main.modules.index_store import resident_keys
+from main.modules.rag_chat import contextualize_counts
+from main.server import jobs
+from main.server.session import session_state
+
+router = APIRouter()
+
+
+class AppCollector:
+    """Read the cache, session, index, corpus and queue counters at scrape time."""
+
+    def collect(self):
+        stats = answer_cache.stats()
+        requests = CounterMetricFamily("rag_answer_cache_requests", "Answer cache lookups by outcome", labels=["outcome"])
+        for outcome in ("hits", "misses", "bypassed"):
+            requests.add_metric([outcome], stats[outcome])
+        yield requests
+        yield GaugeMetricFamily("rag_answer_cache_entries", "Answers held in the answer cache", value=stats["entries"])
+        yield CounterMetricFamily("rag_answer_cache_saved_seconds", "Generation time saved by answer cache hits",
+                                  value=stats["saved_ms"] / 1000)
+
+        # Only report the embedding cache once the model is loaded, scraping must not load it
+        if "embeddings" in registry.loaded():
+            embeddings = registry.get("embeddings")
+            if hasattr(embeddings, "stats"):
+                stats = embeddings.stats()
+                lookups = CounterMetricFamily("rag_embedding_cache_requests", "Embedding cache lookups by outcome",
+                                              labels=["outcome"])
+                lookups.add_metric(["hits"], stats["hits"])
+                lookups.add_metric(["misses"], stats["misses"])
+                yield lookups
+
+        contextualize = CounterMetricFamily("rag_contextualize_requests", "Follow-up rewrites by outcome",
+                                            labels=["outcome"])
+        for outcome, count in contextualize_counts.items():
+            contextualize.add_metric([outcome], count)
+        yield contextualize
+
+        sessions = session_state.stats()
+        yield GaugeMetricFamily("rag_sessions_resident", "Sessions held in memory", value=sessions["resident"])
+        yield GaugeMetricFamily("rag_sessions_resident_bytes", "Estimated size of the sessions held in memory",
+                                value=sessions["resident_bytes"])
+        yield GaugeMetricFamily("rag_indexes_resident", "Indexes held in memory", value=len(resident_keys()))
+
+        corpus = shared_corpus.stats()
+        yield GaugeMetricFamily("rag_corpus_documents", "Unique documents in the shared corpus",
+                                value=corpus["documents"])
+        yield GaugeMetricFamily("rag_corpus_chunks", "Chunks in the shared corpus", value=corpus["chunks"])
+        yield CounterMetricFamily("rag_corpus_deduplicated_uploads",
+                                  "Uploads answered from a document already in the shared corpus",
+                                  value=corpus["deduplicated"])
+
+        queue = jobs.queue_stats()
+        yield GaugeMetricFamily("rag_ingest_queue_depth", "Ingestion jobs waiting for a worker", value=queue["queued"])
+        statuses = GaugeMetricFamily("rag_ingest_jobs", "Known ingestion jobs by status", labels=["status"])
+        for status, count in queue["jobs"].items():
+            statuses.add_metric([status], count)
+        yield statuses
+
+
+REGISTRY.register(AppCollector())
+
+
+# Prometheus scrape endpoint
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics: stage latencies and sizes, HTTP latencies, cache hit
+    rates, resident sessions and indexes, queue depth and process memory.
+    Returns:
+        Response: The metrics in the Prometheus text format."""
+
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
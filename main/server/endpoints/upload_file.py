@@ -1,12 +1,13 @@
+import hashlib
 import os
 from pathlib import Path
-import shutil
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from langchain_core.messages import HumanMessage, AIMessage
+from typing import Optional
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from langchain_core.messages import AIMessage
 
-from main.modules.document_handler import extract_text_from_file
-from main.modules.process_vector_store import preprocess_text
+from main.modules.executors import run_io
+from main.server import jobs
 from main.server.schema import UploadResponse
 from main.server.session import session_state
 
@@ -17,22 +18,41 @@ UPLOAD_DIR = Path("uploads")
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 
+# Save an uploaded file to disk
+def save_upload(source, file_path):
+    """Copy an uploaded file object to disk, hashing its content on the way.
+    Args:
+        source (file): The uploaded file object.
+        file_path (Path): Destination path.
+    Returns:
+        str: The SHA-256 hex digest of the file content."""
 
-
-# Endpoint to upload a file, extract and preprocess its text, and initialize a chat session.
-@router.post("/uploadfile")
-async def create_upload_file(file: UploadFile = File(...), response_model = UploadResponse):
-    """Upload a file, extract and preprocess its text, and initialize a chat session.
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as buffer:
+        for block in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(block)
+            buffer.write(block)
+    return digest.hexdigest()
+
+
+# Endpoint to upload a file and queue it for ingestion into a new or existing chat session.
+@router.post("/uploadfile", response_model=UploadResponse, status_code=202)
+async def create_upload_file(file: UploadFile = File(...), session_id: Optional[str] = Form(None)):
+    """Upload a file and queue it for extraction and indexing.
+    Without a session ID a new chat session is created. With the ID of an
+    existing session the document is added to it: only the new document is
+    processed and its chunks are appended to the session's index.
+    The response is returned as soon as the file is saved; poll /jobs/{job_id}
+    until the job is done before chatting.
     Args:
         file (UploadFile): The file to be uploaded.
+        session_id (str, optional): An existing session to add the document to.
     Returns:
-        dict: A message indicating success and the session ID."""
+        dict: The session ID, the document ID and the ingestion job ID."""
 
     if file.filename == "":
         raise HTTPException(status_code=400, detail="No file selected")
 
-    file_path = UPLOAD_DIR / file.filename
-
     ICON_MAP = {
     ".pdf": "📄",
     ".png": "🖼️",
@@ -48,37 +68,70 @@ async def create_upload_file(file: UploadFile = File(...), response_model = Uplo
     ext = os.path.splitext(file.filename)[1].lower()
     icon = ICON_MAP.get(ext, "📁")
 
-    # Save the uploaded file to the upload directory
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    try:
-
-        # Extract text from the uploaded file
-        # This will handle various file types like PDF, DOCX, TXT, etc.
-        extracted_text = extract_text_from_file(str(file_path),ext)
-
-        # Get cleaned Processed text
-        # from the extracted text to prepare it for vectorization
-        cleaned_text = preprocess_text(extracted_text)  
-
-        # Generate unique session ID
+    # Use the given session or generate a new unique session ID
+    session = None
+    if session_id:
+        session = await run_io(session_state.get, session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+    else:
         session_id = str(uuid.uuid4())
 
+    # Save the uploaded file to the upload directory
+    # Prefixed with a unique ID so concurrent uploads of the same name don't collide
+    # Blocking work runs off the event loop so other clients stay responsive
+    file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{Path(file.filename).name}"
+    content_hash = await run_io(save_upload, file.file, file_path)
+
+    # Documents are identified by their content, so the same file is only added once
+    doc_id = content_hash[:16]
+    job = jobs.create_job(session_id, doc_id, str(file_path), file.filename, ext)
+    document = {"doc_id": doc_id, "filename": file.filename, "job_id": job["job_id"], "status": "processing"}
+
+    new_session = session is None
+    if new_session:
         # Store session state
-        # This will hold the chat history and cleaned text for the session
-        # This allows us to maintain context across multiple interactions       
-        session_state[session_id] = {
-            "chat_history": [AIMessage(content="Hi! I've processed your PDF files. How can I help you?")], 
-            "cleaned_text": cleaned_text
-        }       
-        
-        return {"message": "File processed successfully", 
-                "filename": file.filename,
-                "filetype": file.content_type,
-                "icon": icon,
-                "session_id": session_id}
-    
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
-        
\ No newline at end of file
+        # This will hold the chat history and, once ingestion finishes, the key of the saved index
+        # This allows us to maintain context across multiple interactions
+        session = {
+            "chat_history": [AIMessage(content="Hi! I've processed your PDF files. How can I help you?")],
+            "index_key": None,
+            "status": "processing",
+            "job_id": job["job_id"],
+            "documents": [document]
+        }
+        await run_io(session_state.save, session_id, session)
+    else:
+        async with session_state.lock(session_id):
+            if any(doc["doc_id"] == doc_id and doc["status"] != "failed" for doc in session["documents"]):
+                os.remove(file_path)
+                raise HTTPException(status_code=409, detail="Document is already in this session")
+
+            # Replace an earlier failed attempt at the same document
+            session["documents"] = [doc for doc in session["documents"] if doc["doc_id"] != doc_id] + [document]
+            if not session.get("index_key"):
+                session["status"] = "processing"
+            await run_io(session_state.save, session_id, session)
+
+    # Queue extraction and indexing for the background workers
+    try:
+        jobs.submit(job)
+    except jobs.QueueFullError as e:
+        if new_session:
+            await run_io(session_state.pop, session_id, None)
+        else:
+            session["documents"].remove(document)
+            if not session.get("index_key"):
+                session["status"] = "failed"
+            await run_io(session_state.save, session_id, session)
+        os.remove(file_path)
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return {"message": "File accepted for processing",
+            "filename": file.filename,
+            "filetype": file.content_type,
+            "icon": icon,
+            "session_id": session_id,
+            "doc_id": doc_id,
+            "job_id": job["job_id"],
+            "status": job["status"]}
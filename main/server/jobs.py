@@ -0,0 +1,329 @@
+"""
+Background ingestion scheduler for uploaded documents.
+Uploads are queued as jobs and processed by a fixed number of workers through
+extract -> preprocess -> chunk/embed -> index, streaming large sources in
+bounded batches. A document added to an existing session is indexed on its own
+and appended to the session's index. With SHARED_CORPUS each unique document is
+indexed once into the shared corpus and sessions only reference it.
+Job state can be polled through the /jobs endpoint while the session waits for its index.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict
+
+from langchain_core.documents import Document
+
+from main.modules.corpus import SHARED_CORPUS, corpus_key, is_corpus_key, shared_corpus
+from main.modules.document_handler import extract_image, extract_pdf_pages, extract_text_from_file, iter_db_documents
+from main.modules.executors import get_process_pool, run_cpu, run_io
+from main.modules.index_store import append_to_index, save_index
+from main.modules.process_vector_store import index_documents, preprocess_text
+from main.modules.telemetry import span, traced_iter
+from main.server.session import session_state
+
+# Number of documents ingested concurrently
+INGEST_WORKERS = int(os.environ.get("INGEST_WORKERS", 2))
+
+# Maximum number of uploads waiting for a worker before new uploads are refused
+MAX_QUEUE_DEPTH = int(os.environ.get("MAX_QUEUE_DEPTH", 16))
+
+# Number of finished jobs kept for status polling
+MAX_FINISHED_JOBS = int(os.environ.get("MAX_FINISHED_JOBS", 1000))
+
+jobs: "OrderedDict[str, Dict]" = OrderedDict()
+
+_queue = None
+_workers = []
+
+# Documents being added to the shared corpus, so concurrent uploads of one document index it once
+# Each entry holds the lock and the number of uploads holding or waiting for it
+_corpus_locks: Dict[str, Dict] = {}
+
+
+class QueueFullError(Exception):
+    """Raised when the ingestion queue has no room for another job."""
+
+
+# Create a job record for an uploaded file
+def create_job(session_id: str, doc_id: str, file_path: str, filename: str, ext: str):
+    """Create a queued ingestion job.
+    Args:
+        session_id (str): The session the document belongs to.
+        doc_id (str): The document ID within the session.
+        file_path (str): Where the upload was saved.
+        filename (str): The original file name.
+        ext (str): The lowercase file extension.
+    Returns:
+        dict: The job record."""
+
+    return {
+        "job_id": str(uuid.uuid4()),
+        "session_id": session_id,
+        "doc_id": doc_id,
+        "filename": filename,
+        "file_path": file_path,
+        "ext": ext,
+        "status": "queued",
+        "stage": "queued",
+        "progress": {},
+        "timings": {},
+        "ocr_pages": [],
+        "error": None,
+        "created_at": time.time(),
+    }
+
+
+# Queue a job for the ingestion workers
+def submit(job: Dict):
+    """Queue a job, refusing it when the queue is full.
+    Args:
+        job (dict): The job record from create_job().
+    Raises:
+        QueueFullError: If MAX_QUEUE_DEPTH jobs are already waiting."""
+
+    if _queue is None:
+        raise RuntimeError("Ingestion scheduler is not running")
+    try:
+        _queue.put_nowait(job)
+    except asyncio.QueueFull:
+        raise QueueFullError("Ingestion queue is full, please retry later")
+
+    jobs[job["job_id"]] = job
+    _forget_finished_jobs()
+
+
+# Queue depth and job counts by status, for the metrics endpoint
+def queue_stats():
+    """Return the number of queued jobs and the known jobs by status."""
+
+    statuses = {}
+    for job in jobs.values():
+        statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+    return {"queued": _queue.qsize() if _queue is not None else 0, "jobs": statuses}
+
+
+# Get a job by ID
+def get_job(job_id: str):
+    """Return a job record, or None if unknown."""
+
+    return jobs.get(job_id)
+
+
+# Drop the oldest finished jobs beyond MAX_FINISHED_JOBS
+def _forget_finished_jobs():
+    finished = [job_id for job_id, job in jobs.items() if job["status"] in ("done", "failed")]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del jobs[job_id]
+
+
+# Preprocess extracted units into documents for chunking
+def to_documents(units, source_metadata=None):
+    """Clean each extracted unit (page, row group, file) and wrap it in a Document.
+    Units are consumed lazily so streamed extractions stay streamed.
+    Args:
+        units (iterable): Dicts with "text" and optional "metadata".
+        source_metadata (dict, optional): Metadata added to every document, e.g. the source file.
+    Yields:
+        Document: Non-empty cleaned documents."""
+
+    for unit in units:
+        with span("preprocess", chars=len(unit["text"])):
+            cleaned_text = preprocess_text(unit["text"])
+        if cleaned_text:
+            metadata = {**(source_metadata or {}), **(unit.get("metadata") or {})}
+            yield Document(page_content=cleaned_text, metadata=metadata)
+
+
+# Run one pipeline stage and record its duration on the job and as a span
+async def _stage(job: Dict, name: str, coro, span_name: str = None, sizes=None):
+    job["stage"] = name
+    start = time.perf_counter()
+    try:
+        with span(span_name or name) as span_sizes:
+            result = await coro
+            if sizes:
+                span_sizes.update(sizes(result))
+            return result
+    finally:
+        job["timings"][name] = round(time.perf_counter() - start, 3)
+
+
+# Get a session document entry by ID
+def _session_document(session: Dict, doc_id: str):
+    return next((doc for doc in session.get("documents", []) if doc["doc_id"] == doc_id), {})
+
+
+# Extract, preprocess, chunk and embed one uploaded document
+async def index_job_document(job: Dict):
+    """Extract, preprocess, chunk, embed and index the document of a job.
+    Args:
+        job (dict): The job record.
+    Returns:
+        FAISS: The document's chunks in a flat index."""
+
+    # Extraction (OCR) is CPU-bound, so it runs on the process pool
+    # PDFs are processed page by page across the pool and keep their page numbers
+    if job["ext"] == ".pdf":
+        def report_pages(done, total):
+            job["progress"]["pages"] = total
+            job["progress"]["pages_done"] = done
+
+        pages = await _stage(job, "extract", run_io(
+            extract_pdf_pages, job["file_path"], get_process_pool(), report_pages), "extract_pdf",
+            lambda pages: {"pages": len(pages), "ocr_pages": sum(page["ocr"] for page in pages)})
+
+        # Pages without a usable text layer had to be OCR'd
+        job["ocr_pages"] = [page["page"] for page in pages if page["ocr"]]
+        job["progress"]["pages_ocr"] = len(job["ocr_pages"])
+        # OCR'd pages record the language packs chosen for them
+        units = [{"text": page["text"], "metadata": {
+            "page": page["page"], **({"ocr_language": page["ocr_language"]} if page.get("ocr_language") else {}),
+        }} for page in pages]
+
+    # Databases are streamed row group by row group while indexing
+    elif job["ext"] in (".db", ".sqlite"):
+        units = traced_iter("extract_db", iter_db_documents(job["file_path"]))
+
+    # Images record the OCR language packs chosen for them
+    elif job["ext"] in (".jpg", ".jpeg", ".png"):
+        image = await _stage(job, "extract", run_cpu(extract_image, job["file_path"]),
+                             f"extract_{job['ext'].lstrip('.')}", lambda image: {"chars": len(image["text"])})
+        units = [{"text": image["text"],
+                  "metadata": {"ocr_language": image["ocr_language"]} if image["ocr_language"] else {}}]
+
+    else:
+        text = await _stage(job, "extract", run_cpu(extract_text_from_file, job["file_path"], job["ext"]),
+                            f"extract_{job['ext'].lstrip('.')}", lambda text: {"chars": len(text)})
+        units = [{"text": text}]
+
+    # Preprocess, chunk, embed and index in bounded batches
+    # The embedding model lives in this process, so this runs on the thread pool
+    def report(counts):
+        job["progress"].update(counts)
+
+    # Every chunk records its source file so answers can cite it
+    source_metadata = {"source": job["filename"], "doc_id": job["doc_id"]}
+
+    job["stage"] = "index"
+    vector_store = await run_io(index_documents, to_documents(units, source_metadata), report, job["timings"])
+    if vector_store is None:
+        raise ValueError("No text could be extracted from the document.")
+    return vector_store
+
+
+# Add a job's document to the shared corpus unless it is already there
+async def add_to_corpus(job: Dict):
+    """Index the document of a job into the shared corpus, once per content hash.
+    Concurrent uploads of the same document wait for the first one instead of indexing it again.
+    Args:
+        job (dict): The job record."""
+
+    doc_id = job["doc_id"]
+    entry = _corpus_locks.setdefault(doc_id, {"lock": asyncio.Lock(), "users": 0})
+    entry["users"] += 1
+    try:
+        async with entry["lock"]:
+            if await run_io(shared_corpus.has, doc_id):
+                job["progress"]["deduplicated"] = 1
+                return
+            vector_store = await index_job_document(job)
+            await _stage(job, "save", run_io(shared_corpus.add, doc_id, vector_store), "corpus_add")
+    finally:
+        # Dropped only once no other upload of the document holds or waits for the lock
+        entry["users"] -= 1
+        if not entry["users"]:
+            _corpus_locks.pop(doc_id, None)
+
+
+# Run the full ingestion pipeline for one job
+async def run_ingestion(job: Dict):
+    """Extract, preprocess, chunk, embed and index one uploaded document,
+    then add it to its session's index and mark the session ready for chat.
+    With SHARED_CORPUS the document is added to the shared corpus instead, and
+    the session's key covers its indexed documents there.
+    Args:
+        job (dict): The job record."""
+
+    # Sessions with a document being ingested stay resident, so this is the live session
+    session = session_state.get(job["session_id"])
+    job["status"] = "running"
+    try:
+        # Sessions created before the shared corpus was enabled keep their own index
+        shared = SHARED_CORPUS and (session is None or not session.get("index_key")
+                                    or is_corpus_key(session["index_key"]))
+        if shared:
+            await add_to_corpus(job)
+        else:
+            vector_store = await index_job_document(job)
+
+        # Save the index under its content key; the session only keeps the key
+        # A session that already has documents gets the new chunks appended to its index
+        async with session_state.lock(job["session_id"]):
+            if shared:
+                ready = {doc["doc_id"]: doc["filename"] for doc in (session or {}).get("documents", [])
+                         if doc["status"] == "ready"}
+                index_key = corpus_key({**ready, job["doc_id"]: job["filename"]})
+            elif session is not None and session.get("index_key"):
+                index_key = await _stage(job, "save", run_io(append_to_index, session["index_key"], vector_store),
+                                         "index_save")
+            else:
+                index_key = await _stage(job, "save", run_io(save_index, vector_store), "index_save")
+
+            if session is not None:
+                session["index_key"] = index_key
+                session["status"] = "ready"
+                _session_document(session, job["doc_id"])["status"] = "ready"
+                await run_io(session_state.save, job["session_id"], session)
+        job["status"] = "done"
+        job["stage"] = "done"
+
+    except Exception as e:
+        job["status"] = "failed"
+        job["error"] = str(e)
+        if session is not None:
+            document = _session_document(session, job["doc_id"])
+            document["status"] = "failed"
+            document["error"] = str(e)
+
+            # A session whose other documents are indexed stays usable
+            if not session.get("index_key"):
+                session["status"] = "failed"
+                session["error"] = str(e)
+            await run_io(session_state.save, job["session_id"], session)
+
+
+# Worker loop pulling jobs off the queue
+async def _worker():
+    while True:
+        job = await _queue.get()
+        try:
+            await run_ingestion(job)
+        finally:
+            _queue.task_done()
+
+
+# Start the ingestion workers
+def start():
+    """Create the bounded queue and start INGEST_WORKERS workers.
+    Must be called from the running event loop (application startup)."""
+
+    global _queue
+    _queue = asyncio.Queue(maxsize=MAX_QUEUE_DEPTH)
+    for _ in range(INGEST_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+# Stop the ingestion workers
+async def stop():
+    """Cancel the ingestion workers (application shutdown)."""
+
+    global _queue
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
@@ -1,3 +1,4 @@
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 # Define the response model for the upload endpoint
@@ -7,6 +8,63 @@ class UploadResponse(BaseModel):
     filetype: str
     icon: str
     session_id: str
+    doc_id: str
+    job_id: str
+    status: str
+
+# Define the response model for the job status endpoint
+class JobStatus(BaseModel):
+    """Response model for an ingestion job.
+    Attributes:
+        job_id (str): The job ID returned by the upload endpoint.
+        session_id (str): The session the document belongs to.
+        doc_id (str): The document ID within the session.
+        filename (str): The uploaded file name.
+        status (str): queued, running, done or failed.
+        stage (str): The current pipeline stage.
+        progress (dict): Stage counters, e.g. chunks and chunks embedded.
+        timings (dict): Seconds spent in each finished stage.
+        ocr_pages (list): PDF pages that had no usable text layer and were OCR'd.
+        error (str): The error message if the job failed.
+    """
+    job_id: str
+    session_id: str
+    doc_id: str
+    filename: str
+    status: str
+    stage: str
+    progress: Dict[str, int] = {}
+    timings: Dict[str, float] = {}
+    ocr_pages: List[int] = []
+    error: Optional[str] = None
+
+# Define the response model for a document in a session
+class DocumentInfo(BaseModel):
+    """A document added to a session.
+    Attributes:
+        doc_id (str): The document ID, derived from the file content.
+        filename (str): The uploaded file name.
+        job_id (str): The ingestion job of the document.
+        status (str): processing, ready or failed.
+        error (str): The error message if ingestion failed.
+    """
+    doc_id: str
+    filename: str
+    job_id: str
+    status: str
+    error: Optional[str] = None
+
+# Define the response model for the session documents endpoints
+class SessionDocuments(BaseModel):
+    """The documents of a session.
+    Attributes:
+        session_id (str): The session ID.
+        status (str): The session status.
+        documents (list): The session's documents.
+    """
+    session_id: str
+    status: str
+    documents: List[DocumentInfo]
 
 # Define the request model for the chat endpoint
 class chatrequest(BaseModel):
@@ -24,6 +82,7 @@ class ChatResponse(BaseModel):
     Attributes:
         chat_history (list): List of chat messages in the session.
         response (str): Response generated by the RAG chat system.
+        metrics (dict): Per-turn metrics, e.g. whether the query contextualization call was skipped.
     """
     chat_history: list = Field(..., description="List of chat messages in the session",
                                example=[
@@ -31,4 +90,7 @@ class ChatResponse(BaseModel):
                                   {"role": "assistant", "content": "The capital of France is Paris."}
                               ])
     response: str = Field(..., description="Response generated by the RAG chat system",
-                          example="The capital of France is Paris.")
\ No newline at end of file
+                          example="The capital of France is Paris.")
+    metrics: Optional[dict] = Field(None, description="Per-turn metrics",
+                                    example={"contextualize": "skipped", "contextualize_reason": "no_history",
+                                             "contextualize_ms": 0.02, "standalone_query": "What is the capital of France?"})
\ No newline at end of file
@@ -1,3 +1,273 @@
-from typing import Dict
+"""
+Session store for chat sessions.
+Sessions live in memory while in use and are evicted when idle for longer than
+SESSION_TTL or, least recently used first, when the resident sessions exceed
+SESSION_MEMORY_MB. Every change is written through to a persistent backend, so
+evicted sessions (and sessions from before a restart) are reloaded on demand.
+Sessions reference their vector store by index key; the indexes themselves are
+kept by main/modules/index_store.py.
+"""
 
-session_state: Dict[str, Dict] = {}
\ No newline at end of file
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# Persistent backend: "sqlite" or "memory" (sessions are lost on eviction and restart)
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite")
+
+# Directory for the session database
+SESSION_DIR = os.environ.get("SESSION_DIR", "sessions")
+
+# Seconds a session may stay idle in memory before it is evicted
+SESSION_TTL = float(os.environ.get("SESSION_TTL", 1800))
+
+# Memory budget for resident sessions' chat history
+SESSION_MEMORY_MB = int(os.environ.get("SESSION_MEMORY_MB", 2048))
+
+# Days a persisted session is kept after its last use
+SESSION_RETENTION_DAYS = float(os.environ.get("SESSION_RETENTION_DAYS", 7))
+
+MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+
+
+# Estimate the memory held by a session
+def estimate_size(session: Dict):
+    """Estimate a session's resident size from its chat history.
+    Args:
+        session (dict): The session state.
+    Returns:
+        int: Approximate size in bytes."""
+
+    return sum(len(msg.content.encode("utf-8")) for msg in session.get("chat_history", []))
+
+
+# Serialize a session to a compact JSON record
+def dump_session(session: Dict):
+    """Serialize a session, storing messages as (type, content) pairs."""
+
+    record = {key: value for key, value in session.items() if key != "chat_history"}
+    record["chat_history"] = [[msg.type, msg.content] for msg in session.get("chat_history", [])]
+    return json.dumps(record, ensure_ascii=False)
+
+
+# Whether a session has a document being ingested
+def is_processing(session: Dict):
+    return session.get("status") == "processing" or any(
+        doc.get("status") == "processing" for doc in session.get("documents", []))
+
+
+# Rebuild a session from its JSON record
+def load_session(data: str):
+    """Deserialize a session record."""
+
+    session = json.loads(data)
+    session["chat_history"] = [MESSAGE_TYPES[kind](content=content) for kind, content in session["chat_history"]]
+
+    # Processing sessions are never evicted, so a stored one lost its job in a restart
+    if is_processing(session):
+        for doc in session.get("documents", []):
+            if doc.get("status") == "processing":
+                doc["status"] = "failed"
+                doc["error"] = "Ingestion was interrupted by a server restart"
+        if session.get("status") == "processing":
+            session["status"] = "failed"
+            session["error"] = "Ingestion was interrupted by a server restart"
+    return session
+
+
+class SessionBackend:
+    """Persistent storage for sessions. The base backend keeps nothing."""
+
+    def load(self, session_id: str) -> Optional[Dict]:
+        return None
+
+    def save(self, session_id: str, session: Dict):
+        pass
+
+    def delete(self, session_id: str):
+        pass
+
+    def purge(self, max_age: float):
+        pass
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """Sessions stored as JSON rows in SQLite.
+    Args:
+        directory (str): Directory for the database."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    # One connection per thread
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.directory, "sessions.sqlite"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str):
+        row = self._connect().execute("SELECT data FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return load_session(row[0]) if row else None
+
+    def save(self, session_id: str, session: Dict):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+                         (session_id, dump_session(session), time.time()))
+
+    def delete(self, session_id: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def purge(self, max_age: float):
+        cutoff = time.time() - max_age
+        stale = [row[0] for row in self._connect().execute(
+            "SELECT session_id FROM sessions WHERE updated_at < ?", (cutoff,))]
+        for session_id in stale:
+            self.delete(session_id)
+
+
+class SessionStore:
+    """In-memory session cache with TTL and LRU eviction under a memory budget,
+    backed by a persistent SessionBackend.
+    Sessions with a document still being ingested are never evicted.
+    Args:
+        backend (SessionBackend): Where sessions are persisted.
+        ttl (float): Idle seconds before a session is evicted from memory.
+        max_bytes (int): Memory budget for resident sessions."""
+
+    def __init__(self, backend: SessionBackend, ttl: float, max_bytes: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self._session_locks: Dict[str, asyncio.Lock] = {}
+
+    def __contains__(self, session_id: str):
+        return self.get(session_id) is not None
+
+    def __setitem__(self, session_id: str, session: Dict):
+        self.save(session_id, session)
+
+    def get(self, session_id: str, default=None):
+        """Return a session, reloading it from the backend if it was evicted.
+        Reloading reads from disk, so call this off the event loop for sessions
+        that may not be resident."""
+
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                self._last_access[session_id] = time.time()
+                return session
+
+
+        # Load outside the lock so one reload does not stall other sessions
+        session = self.backend.load(session_id)
+        if session is None:
+            return default
+        with self._lock:
+            if session_id in self._sessions:
+                return self._sessions[session_id]
+            self._put(session_id, session)
+            return session
+
+    def pop(self, session_id: str, default=None):
+        """Remove a session from memory and from the backend."""
+
+        with self._lock:
+            session = self._drop(session_id)
+        self.backend.delete(session_id)
+        return session if session is not None else default
+
+    def save(self, session_id: str, session: Dict):
+        """Write a session through to the backend after it changed.
+        A session evicted while a request or job was still using it is made
+        resident again, so its changes are never lost.
+        Writes to the backend, so call this off the event loop."""
+
+        with self._lock:
+            if self._sessions.get(session_id) is not session:
+                self._sessions[session_id] = session
+                self._last_access[session_id] = time.time()
+            self._sessions.move_to_end(session_id)
+            self._sizes[session_id] = estimate_size(session)
+        self.backend.save(session_id, session)
+        with self._lock:
+            self._evict()
+
+    def lock(self, session_id: str):
+        """Return the asyncio lock serializing changes to a session's documents and index."""
+
+        return self._session_locks.setdefault(session_id, asyncio.Lock())
+
+    def stats(self):
+        """Return the number and estimated size of resident sessions."""
+
+        with self._lock:
+            return {"resident": len(self._sessions), "resident_bytes": sum(self._sizes.values())}
+
+    def _put(self, session_id: str, session: Dict):
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        self._sizes[session_id] = estimate_size(session)
+        self._last_access[session_id] = time.time()
+        self._evict()
+
+    def _drop(self, session_id: str):
+        self._sizes.pop(session_id, None)
+        self._last_access.pop(session_id, None)
+        lock = self._session_locks.get(session_id)
+        if lock is not None and not lock.locked():
+            del self._session_locks[session_id]
+        return self._sessions.pop(session_id, None)
+
+    # Evict idle sessions, then least recently used ones beyond the budget
+    # Every change was already written through, so evicting only frees memory
+    def _evict(self):
+        now = time.time()
+        evictable = [session_id for session_id, session in self._sessions.items()
+                     if not is_processing(session)]
+
+        for session_id in evictable:
+            if now - self._last_access[session_id] > self.ttl:
+                self._drop(session_id)
+
+        total = sum(self._sizes.values())
+        for session_id in evictable[:-1]:
+            if total <= self.max_bytes:
+                break
+            if session_id in self._sessions:
+                total -= self._sizes[session_id]
+                self._drop(session_id)
+
+
+# Create the backend selected by SESSION_BACKEND
+def create_backend():
+    if SESSION_BACKEND == "sqlite":
+        return SQLiteSessionBackend(SESSION_DIR)
+    if SESSION_BACKEND == "memory":
+        return SessionBackend()
+    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+
+
+session_state = SessionStore(create_backend(), ttl=SESSION_TTL, max_bytes=SESSION_MEMORY_MB * 1024 * 1024)